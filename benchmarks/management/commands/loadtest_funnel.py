@@ -0,0 +1,328 @@
+# benchmarks/management/commands/loadtest_funnel.py
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import Resolver404, resolve, reverse
+from django.utils import timezone
+
+from benchmarks.results import compare, git_revision, load_result, save_result
+from bookings.models import Booking
+from events.models import Event
+from payments.inbox import process_webhook_inbox
+from payments.models import WebhookEvent
+from payments.processors import reset_payment_processors
+
+BENCHMARK = "funnel"
+STAGES = ("event_list", "event_detail", "create_booking", "initiate_payment", "payment_webhook")
+USERNAME_PREFIX = "loadtest_funnel_"
+WEBHOOK_SECRET = "whsec_loadtest_funnel"
+EVENT_ID_PREFIX = "evt_funnel_"
+
+
+def _redirects_to_payment(response):
+    """ True if create_booking created a booking and sent the buyer on to the payment page. """
+    if response.status_code != 302:
+        return False
+    try:
+        return resolve(response.url).url_name == "initiate_payment"
+    except Resolver404:
+        return False
+
+
+def _percentile(sorted_values, percent):
+    """ Nearest-rank percentile of an already sorted list. """
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class Command(BaseCommand):
+    """ Drives the whole purchase funnel concurrently, the way buyers use the site:
+        event_list -> event_detail -> create_booking -> initiate_payment (against
+        FakePaymentProcessor) -> payment_webhook, then drains the webhook inbox so
+        every paid booking is confirmed. Reports throughput, latency percentiles,
+        errors and SQL queries per stage, and stores the results in
+        BENCHMARK_RESULTS_DIR so that releases can be compared.
+
+        Example:
+            python manage.py seed_benchmark_data --events 100000 --bookings 2000000
+            python manage.py loadtest_funnel --funnels 2000 --threads 16 --label v1.4.0 --compare
+
+        Every worker thread is a logged-in buyer with its own test client going
+        through Django's full WSGI request handling (middleware, sessions, templates),
+        but without an HTTP server in front. Events are picked at random among the
+        upcoming events with tickets left and without a waiting room, so the numbers
+        are only meaningful on a realistically seeded database (seed_benchmark_data).
+
+        --compare compares the run with the latest stored result (or the given
+        file) and lists every stage metric that got worse by more than --tolerance;
+        with --fail-on-regression the command then exits with an error, e.g. to fail
+        a CI job. The buyers, their bookings and webhook events are deleted
+        afterwards and the tickets they bought are given back to the events.
+    """
+    help = "Load-test the booking funnel end to end and store the results for regression tracking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--funnels", type=int, default=1000, help="Purchase funnels to run.")
+        parser.add_argument("--threads", type=int, default=16, help="Concurrent buyers (worker threads).")
+        parser.add_argument("--warmup", type=int, default=50, help="Funnels run before measuring (fills the caches).")
+        parser.add_argument("--latency", type=float, default=0.05, help="Fake payment provider latency in seconds.")
+        parser.add_argument("--quantity", type=int, default=1, help="Tickets per booking.")
+        parser.add_argument("--seed", type=int, default=None, help="Random seed for the event choice.")
+        parser.add_argument("--label", default=None, help="Name of the run, e.g. a release (default: git revision).")
+        parser.add_argument("--no-save", action="store_true", help="Do not store the results.")
+        parser.add_argument(
+            "--compare", nargs="?", const="latest", default=None, metavar="RESULT",
+            help="Compare with a stored result file (default: the latest run).",
+        )
+        parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression (0.2 = 20%%).")
+        parser.add_argument("--fail-on-regression", action="store_true", help="Exit with an error on regressions.")
+
+    def handle(self, *args, **options):
+        if options["funnels"] <= 0 or options["threads"] <= 0:
+            raise CommandError("--funnels and --threads must be positive.")
+        # Read before this run is stored, so "latest" is the previous run
+        baseline = load_result(BENCHMARK, options["compare"]) if options["compare"] else None
+
+        event_pks = list(
+            Event.objects.filter(
+                date__gte=timezone.now(), admission_rate=0, inventory_shards=0,
+                available_tickets__gte=options["quantity"] * 10,
+            ).values_list("pk", flat=True)
+        )
+        if not event_pks:
+            raise CommandError("No bookable upcoming events. Seed some with `manage.py seed_benchmark_data`.")
+        categories = sorted(Event.objects.values_list("category", flat=True).distinct())
+        data = {
+            "events": Event.objects.count(),
+            "bookable_events": len(event_pks),
+            "bookings": Booking.objects.count(),
+            "users": get_user_model().objects.count(),
+        }
+        self.stdout.write(
+            f"Database: {data['events']} events ({data['bookable_events']} bookable), "
+            f"{data['bookings']} bookings, {data['users']} users"
+        )
+
+        users = self._create_buyers(options["threads"])
+        # The fake processor is not registered outside development; add it for this run only,
+        # next to the real ones (the inbox may hold their events too)
+        processors = {**settings.PAYMENT_PROCESSORS, "fake": {
+            "CLASS": "payments.processors.FakePaymentProcessor",
+            "OPTIONS": {"latency": options["latency"], "webhook_secret": WEBHOOK_SECRET},
+        }}
+        try:
+            with override_settings(
+                PAYMENT_PROCESSOR="fake",
+                PAYMENT_PROCESSORS=processors,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                DEBUG=False, # Do not collect every SQL query
+                QUERY_BUDGET_ENFORCE=False, # Measure, don't fail
+            ):
+                reset_payment_processors()
+                rng = random.Random(options["seed"])
+                if options["warmup"]:
+                    self._run(users, event_pks, categories, options, options["warmup"], rng)
+                    process_webhook_inbox()
+                samples, outcomes, elapsed = self._run(users, event_pks, categories, options, options["funnels"], rng)
+                started = time.perf_counter()
+                inbox = process_webhook_inbox()
+                inbox_seconds = time.perf_counter() - started
+        finally:
+            self._clean_up(users)
+
+        result = self._summarise(samples, outcomes, elapsed, inbox, inbox_seconds, data, options)
+        self._report(result)
+        if not options["no_save"]:
+            path = save_result(BENCHMARK, result)
+            self.stdout.write(f"Results stored in {path}")
+        if options["compare"]:
+            self._compare(baseline, result, options)
+
+    def _create_buyers(self, count):
+        User = get_user_model()
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete() # Left over by an aborted run
+        return User.objects.bulk_create(
+            User(username=f"{USERNAME_PREFIX}{index}", email=f"{USERNAME_PREFIX}{index}@example.com")
+            for index in range(count)
+        )
+
+    def _run(self, users, event_pks, categories, options, funnels, rng):
+        """ Runs `funnels` funnels on `options["threads"]` threads. Returns the
+            samples (stage, ok, seconds, queries, db seconds), the outcome of every
+            funnel (True if it got to the end) and the elapsed time.
+        """
+        local = threading.local()
+        buyers = iter(users)
+        buyers_lock = threading.Lock()
+        samples = [] # list.append is atomic, no lock needed
+        seeds = [rng.random() for _ in range(funnels)]
+        list_url = reverse("event_list")
+        webhook_url = reverse("payment_webhook", kwargs={"provider": "fake"})
+
+        def request(stage, send, *args, accept=lambda response: response.status_code == 200, **kwargs):
+            started = time.perf_counter()
+            response = send(*args, **kwargs)
+            seconds = time.perf_counter() - started
+            stats = getattr(response, "request_stats", None)
+            ok = accept(response)
+            samples.append((stage, ok, seconds, stats.queries if stats else 0, stats.db_seconds if stats else 0.0))
+            return response if ok else None
+
+        def funnel(seed):
+            if not hasattr(local, "client"):
+                with buyers_lock:
+                    user = next(buyers)
+                local.client = Client()
+                local.client.force_login(user)
+            client = local.client
+            choice = random.Random(seed)
+            event_pk = choice.choice(event_pks)
+
+            if not request("event_list", client.get, list_url, {"category": choice.choice(categories)}):
+                return False
+            if not request("event_detail", client.get, reverse("event_detail", kwargs={"pk": event_pk})):
+                return False
+            # Sold out or refused bookings redirect back to the event instead
+            response = request(
+                "create_booking", client.post, reverse("create_booking", kwargs={"event_pk": event_pk}),
+                {"quantity": options["quantity"]}, accept=_redirects_to_payment,
+            )
+            if not response:
+                return False
+            booking_pk = resolve(response.url).kwargs["booking_pk"]
+            if not request("initiate_payment", client.get, response.url):
+                return False
+            payload = {
+                "id": f"{EVENT_ID_PREFIX}{uuid.uuid4().hex}",
+                "type": "checkout.session.completed",
+                "data": {"object": {
+                    "id": f"cs_fake_{booking_pk}",
+                    "payment_status": "paid",
+                    "payment_intent": f"pi_fake_{booking_pk}",
+                    "metadata": {"booking_pk": str(booking_pk)},
+                }},
+            }
+            return bool(request(
+                "payment_webhook", client.post, webhook_url, json.dumps(payload),
+                content_type="application/json", HTTP_X_FAKE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+            ))
+
+        def close_connection(_):
+            connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+            outcomes = list(pool.map(funnel, seeds))
+            list(pool.map(close_connection, range(options["threads"]))) # Best effort: free thread connections
+        return samples, outcomes, time.perf_counter() - started
+
+    def _clean_up(self, users):
+        """ Gives the tickets of the buyers' bookings back and deletes the buyers
+            (cascading to their bookings and ticket deliveries) and their webhook events.
+        """
+        with transaction.atomic():
+            held = (
+                Booking.objects.filter(user__in=users)
+                .exclude(status=Booking.Status.CANCELLED)
+                .values("event_id").annotate(tickets=Sum("quantity"))
+            )
+            for row in held:
+                Event.objects.filter(pk=row["event_id"]).update(available_tickets=F("available_tickets") + row["tickets"])
+            get_user_model().objects.filter(pk__in=[user.pk for user in users]).delete()
+            WebhookEvent.objects.filter(provider="fake", event_id__startswith=EVENT_ID_PREFIX).delete()
+
+    def _summarise(self, samples, outcomes, elapsed, inbox, inbox_seconds, data, options):
+        stages = {}
+        for stage in STAGES:
+            stage_samples = [sample for sample in samples if sample[0] == stage]
+            latencies = sorted(seconds for _, ok, seconds, _, _ in stage_samples if ok)
+            errors = sum(1 for _, ok, _, _, _ in stage_samples if not ok)
+            count = len(stage_samples) or 1
+            stages[stage] = {
+                "requests": len(stage_samples),
+                "errors": errors,
+                "error_rate": round(errors / count, 4),
+                "throughput": round(len(latencies) / (elapsed or 1e-9), 2),
+                "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+                "mean_queries": round(sum(sample[3] for sample in stage_samples) / count, 2),
+                "mean_db_ms": round(sum(sample[4] for sample in stage_samples) / count * 1000, 2),
+            }
+        handled = inbox["processed"] + inbox["ignored"]
+        stages["webhook_processing"] = {
+            "requests": handled + inbox["failed"],
+            "errors": inbox["failed"],
+            "error_rate": round(inbox["failed"] / ((handled + inbox["failed"]) or 1), 4),
+            "throughput": round(handled / (inbox_seconds or 1e-9), 2),
+        }
+        completed = sum(outcomes)
+        return {
+            "benchmark": BENCHMARK,
+            "label": options["label"] or git_revision(),
+            "git_revision": git_revision(),
+            "started_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "options": {key: options[key] for key in ("funnels", "threads", "warmup", "latency", "quantity")},
+            "data": data,
+            "elapsed_seconds": round(elapsed, 3),
+            "funnels": {
+                "completed": completed,
+                "failed": len(outcomes) - completed,
+                "per_second": round(completed / (elapsed or 1e-9), 2),
+            },
+            "stages": stages,
+            "inbox": {**inbox, "seconds": round(inbox_seconds, 3)},
+        }
+
+    def _report(self, result):
+        funnels = result["funnels"]
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Funnel: {funnels['completed']} completed, {funnels['failed']} failed "
+            f"in {result['elapsed_seconds']:.2f}s ({funnels['per_second']:.1f} funnels/sec, "
+            f"{result['options']['threads']} threads)"
+        ))
+        for stage, metrics in result["stages"].items():
+            line = (
+                f"  {stage:<20} requests={metrics['requests']} errors={metrics['errors']} "
+                f"throughput={metrics['throughput']:.1f}/sec"
+            )
+            if "p50_ms" in metrics:
+                line += (
+                    f" p50={metrics['p50_ms']:.1f}ms p95={metrics['p95_ms']:.1f}ms p99={metrics['p99_ms']:.1f}ms"
+                    f" queries={metrics['mean_queries']:.1f} db={metrics['mean_db_ms']:.1f}ms"
+                )
+            self.stdout.write(line)
+
+    def _compare(self, baseline, result, options):
+        if baseline is None:
+            self.stdout.write("No earlier result to compare with.")
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Compared with {baseline.get('label')} ({baseline.get('started_at')}), tolerance {options['tolerance']:.0%}"
+        ))
+        previous = baseline.get("data", {})
+        if (previous.get("events"), previous.get("bookings")) != (result["data"]["events"], result["data"]["bookings"]):
+            self.stdout.write(self.style.WARNING(
+                f"  Data volumes differ ({baseline.get('data')} vs. {result['data']}); numbers may not be comparable."
+            ))
+        regressions = compare(baseline, result, options["tolerance"])
+        for stage, metric, old, new, change in regressions:
+            self.stdout.write(self.style.ERROR(f"  REGRESSION {stage} {metric}: {old} -> {new} ({change:+.0%})"))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("  No regressions."))
+        elif options["fail_on_regression"]:
+            raise CommandError(f"{len(regressions)} metric(s) regressed by more than {options['tolerance']:.0%}.")
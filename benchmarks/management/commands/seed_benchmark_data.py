@@ -0,0 +1,203 @@
+# benchmarks/management/commands/seed_benchmark_data.py
+import json
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from bookings.models import Booking
+from events.facets import invalidate_category_facets
+from events.management.commands.benchmark_search import CATEGORIES, CITIES, VENUES, WORDS
+from events.models import Event
+from events.search import get_search_backend
+
+USERNAME_PREFIX = "bench_"
+MANIFEST_NAME = "seed.json"
+
+# Share of the seeded bookings per status
+STATUS_WEIGHTS = (
+    (Booking.Status.CONFIRMED, 0.85),
+    (Booking.Status.CANCELLED, 0.10),
+    (Booking.Status.PENDING, 0.05),
+)
+
+
+def manifest_path():
+    return settings.BENCHMARK_RESULTS_DIR / MANIFEST_NAME
+
+
+def load_manifest():
+    """ Returns what earlier runs seeded: {"event_ranges": [[first_pk, last_pk], ...], ...}. """
+    try:
+        return json.loads(manifest_path().read_text())
+    except FileNotFoundError:
+        return {"event_ranges": [], "events": 0, "bookings": 0, "users": 0}
+
+
+class Command(BaseCommand):
+    """ Seeds production-like data volumes for the funnel benchmark (loadtest_funnel):
+        users, events spread over the next year and past months, and bookings whose
+        number per event follows a heavy-tailed distribution, so a few events are
+        close to sold out while most sell a handful of tickets. Ticket availability
+        is consistent with the seeded bookings, and every event keeps tickets left
+        for the load test.
+
+        Example:
+            python manage.py seed_benchmark_data --events 100000 --bookings 2000000 --users 50000
+
+        Rows are written with bulk_create in chunks of --chunk-size events (one
+        transaction each), so memory stays flat whatever the volume. bulk_create skips
+        the model signals, so the search index is rebuilt and the category facets are
+        invalidated at the end. The seeded event ids are recorded in
+        BENCHMARK_RESULTS_DIR/seed.json; --clear deletes the seeded events, users and
+        their bookings again. Seed a dedicated benchmark database, not a live one.
+    """
+    help = "Seed realistic data volumes (events, users, bookings) for the funnel benchmark."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=100000, help="Events to create.")
+        parser.add_argument("--bookings", type=int, default=2000000, help="Bookings to create (approximately).")
+        parser.add_argument("--users", type=int, default=50000, help="Users to create (bookings are spread over them).")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Events written per transaction.")
+        parser.add_argument("--past-share", type=float, default=0.2, help="Share of events that already took place.")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed, for reproducible data sets.")
+        parser.add_argument("--clear", action="store_true", help="Delete previously seeded data instead.")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            self._clear()
+            return
+        if options["events"] <= 0 or options["users"] <= 0:
+            raise CommandError("--events and --users must be positive.")
+
+        rng = random.Random(options["seed"])
+        started = time.perf_counter()
+        user_pks = self._seed_users(options["users"])
+        event_range, bookings = self._seed_events(rng, user_pks, options)
+
+        started_index = time.perf_counter()
+        get_search_backend().rebuild()
+        invalidate_category_facets()
+        self.stdout.write(f"Search index rebuilt in {time.perf_counter() - started_index:.1f}s")
+
+        manifest = load_manifest()
+        manifest["event_ranges"].append(event_range)
+        manifest["events"] += options["events"]
+        manifest["bookings"] += bookings
+        manifest["users"] = max(manifest["users"], len(user_pks))
+        settings.BENCHMARK_RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        manifest_path().write_text(json.dumps(manifest, indent=2))
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['events']} events, {bookings} bookings and {len(user_pks)} users "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
+
+    def _seed_users(self, count):
+        """ Creates the bench_* users that do not exist yet; returns all of their pks. """
+        User = get_user_model()
+        started = time.perf_counter()
+        password = make_password(None) # Unusable password, hashed once instead of per user
+        existing = set(User.objects.filter(username__startswith=USERNAME_PREFIX).values_list("username", flat=True))
+        users = (
+            User(username=f"{USERNAME_PREFIX}{index:07d}", email=f"{USERNAME_PREFIX}{index}@example.com", password=password)
+            for index in range(count)
+        )
+        created = User.objects.bulk_create((user for user in users if user.username not in existing), batch_size=5000)
+        user_pks = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX).order_by("pk").values_list("pk", flat=True)[:count]
+        )
+        self.stdout.write(f"Users ready ({len(created)} new) in {time.perf_counter() - started:.1f}s")
+        return user_pks
+
+    def _seed_events(self, rng, user_pks, options):
+        """ Creates the events chunk by chunk, each with its bookings. Returns the
+            [first_pk, last_pk] of the events and the number of bookings created.
+        """
+        now = timezone.now()
+        bookings_per_event = options["bookings"] / options["events"]
+        statuses, weights = zip(*STATUS_WEIGHTS)
+        first_pk = last_pk = None
+        created_bookings = 0
+        started = time.perf_counter()
+
+        for offset in range(0, options["events"], options["chunk_size"]):
+            size = min(options["chunk_size"], options["events"] - offset)
+            # Heavy-tailed popularity: a few events get most of this chunk's bookings
+            popularity = [rng.paretovariate(1.2) for _ in range(size)]
+            scale = bookings_per_event * size / sum(popularity)
+            events, planned = [], []
+            for weight in popularity:
+                count = int(weight * scale + rng.random()) # Randomised rounding keeps the total on target
+                quantities = [rng.choice((1, 1, 1, 2, 2, 3, 4)) for _ in range(count)]
+                booking_statuses = rng.choices(statuses, weights, k=count)
+                held = sum(q for q, status in zip(quantities, booking_statuses) if status != Booking.Status.CANCELLED)
+                # Enough tickets for the seeded bookings plus some left for the load test
+                total = max(rng.randint(50, 5000), held + rng.randint(50, 500))
+                if rng.random() < options["past_share"]:
+                    date = now - timedelta(minutes=rng.randint(60, 60 * 24 * 180))
+                else:
+                    date = now + timedelta(minutes=rng.randint(60, 60 * 24 * 365))
+                events.append(Event(
+                    title=" ".join(rng.sample(WORDS, 3)).title(),
+                    category=rng.choice(CATEGORIES),
+                    date=date,
+                    location=f"{rng.choice(CITIES)} {rng.choice(VENUES)}",
+                    price=Decimal(rng.randint(5, 300)),
+                    total_tickets=total,
+                    available_tickets=total - held,
+                ))
+                planned.append(list(zip(quantities, booking_statuses)))
+
+            with transaction.atomic():
+                Event.objects.bulk_create(events) # Bypasses Event.save(), so no per-row signals
+                bookings = []
+                for event, event_bookings in zip(events, planned):
+                    for quantity, status in event_bookings:
+                        bookings.append(Booking(
+                            user_id=rng.choice(user_pks),
+                            event_id=event.pk,
+                            quantity=quantity,
+                            total_price=event.price * quantity,
+                            status=status,
+                            # Abandoned checkouts: expire_holds releases them shortly
+                            expires_at=now + timedelta(minutes=rng.randint(5, 30)) if status == Booking.Status.PENDING else None,
+                        ))
+                Booking.objects.bulk_create(bookings, batch_size=5000)
+
+            first_pk = events[0].pk if first_pk is None else first_pk
+            last_pk = events[-1].pk
+            created_bookings += len(bookings)
+            done = offset + size
+            self.stdout.write(
+                f"  {done}/{options['events']} events, {created_bookings} bookings "
+                f"({created_bookings / (time.perf_counter() - started):.0f} bookings/sec)"
+            )
+        return [first_pk, last_pk], created_bookings
+
+    def _clear(self):
+        manifest = load_manifest()
+        started = time.perf_counter()
+        deleted_events = 0
+        for first_pk, last_pk in manifest["event_ranges"]:
+            # Chunked, so the cascade to the bookings never collects millions of rows at once
+            for low in range(first_pk, last_pk + 1, 1000):
+                with transaction.atomic():
+                    _, deleted = Event.objects.filter(pk__gte=low, pk__lte=min(low + 999, last_pk)).delete()
+                    deleted_events += deleted.get(Event._meta.label, 0)
+        # Cascades to their remaining bookings (e.g. made by loadtest_funnel on other events)
+        _, deleted = get_user_model().objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        deleted_users = deleted.get(get_user_model()._meta.label, 0)
+        get_search_backend().rebuild()
+        invalidate_category_facets()
+        manifest_path().unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted_events} seeded events and {deleted_users} seeded users "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
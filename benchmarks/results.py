@@ -0,0 +1,83 @@
+# benchmarks/results.py
+""" Storage and comparison of benchmark results.
+
+    Every run of a benchmark is stored as one JSON file in BENCHMARK_RESULTS_DIR,
+    named after the benchmark, the time and the label of the run (by default the
+    git revision). Keeping the files of earlier releases around, or in CI artifacts,
+    lets every new run be compared with a baseline: compare() reports each metric
+    that got worse by more than the tolerance.
+"""
+import json
+import subprocess
+
+from django.conf import settings
+from django.utils import timezone
+
+# Metrics compared between runs, and whether a higher value is better
+COMPARED_METRICS = {
+    "throughput": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "error_rate": False,
+}
+
+
+def git_revision():
+    """ Returns the short git revision of the checkout, or None outside a git repository. """
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def save_result(benchmark, result):
+    """ Writes `result` (a JSON-serialisable dict) and returns the path of the file. """
+    directory = settings.BENCHMARK_RESULTS_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    label = "".join(c if c.isalnum() or c in "-_." else "_" for c in str(result.get("label") or "run"))
+    path = directory / f"{benchmark}-{timezone.now():%Y%m%dT%H%M%S}-{label}.json"
+    path.write_text(json.dumps(result, indent=2, default=str))
+    return path
+
+
+def load_result(benchmark, path="latest"):
+    """ Returns the stored result at `path`, or the newest result of `benchmark` for
+        "latest" (None if there is none yet).
+    """
+    if path != "latest":
+        with open(path) as f:
+            return json.load(f)
+    files = sorted(settings.BENCHMARK_RESULTS_DIR.glob(f"{benchmark}-*.json"))
+    if not files:
+        return None
+    return json.loads(files[-1].read_text())
+
+
+def compare(baseline, current, tolerance):
+    """ Compares the stage metrics of two results. Returns a list of
+        (stage, metric, baseline value, current value, relative change) for every
+        metric that got worse by more than `tolerance` (e.g. 0.2 for 20%).
+    """
+    regressions = []
+    for stage, metrics in current["stages"].items():
+        previous = baseline["stages"].get(stage)
+        if not previous:
+            continue # New stage, nothing to compare with
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = previous.get(metric), metrics.get(metric)
+            if old is None or new is None:
+                continue
+            if not old:
+                # E.g. no errors before: any error rate is a regression, a latency of 0 is noise
+                change = 1.0 if new and metric == "error_rate" else 0.0
+            else:
+                change = (new - old) / old
+            worse = -change if higher_is_better else change
+            if worse > tolerance:
+                regressions.append((stage, metric, old, new, change))
+    return regressions
@@ -0,0 +1,77 @@
+# benchmarks/tests.py
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from bookings.models import Booking
+from events.models import Event
+from .results import compare, load_result
+
+
+def _result(**stages):
+    return {"stages": stages}
+
+
+class CompareTests(SimpleTestCase):
+    """ compare() reports the metrics that got worse by more than the tolerance, and only those. """
+
+    def test_latency_regression(self):
+        baseline = _result(event_list={"p95_ms": 100.0, "throughput": 50.0})
+        current = _result(event_list={"p95_ms": 130.0, "throughput": 50.0})
+        self.assertEqual(compare(baseline, current, 0.2), [("event_list", "p95_ms", 100.0, 130.0, 0.3)])
+
+    def test_within_tolerance(self):
+        baseline = _result(event_list={"p95_ms": 100.0, "throughput": 50.0})
+        current = _result(event_list={"p95_ms": 115.0, "throughput": 45.0})
+        self.assertEqual(compare(baseline, current, 0.2), [])
+
+    def test_throughput_drop_is_a_regression_but_a_rise_is_not(self):
+        baseline = _result(event_list={"throughput": 100.0}, event_detail={"throughput": 100.0})
+        current = _result(event_list={"throughput": 50.0}, event_detail={"throughput": 200.0})
+        self.assertEqual(compare(baseline, current, 0.2), [("event_list", "throughput", 100.0, 50.0, -0.5)])
+
+    def test_faster_latency_is_not_a_regression(self):
+        baseline = _result(event_list={"p50_ms": 100.0})
+        current = _result(event_list={"p50_ms": 20.0})
+        self.assertEqual(compare(baseline, current, 0.2), [])
+
+    def test_errors_appearing(self):
+        baseline = _result(create_booking={"error_rate": 0.0, "p99_ms": 0.0})
+        current = _result(create_booking={"error_rate": 0.01, "p99_ms": 12.0})
+        self.assertEqual(compare(baseline, current, 0.2), [("create_booking", "error_rate", 0.0, 0.01, 1.0)])
+
+    def test_new_stages_and_metrics_are_skipped(self):
+        baseline = _result(event_list={"p95_ms": 100.0})
+        current = _result(event_list={"p95_ms": 100.0, "p99_ms": 500.0}, payment_webhook={"p95_ms": 900.0})
+        self.assertEqual(compare(baseline, current, 0.2), [])
+
+
+class BenchmarkCommandsSmokeTests(TransactionTestCase):
+    """ seed_benchmark_data and loadtest_funnel run end to end on a tiny data set.
+        A TransactionTestCase, since the load test's worker threads use their own
+        database connections and must see the seeded rows.
+    """
+
+    def test_seed_and_funnel(self):
+        output = StringIO()
+        call_command("seed_benchmark_data", events=20, bookings=40, users=5, stdout=output)
+        self.assertEqual(Event.objects.count(), 20)
+        bookings = Booking.objects.count()
+        self.assertGreater(bookings, 0)
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(BENCHMARK_RESULTS_DIR=Path(directory)):
+            call_command(
+                "loadtest_funnel", funnels=5, threads=1, warmup=0, latency=0, seed=1, label="smoke", stdout=output,
+            )
+            result = load_result("funnel")
+        self.assertEqual(result["label"], "smoke")
+        self.assertEqual(result["stages"]["event_list"]["requests"], 5)
+        self.assertEqual(result["stages"]["payment_webhook"]["errors"], 0)
+        # The buyers and their bookings are removed afterwards
+        self.assertEqual(Booking.objects.count(), bookings)
+
+        call_command("seed_benchmark_data", clear=True, stdout=output)
+        self.assertEqual(Event.objects.count(), 0)
@@ -1,25 +1,30 @@
 # bookings/admin.py
 from django.contrib import admin
-from .models import Booking
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .export import CONTENT_TYPES, encode_rows, export_rows
+from .models import Booking, TicketDelivery
 
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
     """Admin configuration for the Booking model."""
-    list_display = ("id", "user", "event", "quantity", "total_price", "status", "created_at")
-    list_filter = ("status", "event__category", "event__date", "created_at") # Filter by status and event details
+    list_display = ("id", "user", "event", "quantity", "total_price", "status", "refund_required", "expires_at", "created_at")
+    list_filter = ("status", "refund_required", "event__category", "event__date", "created_at") # Filter by status and event details
     search_fields = ("id", "user__username", "user__email", "event__title", "stripe_payment_intent_id")
     ordering = ("-created_at",)
     list_select_related = ("user", "event") # Optimize queries by fetching related objects
     readonly_fields = ("total_price", "created_at", "updated_at", "stripe_payment_intent_id") # Fields calculated or set externally
     date_hierarchy = "created_at"
+    # Streams the selected bookings (or all filtered ones, with "Select all") without loading instances
+    actions = ["export_csv", "export_jsonl"]
 
     # Customize the detail view fields
     fieldsets = (
         ("Booking Information", {
-            "fields": ("id", "user", "event", "quantity", "total_price", "status")
+            "fields": ("id", "user", "event", "quantity", "total_price", "status", "expires_at")
         }),
         ("Payment Information", {
-            "fields": ("stripe_payment_intent_id",)
+            "fields": ("stripe_payment_intent_id", "checkout_expires_at", "refund_required")
         }),
         ("Timestamps", {
             "fields": ("created_at", "updated_at"),
@@ -27,7 +32,10 @@ class BookingAdmin(admin.ModelAdmin):
         }),
     )
     # Override the default readonly fields in fieldsets to ensure they appear
-    readonly_fields = ("id", "user", "event", "total_price", "created_at", "updated_at", "stripe_payment_intent_id")
+    readonly_fields = (
+        "id", "user", "event", "total_price", "created_at", "updated_at", "stripe_payment_intent_id", "checkout_expires_at",
+        "refund_required",
+    )
 
     def get_readonly_fields(self, request, obj=None):
         # Make all fields readonly in the admin change view after creation
@@ -35,6 +43,20 @@ class BookingAdmin(admin.ModelAdmin):
         #     return self.readonly_fields + ('quantity', 'status') # Add fields you want readonly on edit
         return self.readonly_fields
 
+    def export_csv(self, request, queryset):
+        return self._export(queryset, "csv")
+    export_csv.short_description = "Export selected bookings as CSV"
+
+    def export_jsonl(self, request, queryset):
+        return self._export(queryset, "jsonl")
+    export_jsonl.short_description = "Export selected bookings as JSON Lines"
+
+    def _export(self, queryset, format):
+        # Rows are read in chunks and sent while the export is still running (see bookings/export.py)
+        response = StreamingHttpResponse(encode_rows(export_rows(queryset), format), content_type=CONTENT_TYPES[format])
+        response["Content-Disposition"] = f'attachment; filename="bookings-{timezone.now():%Y%m%d-%H%M%S}.{format}"'
+        return response
+
     # Optional: Add actions like marking bookings as cancelled (use with caution)
     # actions = ["mark_as_cancelled"]
     # def mark_as_cancelled(self, request, queryset):
@@ -42,3 +64,21 @@ class BookingAdmin(admin.ModelAdmin):
     #     # Add logic here to potentially refund or adjust ticket counts if needed
     # mark_as_cancelled.short_description = "Mark selected bookings as Cancelled"
 
+
+@admin.register(TicketDelivery)
+class TicketDeliveryAdmin(admin.ModelAdmin):
+    """Admin configuration for the TicketDelivery queue."""
+    list_display = ("id", "booking", "status", "attempts", "next_attempt_at", "updated_at")
+    list_filter = ("status",)
+    search_fields = ("booking__id", "booking__user__email", "last_error")
+    list_select_related = ("booking__user", "booking__event") # Booking.__str__ uses both
+    readonly_fields = ("booking", "attempts", "last_error", "created_at", "updated_at")
+    actions = ["retry_now"]
+
+    def retry_now(self, request, queryset):
+        # Make failed or backed-off deliveries due immediately for the next worker poll
+        updated = queryset.exclude(status=TicketDelivery.Status.SENT).update(
+            status=TicketDelivery.Status.PENDING, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"{updated} delivery(ies) queued for immediate retry.")
+    retry_now.short_description = "Retry selected deliveries now"
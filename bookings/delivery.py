@@ -0,0 +1,115 @@
+# bookings/delivery.py
+""" Durable, DB-backed ticket delivery queue.
+
+    The payment webhook only inserts a TicketDelivery row (in the same transaction
+    that confirms the booking). Workers started with `manage.py deliver_tickets`
+    claim due deliveries in batches, render the PDF, send the email and either mark
+    the delivery as sent or schedule a retry with exponential backoff.
+"""
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import TicketDelivery
+from .mailer import send_ticket_emails
+
+
+def enqueue_ticket_delivery(booking):
+    """ Queues the ticket delivery for a confirmed booking.
+        Call it inside the transaction that confirms the booking, so either both
+        the confirmation and the queued delivery are committed or neither is.
+    """
+    return TicketDelivery.objects.create(booking=booking)
+
+
+def enqueue_ticket_deliveries(booking_pks, batch_size=1000):
+    """ Queues the ticket deliveries of many confirmed bookings with bulk INSERTs.
+        Like enqueue_ticket_delivery(), call it inside the confirming transaction.
+    """
+    TicketDelivery.objects.bulk_create(
+        [TicketDelivery(booking_id=pk) for pk in booking_pks], batch_size=batch_size
+    )
+
+
+def claim_deliveries(batch_size, lease_seconds=None):
+    """ Claims up to `batch_size` due deliveries and returns their primary keys.
+        Claiming pushes next_attempt_at forward by the lease, so other workers skip
+        these rows; if this worker dies they become due again once the lease ends.
+    """
+    lease_seconds = lease_seconds or settings.TICKET_DELIVERY_LEASE_SECONDS
+    now = timezone.now()
+    with transaction.atomic():
+        pks = list(
+            TicketDelivery.objects.select_for_update(skip_locked=True)
+            .filter(status=TicketDelivery.Status.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if pks:
+            TicketDelivery.objects.filter(pk__in=pks).update(
+                next_attempt_at=now + timedelta(seconds=lease_seconds), updated_at=now,
+            )
+    return pks
+
+
+def deliver_batch(delivery_pks):
+    """ Sends the tickets for the given (claimed) deliveries over one mail connection.
+        Returns a dict with the number of deliveries sent, retried and failed.
+    """
+    counts = {"sent": 0, "retried": 0, "failed": 0}
+    deliveries = list(
+        TicketDelivery.objects.filter(pk__in=delivery_pks, status=TicketDelivery.Status.PENDING)
+        .select_related("booking__user", "booking__event")
+    )
+    report = send_ticket_emails([delivery.booking for delivery in deliveries], batch_size=len(deliveries) or 1)
+    for delivery in deliveries:
+        if delivery.booking_id in report.sent:
+            _mark_sent(delivery)
+            counts["sent"] += 1
+        else:
+            counts[_schedule_retry(delivery, report.failed.get(delivery.booking_id, "Unknown error"))] += 1
+    return counts
+
+
+def retry_delay(attempts):
+    """ Exponential backoff with full jitter for the given number of failed attempts. """
+    base = settings.TICKET_DELIVERY_RETRY_BASE_SECONDS
+    cap = settings.TICKET_DELIVERY_RETRY_MAX_SECONDS
+    return timedelta(seconds=random.uniform(0, min(cap, base * 2 ** (attempts - 1))))
+
+
+def _mark_sent(delivery):
+    """ Records a successful delivery. """
+    TicketDelivery.objects.filter(pk=delivery.pk).update(
+        status=TicketDelivery.Status.SENT,
+        attempts=delivery.attempts + 1,
+        last_error="",
+        updated_at=timezone.now(),
+    )
+    print(f"Delivered ticket for booking {delivery.booking_id} to {delivery.booking.user.email}")
+
+
+def _schedule_retry(delivery, error):
+    """ Records a failed attempt and either schedules a retry or gives up.
+        Returns "retried" or "failed" accordingly.
+    """
+    attempts = delivery.attempts + 1
+    now = timezone.now()
+    if attempts >= settings.TICKET_DELIVERY_MAX_ATTEMPTS:
+        status, outcome, next_attempt_at = TicketDelivery.Status.FAILED, "failed", now
+        print(f"Giving up on ticket delivery for booking {delivery.booking_id} after {attempts} attempt(s): {error}")
+    else:
+        status, outcome, next_attempt_at = TicketDelivery.Status.PENDING, "retried", now + retry_delay(attempts)
+        print(f"Ticket delivery for booking {delivery.booking_id} failed (attempt {attempts}), retrying: {error}")
+
+    TicketDelivery.objects.filter(pk=delivery.pk).update(
+        status=status,
+        attempts=attempts,
+        next_attempt_at=next_attempt_at,
+        last_error=str(error)[:2000],
+        updated_at=now,
+    )
+    return outcome
@@ -0,0 +1,94 @@
+# bookings/history.py
+""" A user's booking history ("My bookings") and their cached upcoming-tickets summary.
+
+    Users with hundreds of bookings get their history one page at a time through
+    keyset pagination on (-created_at, -id) (events/pagination.py), which the
+    (user, -created_at, -id) index answers directly: every page is one indexed
+    range read joined to its events, whatever the page number.
+
+    Each page is a single select_related("event") query projected with only() to
+    the columns the templates show. The requesting user is attached to every row,
+    so nothing on the page (e.g. Booking.__str__, which prints user.username and
+    event.title) triggers a lazy per-row query.
+
+    The summary at the top of the dashboard (confirmed tickets for upcoming events,
+    next event) is an aggregate over all of a user's bookings. It is cached per user
+    for BOOKING_SUMMARY_CACHE_TIMEOUT seconds (or until the next event starts) and
+    dropped when one of the user's bookings changes (bookings/signals.py and
+    confirm_paid_bookings). Edits of an event's title or date show up after the timeout.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+from django.utils import timezone
+
+from events.pagination import paginate_keyset
+from .models import Booking
+
+HISTORY_ORDERING = ("-created_at", "-id")
+
+# Columns shown in the booking history; everything else stays deferred
+HISTORY_FIELDS = (
+    "id", "user_id", "event_id", "quantity", "total_price", "status", "created_at", "expires_at",
+    "event__id", "event__title", "event__date", "event__location",
+)
+
+
+def get_booking_history(user, cursor=None, per_page=None):
+    """ Returns the KeysetPage of `user`'s bookings (newest first) that follows `cursor`. """
+    queryset = Booking.objects.filter(user=user).select_related("event").only(*HISTORY_FIELDS)
+    page = paginate_keyset(queryset, HISTORY_ORDERING, cursor, per_page or settings.BOOKINGS_PER_PAGE)
+    for booking in page:
+        booking.user = user # Already loaded; saves a query per row wherever booking.user is used
+    return page
+
+
+def _summary_key(user_pk):
+    return f"bookings:summary:{user_pk}"
+
+
+def get_upcoming_summary(user):
+    """ Returns a dict with the user's confirmed upcoming bookings, their ticket
+        count and the next event (dict with pk, title and date, or None).
+    """
+    key = _summary_key(user.pk)
+    summary = cache.get(key)
+    if summary is None:
+        now = timezone.now()
+        upcoming = Booking.objects.filter(
+            user=user, status=Booking.Status.CONFIRMED, event__date__gte=now
+        )
+        totals = upcoming.aggregate(bookings=Count("id"), tickets=Sum("quantity"), next_date=Min("event__date"))
+        next_event = None
+        if totals["next_date"] is not None:
+            next_event = (
+                upcoming.filter(event__date=totals["next_date"])
+                .values("event_id", "event__title", "event__date")
+                .first()
+            )
+        summary = {
+            "bookings": totals["bookings"],
+            "tickets": totals["tickets"] or 0,
+            "next_event": next_event and {
+                "pk": next_event["event_id"],
+                "title": next_event["event__title"],
+                "date": next_event["event__date"],
+            },
+        }
+        timeout = settings.BOOKING_SUMMARY_CACHE_TIMEOUT
+        if totals["next_date"] is not None and totals["next_date"] - now < timedelta(seconds=timeout):
+            # The next event stops being "upcoming" when it starts
+            timeout = max(1, int((totals["next_date"] - now).total_seconds()))
+        cache.set(key, summary, timeout)
+    return summary
+
+
+def invalidate_upcoming_summaries(user_pks):
+    """ Drops the cached summaries of the given users once the current transaction
+        (if any) has committed, so a concurrent request cannot cache the old state again.
+    """
+    keys = [_summary_key(pk) for pk in set(user_pks)]
+    transaction.on_commit(lambda: cache.delete_many(keys))
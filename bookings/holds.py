@@ -0,0 +1,71 @@
+# bookings/holds.py
+""" Expiry of time-boxed seat holds.
+
+    create_booking reserves tickets immediately and gives the pending booking an
+    `expires_at` deadline. If the customer abandons the checkout, the sweeper below
+    cancels the booking and returns its tickets to the event. It works in batches:
+    expired holds are located through the (status, expires_at) index, cancelled with
+    one UPDATE per batch, and their quantities are returned with one aggregated
+    UPDATE per event instead of a save() per booking.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Booking
+from events.models import Event
+from events import inventory
+from events.availability import notify_availability_changed
+
+
+class _BatchRaceLost(Exception):
+    """ Raised internally to roll back a batch whose bookings changed underneath it. """
+
+
+def release_expired_holds(now=None, batch_size=1000):
+    """ Cancels every pending booking whose hold expired before `now` and releases
+        its tickets. Returns the number of bookings cancelled.
+    """
+    now = now or timezone.now()
+    total = 0
+    while True:
+        try:
+            selected, cancelled = _release_batch(now, batch_size)
+        except _BatchRaceLost:
+            continue # A booking was confirmed concurrently; re-select the batch
+        total += cancelled
+        if selected < batch_size:
+            return total
+
+
+def _release_batch(now, batch_size):
+    """ Cancels one batch of expired holds. Returns (bookings selected, bookings cancelled). """
+    with transaction.atomic():
+        # skip_locked lets several sweepers (or a sweeper and a webhook) work side by side
+        # on databases with row locks; SQLite simply serializes the transactions.
+        expired = list(
+            Booking.objects.select_for_update(skip_locked=True)
+            .filter(status=Booking.Status.PENDING, expires_at__lte=now)
+            .order_by("expires_at")
+            .values_list("pk", "event_id", "quantity")[:batch_size]
+        )
+        if not expired:
+            return 0, 0
+
+        cancelled = Booking.objects.filter(
+            pk__in=[pk for pk, _, _ in expired], status=Booking.Status.PENDING
+        ).update(status=Booking.Status.CANCELLED, updated_at=now)
+        if cancelled != len(expired):
+            # Some bookings left the pending state; releasing their tickets would oversell
+            raise _BatchRaceLost()
+
+        # Return the tickets with a single UPDATE per event
+        released = defaultdict(int)
+        for _, event_id, quantity in expired:
+            released[event_id] += quantity
+        for event in Event.objects.filter(pk__in=released).only("pk", "inventory_shards"):
+            inventory.release_tickets(event, released[event.pk])
+            notify_availability_changed(event.pk)
+
+    return len(expired), cancelled
@@ -0,0 +1,135 @@
+# bookings/importing.py
+""" Streaming bulk import of bookings, e.g. when migrating from another ticketing
+    system. Same approach as the event importer (events/importing.py): rows are
+    read one at a time, validated column by column a batch at a time and inserted
+    with one bulk_create per batch; invalid rows are reported and skipped.
+
+    Users and events are looked up with one query each per batch. Unless told not to
+    (the events were imported with their remaining availability already), the tickets
+    of confirmed bookings are taken from the event's inventory with one conditional
+    UPDATE per event and batch, as create_pending_booking() does, so an import cannot
+    oversell an event either.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from events import inventory
+from events.availability import notify_availability_changed
+from events.importing import (
+    ImportResult, batched, decimal_column, integer_column, text_column,
+)
+from events.models import Event
+from .history import invalidate_upcoming_summaries
+from .models import Booking
+
+# Pending bookings need a live seat hold and checkout, so only settled bookings are imported
+IMPORTABLE_STATUSES = (Booking.Status.CONFIRMED, Booking.Status.CANCELLED)
+
+
+class BookingImporter:
+    """ Imports bookings from rows with the columns username, event_id, quantity and
+        optionally status (confirmed or cancelled, default confirmed), total_price
+        (default: the event's price times quantity) and payment_id.
+    """
+
+    def __init__(self, batch_size=1000, reserve_tickets=True, dry_run=False, max_errors=1000):
+        self.batch_size = batch_size
+        self.reserve_tickets = reserve_tickets
+        self.dry_run = dry_run
+        self.max_errors = max_errors
+
+    def run(self, records):
+        """ Imports the (line number, row, error) records of read_rows(). Returns an ImportResult. """
+        result = ImportResult(self.max_errors)
+        for batch in batched(records, self.batch_size):
+            result.rows += len(batch)
+            rows, lines, batch_errors = [], [], []
+            for line, row, error in batch:
+                if error:
+                    batch_errors.append((line, error))
+                else:
+                    rows.append(row)
+                    lines.append(line)
+            bookings, errors = self.validate(rows)
+            if not self.dry_run:
+                with transaction.atomic():
+                    if self.reserve_tickets:
+                        bookings = self._reserve(bookings, errors)
+                    Booking.objects.bulk_create(booking for _, booking in bookings)
+                    invalidate_upcoming_summaries(booking.user_id for _, booking in bookings)
+            batch_errors.extend((lines[index], " ".join(messages)) for index, messages in errors.items())
+            for line, message in sorted(batch_errors):
+                result.add_error(line, message)
+            result.created += len(bookings)
+        return result
+
+    def validate(self, rows):
+        """ Validates a batch of row dicts. Returns (row index, Booking) pairs for the
+            valid rows and {row index: [messages]} for the others.
+        """
+        errors = {}
+        field = Booking._meta.get_field
+        usernames = text_column(rows, "username", errors, get_user_model()._meta.get_field("username").max_length)
+        event_ids = integer_column(rows, "event_id", errors, minimum=1)
+        quantities = integer_column(rows, "quantity", errors, minimum=1)
+        statuses = text_column(rows, "status", errors, field("status").max_length, required=False)
+        price_field = field("total_price")
+        prices = decimal_column(rows, "total_price", errors, price_field.max_digits, price_field.decimal_places, default=None)
+        payment_ids = text_column(rows, "payment_id", errors, field("stripe_payment_intent_id").max_length, required=False)
+
+        # One query each for the users and events of the whole batch
+        users = dict(get_user_model().objects.filter(username__in=set(usernames)).values_list("username", "pk"))
+        events = Event.objects.only("pk", "price", "inventory_shards").in_bulk({pk for pk in event_ids if pk})
+
+        bookings = []
+        for index, (username, event_id, quantity, status, price, payment_id) in enumerate(
+            zip(usernames, event_ids, quantities, statuses, prices, payment_ids)
+        ):
+            status = (status or Booking.Status.CONFIRMED).lower()
+            if username and username not in users:
+                errors.setdefault(index, []).append(f"username: No user '{username}'.")
+            if event_id and event_id not in events:
+                errors.setdefault(index, []).append(f"event_id: No event {event_id}.")
+            if status not in IMPORTABLE_STATUSES:
+                errors.setdefault(index, []).append(
+                    f"status: '{status}' is not one of {', '.join(IMPORTABLE_STATUSES)}."
+                )
+            if index in errors:
+                continue
+            event = events[event_id]
+            bookings.append((index, Booking(
+                user_id=users[username],
+                event=event,
+                quantity=quantity,
+                total_price=price if price is not None else event.price * quantity,
+                status=status,
+                stripe_payment_intent_id=payment_id or None,
+            )))
+        return bookings, errors
+
+    def _reserve(self, bookings, errors):
+        """ Takes the tickets of the confirmed bookings from their events' inventory.
+            Returns the bookings that got their tickets; the others get an error.
+        """
+        by_event = {}
+        for index, booking in bookings:
+            if booking.status == Booking.Status.CONFIRMED:
+                by_event.setdefault(booking.event_id, []).append((index, booking))
+        refused = set()
+        for event_bookings in by_event.values():
+            event = event_bookings[0][1].event
+            # Historical bookings of past events take their tickets too, so no date check.
+            # One UPDATE for all of the event's bookings in the batch...
+            quantity = sum(booking.quantity for _, booking in event_bookings)
+            if not inventory.reserve_tickets(event, quantity, upcoming_only=False):
+                # ...or, if they do not all fit, as many of them as still fit, one by one
+                for index, booking in event_bookings:
+                    if not inventory.reserve_tickets(event, booking.quantity, upcoming_only=False):
+                        errors.setdefault(index, []).append(
+                            f"quantity: Not enough tickets left for event {event.pk}."
+                        )
+                        refused.add(index)
+            if any(index not in refused for index, _ in event_bookings):
+                # Published through transaction.on_commit: only once the batch is committed
+                notify_availability_changed(event.pk)
+        return [(index, booking) for index, booking in bookings if index not in refused]
@@ -0,0 +1,103 @@
+# bookings/mailer.py
+""" Bulk sending of ticket emails over a reused mail connection.
+
+    send_ticket_email() opens and closes an SMTP (and TLS) session for every
+    ticket. send_ticket_emails() renders the emails in batches and sends each batch
+    over one open connection, reconnecting when the server drops it, and reports
+    the outcome per booking instead of stopping at the first failure.
+"""
+import smtplib
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+from .utils import build_ticket_email
+
+# Errors that mean the connection itself is unusable (as opposed to a rejected message)
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+class TicketMailReport:
+    """ Outcome of a bulk send: which bookings were emailed and which failed (with why). """
+
+    def __init__(self):
+        self.sent = [] # Booking primary keys that were sent
+        self.failed = {} # Booking primary key -> error message
+
+    def __repr__(self):
+        return f"<TicketMailReport sent={len(self.sent)} failed={len(self.failed)}>"
+
+
+def send_ticket_emails(bookings, batch_size=None, connection=None):
+    """ Emails the tickets of many bookings, reusing one mail connection per batch.
+        `bookings` may be any iterable (e.g. `queryset.iterator()`); it is consumed
+        `batch_size` bookings at a time, so memory stays bounded by one batch of
+        rendered emails. Each batch is sent over a single connection session
+        (many SMTP servers cap the messages accepted per session).
+        Returns a TicketMailReport.
+    """
+    batch_size = batch_size or settings.TICKET_EMAIL_BATCH_SIZE
+    connection = connection or get_connection()
+    report = TicketMailReport()
+
+    bookings = iter(bookings)
+    while True:
+        batch = list(islice(bookings, batch_size))
+        if not batch:
+            break
+
+        # Render first, so template/PDF errors are reported per booking and do not
+        # hold the connection open while WeasyPrint runs
+        messages = []
+        for booking in batch:
+            try:
+                messages.append((booking, build_ticket_email(booking)))
+            except Exception as e:
+                report.failed[booking.pk] = f"Rendering failed: {e}"
+
+        if messages:
+            _send_batch(connection, messages, report)
+
+    return report
+
+
+def _send_batch(connection, messages, report):
+    """ Sends one batch of (booking, message) pairs over a single connection session. """
+    try:
+        connection.open()
+        for booking, message in messages:
+            try:
+                _send_one(connection, message)
+            except CONNECTION_ERRORS as e:
+                # The server dropped us (idle timeout, message cap...); reconnect and retry once
+                print(f"Mail connection lost while sending booking {booking.pk}, reconnecting: {e}")
+                try:
+                    connection.close()
+                    connection.open()
+                    _send_one(connection, message)
+                except Exception as retry_error:
+                    report.failed[booking.pk] = str(retry_error)
+                    continue
+            except Exception as e:
+                # Rejected recipient or message; the connection is still usable
+                report.failed[booking.pk] = str(e)
+                continue
+            report.sent.append(booking.pk)
+    except Exception as e:
+        # Could not even open the connection: the whole batch failed
+        for booking, _ in messages:
+            if booking.pk not in report.failed and booking.pk not in report.sent:
+                report.failed[booking.pk] = f"Connection failed: {e}"
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass # Closing a broken connection must not mask the report
+
+
+def _send_one(connection, message):
+    """ Sends a single message over an already open connection. """
+    message.connection = connection
+    if not connection.send_messages([message]):
+        raise smtplib.SMTPException("Message was not accepted by the mail backend.")
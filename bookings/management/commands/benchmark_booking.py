@@ -0,0 +1,173 @@
+# bookings/management/commands/benchmark_booking.py
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction, DatabaseError
+from django.utils import timezone
+
+from bookings.models import Booking
+from bookings.services import create_pending_booking, InsufficientTicketsError
+from events.models import Event
+from events import inventory
+
+
+def _book_locked(user, event_pk, quantity):
+    """ The original create_booking flow: fetch, SELECT ... FOR UPDATE, check,
+        create the booking and save() the event (which re-runs full_clean()).
+    """
+    with transaction.atomic():
+        Event.objects.get(pk=event_pk, date__gte=timezone.now())
+        event_locked = Event.objects.select_for_update().get(pk=event_pk)
+        if event_locked.available_tickets < quantity:
+            return False
+        Booking.objects.create(
+            user=user, event=event_locked, quantity=quantity, status=Booking.Status.PENDING,
+        )
+        event_locked.available_tickets -= quantity
+        event_locked.save()
+    return True
+
+
+def _book_conditional(user, event_pk, quantity):
+    """ The current flow: fetch the event, then one conditional UPDATE plus the INSERT. """
+    event = Event.objects.get(pk=event_pk, date__gte=timezone.now())
+    try:
+        create_pending_booking(user, event, quantity)
+    except InsufficientTicketsError:
+        return False
+    return True
+
+
+def _percentile(sorted_values, percent):
+    """ Nearest-rank percentile of an already sorted list. """
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class Command(BaseCommand):
+    """ Fires concurrent bookings at a single event and compares the original
+        lock-based booking path with the conditional-UPDATE path.
+
+        Example:
+            python manage.py benchmark_booking --threads 32 --bookings 5000 --shards 16
+
+        A throwaway event and user are created for each run and deleted afterwards.
+        Note that SQLite only allows one writer at a time, so run this against the
+        production database engine (e.g. PostgreSQL) for representative numbers.
+    """
+    help = "Benchmark concurrent booking throughput and latency (locked vs. conditional UPDATE path)."
+
+    PATHS = {
+        "locked": _book_locked,
+        "conditional": _book_conditional,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16, help="Number of concurrent booking threads.")
+        parser.add_argument("--bookings", type=int, default=1000, help="Booking attempts per path.")
+        parser.add_argument("--quantity", type=int, default=1, help="Tickets per booking attempt.")
+        parser.add_argument(
+            "--tickets", type=int, default=None,
+            help="Tickets on sale (default: enough for every attempt to succeed).",
+        )
+        parser.add_argument(
+            "--shards", type=int, default=0,
+            help="Split the conditional path's event into this many inventory shards.",
+        )
+        parser.add_argument(
+            "--paths", default="locked,conditional",
+            help="Comma-separated booking paths to run (locked, conditional).",
+        )
+
+    def handle(self, *args, **options):
+        user, _ = get_user_model().objects.get_or_create(
+            username="benchmark_booking_user", defaults={"email": "benchmark@example.com"}
+        )
+        tickets = options["tickets"] or options["bookings"] * options["quantity"]
+
+        for name in options["paths"].split(","):
+            name = name.strip()
+            if name not in self.PATHS:
+                self.stderr.write(f"Unknown path '{name}', skipping.")
+                continue
+
+            event = Event.objects.create(
+                title=f"Benchmark event ({name})",
+                category="Benchmark",
+                date=timezone.now() + timedelta(days=30),
+                location="Benchmark Arena",
+                price=10,
+                total_tickets=tickets,
+            )
+            if name == "conditional" and options["shards"]:
+                event = inventory.shard_event_inventory(event, options["shards"])
+            try:
+                results = self._run(self.PATHS[name], user, event.pk, options)
+                self._report(name, results, options)
+            finally:
+                event.delete() # Cascades to the benchmark bookings and shards
+
+        user.delete()
+
+    def _run(self, book, user, event_pk, options):
+        """ Runs the booking attempts across worker threads that start simultaneously. """
+        threads = options["threads"]
+        attempts = options["bookings"]
+        quantity = options["quantity"]
+        barrier = threading.Barrier(threads + 1)
+        lock = threading.Lock()
+        results = {"latencies": [], "booked": 0, "sold_out": 0, "errors": 0, "elapsed": 0.0}
+
+        def worker(count):
+            latencies, booked, sold_out, errors = [], 0, 0, 0
+            barrier.wait()
+            for _ in range(count):
+                started = time.perf_counter()
+                try:
+                    if book(user, event_pk, quantity):
+                        booked += 1
+                    else:
+                        sold_out += 1
+                except DatabaseError:
+                    errors += 1 # e.g. "database is locked" on SQLite, deadlocks elsewhere
+                latencies.append(time.perf_counter() - started)
+            connection.close() # Each thread owns its own connection
+            with lock:
+                results["latencies"].extend(latencies)
+                results["booked"] += booked
+                results["sold_out"] += sold_out
+                results["errors"] += errors
+
+        per_thread, extra = divmod(attempts, threads)
+        workers = [
+            threading.Thread(target=worker, args=(per_thread + (1 if i < extra else 0),))
+            for i in range(threads)
+        ]
+        for thread in workers:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        results["elapsed"] = time.perf_counter() - started
+        return results
+
+    def _report(self, name, results, options):
+        latencies = sorted(results["latencies"])
+        elapsed = results["elapsed"] or 1e-9
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Path: {name}"))
+        self.stdout.write(
+            f"  attempts={len(latencies)} booked={results['booked']} "
+            f"sold_out={results['sold_out']} errors={results['errors']} threads={options['threads']}"
+        )
+        self.stdout.write(
+            f"  throughput={results['booked'] / elapsed:.1f} bookings/sec "
+            f"p50={_percentile(latencies, 50) * 1000:.2f}ms "
+            f"p99={_percentile(latencies, 99) * 1000:.2f}ms "
+            f"max={(latencies[-1] if latencies else 0) * 1000:.2f}ms"
+        )
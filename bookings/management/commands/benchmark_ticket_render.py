@@ -0,0 +1,78 @@
+# bookings/management/commands/benchmark_ticket_render.py
+import time
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils import timezone
+from weasyprint import HTML, CSS
+
+from bookings.models import Booking
+from bookings.rendering import TicketRenderer, TICKET_CSS, TICKET_TEMPLATE
+from events.models import Event
+
+
+def _render_uncached(booking):
+    """ The original generate_ticket_pdf: template, stylesheet and fonts set up per ticket. """
+    html_string = render_to_string(TICKET_TEMPLATE, {"booking": booking})
+    html = HTML(string=html_string, base_url=settings.BASE_DIR)
+    css = CSS(string=TICKET_CSS, font_config=None)
+    pdf_file = BytesIO()
+    html.write_pdf(pdf_file, stylesheets=[css])
+    return pdf_file.getvalue()
+
+
+class Command(BaseCommand):
+    """ Micro-benchmark of per-ticket PDF render time: per-call setup versus a reused
+        TicketRenderer. Uses unsaved in-memory bookings, so no database rows are touched.
+
+        Example:
+            python manage.py benchmark_ticket_render --tickets 200
+    """
+    help = "Measure per-ticket PDF render time with and without the shared TicketRenderer."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tickets", type=int, default=100, help="Tickets rendered per variant.")
+
+    def handle(self, *args, **options):
+        bookings = self._sample_bookings(options["tickets"])
+
+        # Warm-up so one-off imports and font discovery do not skew the first variant
+        _render_uncached(bookings[0])
+
+        started = time.perf_counter()
+        for booking in bookings:
+            _render_uncached(booking)
+        self._report("per-call setup", started, len(bookings))
+
+        started = time.perf_counter()
+        renderer = TicketRenderer()
+        for _ in renderer.render_many(bookings):
+            pass
+        self._report("TicketRenderer.render_many", started, len(bookings))
+
+    def _sample_bookings(self, count):
+        """ Builds unsaved bookings with their user and event attached. """
+        user = get_user_model()(username="benchmark", email="benchmark@example.com")
+        event = Event(
+            pk=1, title="Benchmark Concert", category="Concert", location="Benchmark Arena",
+            date=timezone.now() + timedelta(days=30), price=25, total_tickets=count, available_tickets=0,
+        )
+        now = timezone.now()
+        return [
+            Booking(
+                pk=index + 1, user=user, event=event, quantity=2, total_price=50,
+                status=Booking.Status.CONFIRMED, created_at=now,
+            )
+            for index in range(count)
+        ]
+
+    def _report(self, name, started, count):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{name}: {count} ticket(s) in {elapsed:.2f}s, "
+            f"{elapsed / count * 1000:.2f}ms per ticket, {count / elapsed:.1f} tickets/sec"
+        )
@@ -0,0 +1,63 @@
+# bookings/management/commands/deliver_tickets.py
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from django.core.management.base import BaseCommand
+
+from bookings.delivery import claim_deliveries
+from bookings import workers as worker_entry_points
+
+
+class Command(BaseCommand):
+    """ Drains the ticket delivery queue with a pool of worker processes.
+
+        The parent process claims batches of due deliveries and hands them to the
+        pool; PDF rendering and SMTP happen in the workers. Failed deliveries are
+        retried with exponential backoff (see bookings/delivery.py).
+
+        Examples:
+            python manage.py deliver_tickets                      # drain once and exit
+            python manage.py deliver_tickets --loop --workers 4  # long-running worker
+    """
+    help = "Render and email queued tickets using a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="Worker processes.")
+        parser.add_argument("--batch-size", type=int, default=20, help="Deliveries handed to a worker at a time.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling the queue until interrupted.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls of an empty queue.")
+
+    def handle(self, *args, **options):
+        workers = max(1, options["workers"])
+        totals = {"sent": 0, "retried": 0, "failed": 0}
+        # Spawned (not forked) workers never share the parent's database connections
+        context = multiprocessing.get_context("spawn")
+        pending = set()
+
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=worker_entry_points.init_worker) as pool:
+                while True:
+                    # Keep every worker busy with one claimed batch
+                    while len(pending) < workers:
+                        pks = claim_deliveries(options["batch_size"])
+                        if not pks:
+                            break
+                        pending.add(pool.submit(worker_entry_points.deliver_tickets, pks))
+
+                    if pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            for key, value in future.result().items():
+                                totals[key] += value
+                    elif options["loop"]:
+                        time.sleep(options["interval"])
+                    else:
+                        break
+        except KeyboardInterrupt:
+            pass # Claimed but unsent deliveries become due again when their lease ends
+
+        self.stdout.write(
+            f"Ticket deliveries: {totals['sent']} sent, {totals['retried']} scheduled for retry, "
+            f"{totals['failed']} failed permanently."
+        )
@@ -0,0 +1,36 @@
+# bookings/management/commands/expire_holds.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.holds import release_expired_holds
+
+
+class Command(BaseCommand):
+    """ Cancels pending bookings whose seat hold has expired and releases their tickets.
+
+        Examples:
+            python manage.py expire_holds                 # one sweep (e.g. from cron)
+            python manage.py expire_holds --loop --interval 5
+    """
+    help = "Release the tickets of pending bookings whose hold has expired."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Bookings cancelled per transaction.")
+        parser.add_argument("--loop", action="store_true", help="Keep sweeping until interrupted.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between sweeps with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            cancelled = release_expired_holds(batch_size=options["batch_size"])
+            if cancelled or not options["loop"]:
+                self.stdout.write(
+                    f"Released {cancelled} expired hold(s) in {(time.perf_counter() - started) * 1000:.1f}ms."
+                )
+            if not options["loop"]:
+                return
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
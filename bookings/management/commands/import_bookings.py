@@ -0,0 +1,62 @@
+# bookings/management/commands/import_bookings.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.importing import BookingImporter
+from events.importing import FORMATS, detect_format, open_input, read_rows
+
+
+class Command(BaseCommand):
+    """ Imports bookings from a CSV file (with a header row) or a JSON Lines file,
+        streaming it in batches: rows are validated a batch at a time and inserted
+        with bulk_create (see bookings/importing.py). Invalid rows are reported with
+        their line number and skipped; the rest of the file is still imported.
+
+        Example:
+            python manage.py import_bookings bookings-2024.csv
+            python manage.py import_bookings bookings.jsonl --no-reserve
+
+        Columns: username, event_id, quantity and optionally status (confirmed or
+        cancelled), total_price and payment_id. The tickets of confirmed bookings are
+        taken from the events' availability unless --no-reserve is given (e.g. when
+        the events were imported with their remaining availability). No ticket emails
+        are sent for imported bookings.
+    """
+    help = "Bulk import bookings from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or - for standard input.")
+        parser.add_argument("--format", choices=FORMATS, default=None, help="Input format (default: from the extension).")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows validated and inserted per batch.")
+        parser.add_argument(
+            "--no-reserve", action="store_true", help="Do not take the tickets from the events' availability.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Validate only, insert nothing.")
+        parser.add_argument("--max-errors", type=int, default=100, help="Row errors listed in the output.")
+
+    def handle(self, *args, **options):
+        try:
+            format = detect_format(options["path"], options["format"])
+            file = open_input(options["path"])
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+
+        importer = BookingImporter(
+            batch_size=options["batch_size"], reserve_tickets=not options["no_reserve"],
+            dry_run=options["dry_run"], max_errors=options["max_errors"],
+        )
+        started = time.perf_counter()
+        with file:
+            result = importer.run(read_rows(file, format))
+        elapsed = time.perf_counter() - started
+
+        for line, message in result.errors:
+            self.stderr.write(f"Line {line}: {message}")
+        if result.failed > len(result.errors):
+            self.stderr.write(f"... and {result.failed - len(result.errors)} more invalid row(s).")
+        verb = "Validated" if options["dry_run"] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result.created} of {result.rows} booking(s), {result.failed} invalid, "
+            f"in {elapsed:.1f}s ({result.rows / (elapsed or 1e-9):.0f} rows/sec)."
+        ))
@@ -0,0 +1,42 @@
+# bookings/management/commands/resend_tickets.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.models import Booking
+from bookings.mailer import send_ticket_emails
+from events.models import Event
+
+
+class Command(BaseCommand):
+    """ Re-sends the ticket emails of every confirmed booking for an event
+        (e.g. after a venue or time change), reusing mail connections in batches.
+
+        Example:
+            python manage.py resend_tickets 42 --batch-size 100
+    """
+    help = "Resend ticket emails for all confirmed bookings of an event."
+
+    def add_arguments(self, parser):
+        parser.add_argument("event_pk", type=int, help="Primary key of the event.")
+        parser.add_argument("--batch-size", type=int, default=None, help="Emails per mail connection session.")
+
+    def handle(self, *args, **options):
+        if not Event.objects.filter(pk=options["event_pk"]).exists():
+            raise CommandError(f"Event {options['event_pk']} does not exist.")
+
+        bookings = (
+            Booking.objects.filter(event_id=options["event_pk"], status=Booking.Status.CONFIRMED)
+            .select_related("user", "event")
+            .order_by("pk")
+            .iterator(chunk_size=500)
+        )
+        started = time.perf_counter()
+        report = send_ticket_emails(bookings, batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - started
+
+        for booking_pk, error in report.failed.items():
+            self.stderr.write(f"Booking {booking_pk}: {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {len(report.sent)} ticket email(s), {len(report.failed)} failed, in {elapsed:.1f}s."
+        ))
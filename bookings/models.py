@@ -2,6 +2,7 @@
 from django.db import models
 from django.conf import settings # To link to the User model (settings.AUTH_USER_MODEL)
 from django.core.validators import MinValueValidator # To ensure quantity is at least 1
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _ # For internationalization of choices
 
 # Import Event model using a direct import or string reference
@@ -64,6 +65,13 @@ class Booking(models.Model):
         auto_now=True, # Automatically set whenever the object is saved
         help_text="Timestamp when the booking was last updated."
     )
+    # Deadline of the seat hold for pending bookings; expired holds are released by
+    # `manage.py expire_holds` (see bookings/holds.py)
+    expires_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When the seat hold of a pending booking expires and its tickets are released."
+    )
     # Field to store the Stripe Session ID or Payment Intent ID for reference
     stripe_payment_intent_id = models.CharField(
         max_length=255, 
@@ -71,6 +79,19 @@ class Booking(models.Model):
         null=True, # Can be null initially
         help_text="Stripe Payment Intent ID or Session ID associated with this booking."
     )
+    # Set when a payment arrived after the hold expired and the seats were resold: the
+    # booking stays cancelled and the captured charge must be refunded by finance
+    refund_required = models.BooleanField(
+        default=False,
+        help_text="Paid after its seat hold expired and the tickets were gone; the payment must be refunded."
+    )
+    # Expiry of the open checkout session stored in stripe_payment_intent_id; until then
+    # reloading the payment page reuses that session instead of creating a new one
+    checkout_expires_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When the open checkout session of this pending booking expires."
+    )
 
     def __str__(self):
         """ String representation of the Booking object. """
@@ -91,9 +112,77 @@ class Booking(models.Model):
         ordering = ["-created_at"] # Default ordering for bookings (most recent first)
         verbose_name = "Booking"
         verbose_name_plural = "Bookings"
+        indexes = [
+            # Lets the expiry sweeper find expired pending holds without scanning all bookings
+            models.Index(fields=["status", "expires_at"], name="booking_status_expires_idx"),
+            # Serves the keyset-paginated booking history of a user (bookings/history.py)
+            models.Index(fields=["user", "-created_at", "-id"], name="booking_user_created_idx"),
+        ]
         # Optional: Ensure a user cannot double-book the exact same event in pending state
         # Consider constraints based on your specific business logic
         # unique_together = (
         #     ("user", "event", "status"), # Example: Prevent duplicate pending bookings
         # )
 
+
+
+class TicketDelivery(models.Model):
+    """ A queued ticket delivery (PDF rendering + email) for a confirmed booking.
+        Rows are written in the same transaction that confirms the booking and are
+        drained by `manage.py deliver_tickets` (see bookings/delivery.py), so the
+        payment webhook never renders PDFs or talks to SMTP itself.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", _("Pending")
+        SENT = "sent", _("Sent")
+        FAILED = "failed", _("Failed") # Gave up after TICKET_DELIVERY_MAX_ATTEMPTS
+
+    booking = models.ForeignKey(
+        Booking,
+        on_delete=models.CASCADE, # Nothing to deliver once the booking is gone
+        related_name="deliveries", # Allows accessing booking.deliveries
+        help_text="The booking whose ticket should be delivered."
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+        help_text="The current state of this delivery."
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of delivery attempts made so far."
+    )
+    # Earliest time a worker may (re)try this delivery. Claiming a delivery pushes it
+    # into the future as a lease, so a crashed worker's deliveries become visible again.
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When this delivery becomes due for the next attempt."
+    )
+    last_error = models.TextField(
+        blank=True,
+        help_text="Error message of the most recent failed attempt."
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp when the delivery was queued."
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Timestamp when the delivery was last updated."
+    )
+
+    def __str__(self):
+        """ String representation of the TicketDelivery object. """
+        return f"Delivery {self.id} for booking {self.booking_id} ({self.status})"
+
+    class Meta:
+        """ Meta options for the TicketDelivery model. """
+        ordering = ["next_attempt_at"]
+        verbose_name = "Ticket Delivery"
+        verbose_name_plural = "Ticket Deliveries"
+        indexes = [
+            # Lets workers find due deliveries without scanning the whole queue
+            models.Index(fields=["status", "next_attempt_at"], name="delivery_status_due_idx"),
+        ]
@@ -0,0 +1,131 @@
+# bookings/rendering.py
+""" PDF ticket rendering with WeasyPrint.
+
+    Parsing the stylesheet, setting up the font configuration and loading the ticket
+    template are the same for every ticket, so TicketRenderer does them once and
+    reuses them for each render. A process-wide instance is available through
+    get_ticket_renderer(); generate_ticket_pdf() in bookings/utils.py uses it.
+    render_tickets_parallel() spreads large batches across worker processes.
+"""
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from io import BytesIO
+from itertools import islice
+
+from django.conf import settings
+from django.template.loader import get_template
+from weasyprint import HTML, CSS
+from weasyprint.text.fonts import FontConfiguration
+
+TICKET_TEMPLATE = "bookings/ticket_template.html"
+
+# Basic CSS for the PDF
+TICKET_CSS = """
+    @page { size: A6; margin: 0.5cm; }
+    body { font-family: 'Noto Sans CJK SC', 'WenQuanYi Zen Hei', sans-serif; font-size: 10pt; }
+    h1 { font-size: 16pt; text-align: center; margin-bottom: 1cm; color: #333; }
+    .ticket-info { border: 1px solid #ccc; padding: 0.5cm; border-radius: 5px; background-color: #f9f9f9; }
+    .ticket-info p { margin: 0.2cm 0; }
+    .ticket-info strong { color: #555; }
+    .footer { text-align: center; font-size: 8pt; color: #777; margin-top: 1cm; }
+"""
+
+
+class TicketRenderer:
+    """ Renders booking tickets to PDF, preparing the shared resources only once. """
+
+    def __init__(self, template_name=TICKET_TEMPLATE, css=TICKET_CSS):
+        # Font lookups are cached by the FontConfiguration, so share one across renders
+        self.font_config = FontConfiguration()
+        self.stylesheet = CSS(string=css, font_config=self.font_config)
+        self.template = get_template(template_name)
+        self.base_url = str(settings.BASE_DIR)
+        # Changes whenever the template or stylesheet changes; part of the PDF cache key
+        self.version = hashlib.sha256((css + self.template.template.source).encode()).hexdigest()[:12]
+
+    def render(self, booking):
+        """ Renders the ticket of a single booking and returns the PDF as bytes. """
+        html_string = self.template.render({"booking": booking})
+        pdf_file = BytesIO()
+        HTML(string=html_string, base_url=self.base_url).write_pdf(
+            pdf_file, stylesheets=[self.stylesheet], font_config=self.font_config
+        )
+        return pdf_file.getvalue()
+
+    def render_many(self, bookings):
+        """ Renders the tickets of many bookings, yielding (booking, pdf_bytes) pairs.
+            Bookings should be fetched with select_related("user", "event") to avoid
+            a query per ticket.
+        """
+        for booking in bookings:
+            yield booking, self.render(booking)
+
+
+_renderer = None
+
+
+def get_ticket_renderer():
+    """ Returns the process-wide TicketRenderer, creating it on first use. """
+    global _renderer
+    if _renderer is None:
+        _renderer = TicketRenderer()
+    return _renderer
+
+
+def ticket_filename(booking):
+    """ File name used for a booking's PDF ticket (email attachments, exports). """
+    return f"ticket_booking_{booking.pk}_event_{booking.event_id}.pdf"
+
+
+def render_tickets_parallel(queryset, output_dir=None, zip_file=None, workers=None, chunk_size=50):
+    """ Renders the tickets of every booking in `queryset` across worker processes.
+        Booking primary keys are streamed from the database and handed to the pool
+        in chunks of `chunk_size`; each worker loads its chunk with the related user
+        and event and renders it with its own TicketRenderer. With `output_dir` the
+        workers write the PDFs straight into that directory; with `zip_file` (an open
+        zipfile.ZipFile) they return the PDFs and this process adds them to the archive.
+        Returns a dict with the number of tickets, total PDF bytes and elapsed seconds.
+    """
+    # Imported here so spawned workers can import this module before Django is set up
+    from . import workers as worker_entry_points
+
+    if (output_dir is None) == (zip_file is None):
+        raise ValueError("Pass exactly one of output_dir or zip_file.")
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    workers = workers or multiprocessing.cpu_count()
+
+    stats = {"tickets": 0, "bytes": 0, "elapsed": 0.0}
+    started = time.perf_counter()
+    booking_pks = queryset.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=chunk_size * workers)
+    pending = set()
+
+    def collect(done):
+        for future in done:
+            for filename, size, pdf in future.result():
+                stats["tickets"] += 1
+                stats["bytes"] += size
+                if zip_file is not None:
+                    zip_file.writestr(filename, pdf)
+
+    context = multiprocessing.get_context("spawn") # Never share the parent's DB connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=worker_entry_points.init_worker) as pool:
+        while True:
+            # Keep at most two chunks per worker in flight so memory stays bounded
+            while len(pending) < workers * 2:
+                chunk = list(islice(booking_pks, chunk_size))
+                if not chunk:
+                    break
+                pending.add(pool.submit(
+                    worker_entry_points.render_tickets, chunk, str(output_dir) if output_dir else None
+                ))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
@@ -0,0 +1,123 @@
+# bookings/services.py
+""" Booking business logic shared by views, management commands and benchmarks. """
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .delivery import enqueue_ticket_deliveries
+from .history import invalidate_upcoming_summaries
+from .models import Booking
+from events import inventory # Conditional-UPDATE / sharded ticket inventory
+from events.availability import notify_availability_changed
+from events.models import Event
+
+logger = logging.getLogger(__name__)
+
+
+class BookingError(Exception):
+    """ Base class for errors raised while creating a booking. """
+    pass
+
+
+class InsufficientTicketsError(BookingError):
+    """ Raised when an event does not have enough tickets left for a booking. """
+
+    def __init__(self, available):
+        self.available = available
+        super().__init__(f"Only {available} ticket(s) are available for this event.")
+
+
+def create_pending_booking(user, event, quantity):
+    """ Reserves `quantity` tickets for an upcoming event and creates a pending booking
+        whose seat hold expires after BOOKING_HOLD_MINUTES.
+        The reservation is a single conditional UPDATE on the inventory (no
+        SELECT ... FOR UPDATE, no Event.save()/full_clean()), followed by one INSERT
+        for the booking, both inside one transaction. `event` must be an Event
+        instance that is already loaded, so the booking's total price is computed
+        from it without another query.
+        Raises InsufficientTicketsError if the tickets could not be reserved.
+    """
+    with transaction.atomic():
+        if not inventory.reserve_tickets(event, quantity):
+            raise InsufficientTicketsError(_current_availability(event))
+
+        # Push the new count to live availability streams once the transaction commits
+        notify_availability_changed(event.pk)
+        return Booking.objects.create(
+            user=user,
+            event=event,
+            quantity=quantity,
+            status=Booking.Status.PENDING, # Initial status is pending
+            # Hold the seats for a limited time; abandoned checkouts are released by the sweeper
+            expires_at=timezone.now() + timedelta(minutes=settings.BOOKING_HOLD_MINUTES),
+            # total_price is calculated in Booking.save() from the already loaded event
+        )
+
+
+def confirm_paid_bookings(payment_intents, batch_size=500):
+    """ Confirms many paid bookings at once and queues their ticket deliveries.
+        `payment_intents` maps booking pk -> the provider's payment id. The bookings
+        are read with one query (no per-booking event or user load), updated with
+        bulk_update and their deliveries inserted with bulk_create, all in one
+        transaction. total_price is left alone: it was fixed when the booking was made.
+        Bookings that were cancelled because their hold expired while the customer
+        paid get their tickets back if still available; otherwise they stay cancelled
+        and are flagged `refund_required`, with the payment id, for finance.
+        Returns the set of booking pks that were confirmed; bookings that are missing
+        or were already confirmed are skipped.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        bookings = list(
+            Booking.objects.select_for_update()
+            .filter(pk__in=payment_intents)
+            .only("pk", "user_id", "event_id", "quantity", "status", "expires_at", "refund_required")
+        )
+
+        # Rare path: holds that expired mid-payment, one conditional UPDATE each
+        expired = [b for b in bookings if b.status == Booking.Status.CANCELLED and b.expires_at]
+        if expired:
+            events = Event.objects.only("pk", "inventory_shards").in_bulk({b.event_id for b in expired})
+            refunds = []
+            for booking in expired:
+                if inventory.reserve_tickets(events[booking.event_id], booking.quantity):
+                    booking.status = Booking.Status.PENDING
+                    notify_availability_changed(booking.event_id)
+                else:
+                    # The customer was charged for tickets that were resold: record it durably
+                    booking.refund_required = True
+                    booking.stripe_payment_intent_id = payment_intents[booking.pk]
+                    booking.updated_at = now
+                    refunds.append(booking)
+                    logger.error(
+                        "Booking %s was paid (%s) after its hold expired and the tickets are gone. Refund required.",
+                        booking.pk, booking.stripe_payment_intent_id,
+                    )
+            Booking.objects.bulk_update(refunds, ["refund_required", "stripe_payment_intent_id", "updated_at"])
+
+        confirmed = [b for b in bookings if b.status == Booking.Status.PENDING]
+        for booking in confirmed:
+            booking.status = Booking.Status.CONFIRMED
+            booking.refund_required = False # A late payment that did get its tickets back
+            booking.stripe_payment_intent_id = payment_intents[booking.pk]
+            booking.checkout_expires_at = None # The checkout session is used up
+            booking.updated_at = now # bulk_update() does not apply auto_now
+        Booking.objects.bulk_update(
+            confirmed, ["status", "refund_required", "stripe_payment_intent_id", "checkout_expires_at", "updated_at"],
+            batch_size=batch_size,
+        )
+        enqueue_ticket_deliveries([b.pk for b in confirmed], batch_size=batch_size)
+        # bulk_update() sends no post_save, so drop the dashboard summaries here
+        invalidate_upcoming_summaries([b.user_id for b in confirmed])
+    return {b.pk for b in confirmed}
+
+
+def _current_availability(event):
+    """ Re-reads the availability of an event after a failed reservation (error path only). """
+    if event.inventory_shards:
+        return inventory.get_available_tickets(event)
+    event.refresh_from_db(fields=["available_tickets"])
+    return event.available_tickets
@@ -0,0 +1,32 @@
+# bookings/signals.py
+""" Signal handlers connected in BookingsConfig.ready(). """
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .history import invalidate_upcoming_summaries
+from .models import Booking
+from .ticket_cache import get_ticket_cache
+from events.models import Event
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_booking_ticket(sender, instance, created=False, **kwargs):
+    """ Drops the cached PDF ticket and the owner's dashboard summary of a booking
+        that changed or was deleted.
+    """
+    cache = get_ticket_cache()
+    if cache and not created: # A brand-new booking cannot have a cached ticket yet
+        cache.invalidate_booking(instance)
+    invalidate_upcoming_summaries([instance.user_id])
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event_tickets(sender, instance, created=False, **kwargs):
+    """ Drops every cached PDF ticket of an event that changed or was deleted
+        (title, date and location are printed on the tickets).
+    """
+    cache = get_ticket_cache()
+    if cache and not created:
+        cache.invalidate_event(instance.pk)
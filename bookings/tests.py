@@ -1,3 +1,570 @@
-from django.test import TestCase
+# bookings/tests.py
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from events.models import Event
+from monitoring.testing import QueryBudgetTestMixin
+from payments.inbox import process_webhook_inbox
+from payments.processors import reset_payment_processors
+from .delivery import claim_deliveries, deliver_batch, retry_delay
+from .export import EXPORT_COLUMNS, encode_rows
+from .holds import release_expired_holds
+from .importing import BookingImporter
+from .mailer import TicketMailReport
+from .models import Booking, TicketDelivery
+from .services import InsufficientTicketsError, create_pending_booking
+from .ticket_cache import TicketPDFCache
+from .waiting_room import (
+    ADMISSION_COOKIE, ADMISSION_SALT, SQLiteWaitingRoom, get_waiting_room, reset_waiting_room, set_token_cookie,
+)
+
+
+class BookingListQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """ The booking history stays within its declared @query_budget on every page. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("buyer", "buyer@example.com", "password")
+        for number in range(30):
+            event = Event.objects.create(
+                title=f"Concert {number}", category="Concert",
+                date=timezone.now() + timedelta(days=number + 1), location="Main Hall",
+                price=25, total_tickets=100, available_tickets=99,
+            )
+            Booking.objects.create(user=cls.user, event=event, quantity=1, total_price=25)
+
+    def setUp(self):
+        cache.clear() # Measure the summary cache miss too
+        self.client.force_login(self.user)
+
+    def test_booking_list(self):
+        response = self.client.get(reverse("booking_list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_create_booking(self):
+        event = Event.objects.filter(available_tickets__gt=0).first()
+        response = self.client.post(reverse("create_booking", kwargs={"event_pk": event.pk}), {"quantity": 1})
+        self.assertEqual(resolve(response.url).url_name, "initiate_payment")
+        self.assertWithinQueryBudget(response)
+
+    def test_booking_list_next_page(self):
+        first = self.client.get(reverse("booking_list"))
+        self.assertIsNotNone(first.context["next_cursor"])
+        response = self.client.get(reverse("booking_list"), {"after": first.context["next_cursor"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+
+class BookingImporterTests(TestCase):
+    """ Imported confirmed bookings take their tickets, for past events as well. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("buyer", "buyer@example.com", "password")
+        cls.past_event = Event.objects.create(
+            title="Last season", category="Concert", date=timezone.now() - timedelta(days=30),
+            location="Main Hall", price=25, total_tickets=10, available_tickets=10,
+        )
+
+    def import_rows(self, *rows):
+        return BookingImporter().run((line, row, None) for line, row in enumerate(rows, start=2))
+
+    def test_past_event_takes_tickets(self):
+        result = self.import_rows({"username": "buyer", "event_id": self.past_event.pk, "quantity": 3})
+        self.assertEqual((result.created, result.errors), (1, []))
+        self.past_event.refresh_from_db()
+        self.assertEqual(self.past_event.available_tickets, 7)
+
+    def test_refuses_what_does_not_fit(self):
+        result = self.import_rows(
+            {"username": "buyer", "event_id": self.past_event.pk, "quantity": 8},
+            {"username": "buyer", "event_id": self.past_event.pk, "quantity": 4},
+        )
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [(3, f"quantity: Not enough tickets left for event {self.past_event.pk}.")])
+        self.past_event.refresh_from_db()
+        self.assertEqual(self.past_event.available_tickets, 2)
+
+
+class ExportTests(SimpleTestCase):
+    """ CSV cells that a spreadsheet would evaluate as formulas are exported as text. """
+
+    def test_csv_escapes_formulas(self):
+        row = (1, "=HYPERLINK(\"http://example.com\")", "+1", "-2", "@SUM(A1)", "Plain", Decimal("-5.00"))
+        lines = list(encode_rows([row], "csv"))
+        self.assertEqual(
+            next(csv.reader(lines[1:])),
+            ["1", "'=HYPERLINK(\"http://example.com\")", "'+1", "'-2", "'@SUM(A1)", "Plain", "-5.00"],
+        )
+
+    def test_jsonl_is_unchanged(self):
+        row = ("=1+1",) + (None,) * (len(EXPORT_COLUMNS) - 1)
+        self.assertIn('"booking_id": "=1+1"', next(encode_rows([row], "jsonl")))
+
+
+@override_settings(
+    PAYMENT_PROCESSOR="fake",
+    PAYMENT_PROCESSORS={"fake": {
+        "CLASS": "payments.processors.FakePaymentProcessor",
+        "OPTIONS": {"webhook_secret": "test_webhook_secret"},
+    }},
+)
+class LatePaymentTests(TestCase):
+    """ A payment that arrives after the hold expired and the seats were resold
+        flags the booking for a refund instead of taking tickets.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.late_buyer = User.objects.create_user("late", "late@example.com", "password")
+        cls.other_buyer = User.objects.create_user("other", "other@example.com", "password")
+        cls.event = Event.objects.create(
+            title="Concert", category="Concert", date=timezone.now() + timedelta(days=7),
+            location="Main Hall", price=25, total_tickets=2, available_tickets=2,
+        )
+
+    def setUp(self):
+        reset_payment_processors()
+        self.addCleanup(reset_payment_processors)
+
+    def pay(self, booking, payment_intent):
+        payload = {
+            "id": f"evt_{payment_intent}",
+            "type": "checkout.session.completed",
+            "data": {"object": {
+                "id": f"cs_{payment_intent}",
+                "payment_status": "paid",
+                "payment_intent": payment_intent,
+                "metadata": {"booking_pk": str(booking.pk)},
+            }},
+        }
+        response = self.client.post(
+            reverse("payment_webhook", kwargs={"provider": "fake"}), json.dumps(payload),
+            content_type="application/json", HTTP_X_FAKE_WEBHOOK_SECRET="test_webhook_secret",
+        )
+        self.assertEqual(response.status_code, 200)
+        process_webhook_inbox()
+
+    def test_paid_after_seats_were_resold(self):
+        late = create_pending_booking(self.late_buyer, self.event, 2)
+        self.assertEqual(release_expired_holds(now=timezone.now() + timedelta(days=1)), 1)
+        resold = create_pending_booking(self.other_buyer, self.event, 2)
+
+        with self.assertLogs("bookings.services", "ERROR"):
+            self.pay(late, "pi_late")
+
+        late.refresh_from_db()
+        self.assertEqual(late.status, Booking.Status.CANCELLED)
+        self.assertTrue(late.refund_required)
+        self.assertEqual(late.stripe_payment_intent_id, "pi_late")
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, 0) # No tickets taken for the late payment
+        resold.refresh_from_db()
+        self.assertEqual(resold.status, Booking.Status.PENDING)
+        self.assertFalse(resold.refund_required)
+
+    def test_paid_after_expiry_with_seats_left(self):
+        late = create_pending_booking(self.late_buyer, self.event, 2)
+        release_expired_holds(now=timezone.now() + timedelta(days=1))
+
+        self.pay(late, "pi_late")
+
+        late.refresh_from_db()
+        self.assertEqual(late.status, Booking.Status.CONFIRMED)
+        self.assertFalse(late.refund_required)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, 0)
+
+
+class CreatePendingBookingTests(TestCase):
+    """ The conditional UPDATE reserves tickets only while enough are left. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("buyer", "buyer@example.com", "password")
+        cls.event = Event.objects.create(
+            title="Concert", category="Concert", date=timezone.now() + timedelta(days=7),
+            location="Main Hall", price=25, total_tickets=5, available_tickets=5,
+        )
+
+    def assertAvailable(self, count):
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, count)
+
+    def test_reserves_tickets(self):
+        booking = create_pending_booking(self.user, self.event, 2)
+        self.assertEqual((booking.status, booking.quantity, booking.total_price), (Booking.Status.PENDING, 2, 50))
+        self.assertIsNotNone(booking.expires_at)
+        self.assertAvailable(3)
+
+    def test_oversell_is_refused(self):
+        with self.assertRaises(InsufficientTicketsError) as refused:
+            create_pending_booking(self.user, self.event, 6)
+        self.assertEqual(refused.exception.available, 5)
+        self.assertAvailable(5)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_exact_sellout(self):
+        create_pending_booking(self.user, self.event, 5)
+        self.assertAvailable(0)
+        with self.assertRaises(InsufficientTicketsError):
+            create_pending_booking(self.user, self.event, 1)
+        self.assertAvailable(0)
+
+    def test_past_event_is_refused(self):
+        Event.objects.filter(pk=self.event.pk).update(date=timezone.now() - timedelta(hours=1))
+        with self.assertRaises(InsufficientTicketsError):
+            create_pending_booking(self.user, self.event, 1)
+        self.assertAvailable(5)
+
+
+class LastSeatRaceTests(TransactionTestCase):
+    """ Two buyers racing for the last seat: one gets it, the count never goes below 0.
+        A TransactionTestCase, so each thread's connection sees the committed event.
+    """
+
+    def test_two_threads_race_for_the_last_seat(self):
+        User = get_user_model()
+        users = [User.objects.create_user(f"buyer{index}", f"buyer{index}@example.com", "password") for index in range(2)]
+        event = Event.objects.create(
+            title="Concert", category="Concert", date=timezone.now() + timedelta(days=7),
+            location="Main Hall", price=25, total_tickets=1, available_tickets=1,
+        )
+        start = threading.Barrier(len(users))
+        outcomes = []
+
+        def buy(user):
+            start.wait()
+            try:
+                for _ in range(50):
+                    try:
+                        create_pending_booking(user, event, 1)
+                        outcomes.append("booked")
+                        return
+                    except InsufficientTicketsError:
+                        outcomes.append("refused")
+                        return
+                    except OperationalError:
+                        # The in-memory SQLite test database locks whole tables without
+                        # waiting; the transaction was rolled back, so simply try again
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(outcomes), ["booked", "refused"])
+        event.refresh_from_db()
+        self.assertEqual(event.available_tickets, 0)
+        self.assertEqual(Booking.objects.filter(event=event).count(), 1)
+
+
+class ReleaseExpiredHoldsTests(TestCase):
+    """ The sweeper cancels expired pending holds and returns their tickets exactly once. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("buyer", "buyer@example.com", "password")
+        cls.event = Event.objects.create(
+            title="Concert", category="Concert", date=timezone.now() + timedelta(days=7),
+            location="Main Hall", price=25, total_tickets=10, available_tickets=10,
+        )
+
+    def assertAvailable(self, count):
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, count)
+
+    def test_expired_hold_is_cancelled_and_released(self):
+        booking = create_pending_booking(self.user, self.event, 3)
+        self.assertAvailable(7)
+        self.assertEqual(release_expired_holds(now=booking.expires_at + timedelta(seconds=1)), 1)
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, Booking.Status.CANCELLED)
+        self.assertAvailable(10)
+
+    def test_unexpired_and_confirmed_bookings_are_left_alone(self):
+        held = create_pending_booking(self.user, self.event, 2)
+        confirmed = create_pending_booking(self.user, self.event, 3)
+        Booking.objects.filter(pk=confirmed.pk).update(
+            status=Booking.Status.CONFIRMED, expires_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(release_expired_holds(now=held.expires_at - timedelta(seconds=1)), 0)
+        held.refresh_from_db()
+        confirmed.refresh_from_db()
+        self.assertEqual((held.status, confirmed.status), (Booking.Status.PENDING, Booking.Status.CONFIRMED))
+        self.assertAvailable(5)
+
+    def test_second_sweep_releases_nothing(self):
+        first = create_pending_booking(self.user, self.event, 2)
+        create_pending_booking(self.user, self.event, 4)
+        later = first.expires_at + timedelta(minutes=5)
+        self.assertEqual(release_expired_holds(now=later), 2)
+        self.assertAvailable(10)
+        self.assertEqual(release_expired_holds(now=later), 0)
+        self.assertAvailable(10)
+
+    def test_batches(self):
+        for _ in range(5):
+            create_pending_booking(self.user, self.event, 1)
+        later = timezone.now() + timedelta(days=1)
+        self.assertEqual(release_expired_holds(now=later, batch_size=2), 5)
+        self.assertAvailable(10)
+
+
+class SQLiteWaitingRoomTests(SimpleTestCase):
+    """ Queue order, admission rate, single-use tokens and pruning of the SQLite backend. """
+
+    def setUp(self):
+        self.room = SQLiteWaitingRoom(entry_seconds=600)
+        # 60 users per minute: one admission per second
+        self.tokens = [self.room.join(1, 60, now=1000) for _ in range(3)]
+
+    def positions(self, now):
+        return [self.room.status(1, token, now=now)["position"] for token in self.tokens]
+
+    def test_join_order(self):
+        self.assertEqual(self.positions(1000), [1, 2, 3])
+        self.assertEqual(self.room.status(1, self.tokens[2], now=1000)["eta_seconds"], 3)
+        self.assertIsNone(self.room.status(1, "unknown", now=1000))
+        self.assertIsNone(self.room.status(2, self.tokens[0], now=1000)) # Queues are per event
+
+    def test_admission_at_rate(self):
+        self.assertEqual(self.positions(1001), [0, 1, 2])
+        self.assertEqual(self.positions(1002.5), [0, 0, 1])
+        self.assertTrue(all(self.room.status(1, token, now=1010)["admitted"] for token in self.tokens))
+
+    def test_admission_never_runs_ahead_of_the_queue(self):
+        self.positions(2000) # Long idle period: everybody admitted
+        late = self.room.join(1, 60, now=2000)
+        self.assertFalse(self.room.status(1, late, now=2000)["admitted"])
+        self.assertTrue(self.room.status(1, late, now=2001)["admitted"])
+
+    def test_consume_is_single_use(self):
+        self.assertIsNone(self.room.consume(1, self.tokens[0], now=1000)) # Not admitted yet
+        self.assertEqual(self.room.consume(1, self.tokens[0], now=1001), 1)
+        self.assertIsNone(self.room.consume(1, self.tokens[0], now=1001))
+        self.assertIsNone(self.room.status(1, self.tokens[0], now=1001))
+
+    def test_restore(self):
+        seq = self.room.consume(1, self.tokens[0], now=1001)
+        self.room.restore(1, self.tokens[0], seq, now=1001)
+        self.assertTrue(self.room.status(1, self.tokens[0], now=1001)["admitted"])
+        self.assertEqual(self.room.consume(1, self.tokens[0], now=1002), seq)
+
+    def test_stale_entries_are_pruned(self):
+        self.room.status(1, self.tokens[0], now=1500) # Still polling
+        self.room.join(1, 60, now=1700) # More than entry_seconds after the others were last seen
+        self.assertIsNotNone(self.room.status(1, self.tokens[0], now=1700))
+        self.assertIsNone(self.room.status(1, self.tokens[1], now=1700))
+        self.assertIsNone(self.room.status(1, self.tokens[2], now=1700))
+
+
+@override_settings(WAITING_ROOM_LOCATION=":memory:")
+class WaitingRoomAdmissionTests(TestCase):
+    """ create_booking only accepts a valid admission ticket of the current user, once. """
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user("buyer", "buyer@example.com", "password")
+        cls.other_user = User.objects.create_user("other", "other@example.com", "password")
+        cls.event = Event.objects.create(
+            title="Concert", category="Concert", date=timezone.now() + timedelta(days=7),
+            location="Main Hall", price=25, total_tickets=10, available_tickets=10, admission_rate=60,
+        )
+
+    def setUp(self):
+        reset_waiting_room()
+        self.addCleanup(reset_waiting_room)
+        self.client.force_login(self.user)
+        self.url = reverse("create_booking", kwargs={"event_pk": self.event.pk})
+        # A place that joined a minute ago, so it is admitted by now
+        self.token = get_waiting_room().join(self.event.pk, self.event.admission_rate, now=time.time() - 60)
+
+    def admit(self, user_pk, token):
+        response = HttpResponse()
+        set_token_cookie(
+            response, ADMISSION_COOKIE.format(event_pk=self.event.pk), ADMISSION_SALT, user_pk, token, 600,
+        )
+        self.client.cookies.update(response.cookies)
+
+    def test_books_once_with_an_admission_ticket(self):
+        self.admit(self.user.pk, self.token)
+        cookie = self.client.cookies[ADMISSION_COOKIE.format(event_pk=self.event.pk)].value
+        response = self.client.post(self.url, {"quantity": 2})
+        self.assertEqual(resolve(response.url).url_name, "initiate_payment")
+
+        # Replaying the used ticket is refused
+        self.client.cookies[ADMISSION_COOKIE.format(event_pk=self.event.pk)] = cookie
+        response = self.client.post(self.url, {"quantity": 2})
+        self.assertRedirects(response, reverse("waiting_room", kwargs={"event_pk": self.event.pk}))
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_failed_booking_keeps_the_turn(self):
+        self.admit(self.user.pk, self.token)
+        response = self.client.post(self.url, {"quantity": 11})
+        self.assertRedirects(response, reverse("event_detail", kwargs={"pk": self.event.pk}))
+        response = self.client.post(self.url, {"quantity": 2})
+        self.assertEqual(resolve(response.url).url_name, "initiate_payment")
+
+    def test_no_ticket_is_sent_to_the_queue(self):
+        response = self.client.post(self.url, {"quantity": 1})
+        self.assertRedirects(response, reverse("waiting_room", kwargs={"event_pk": self.event.pk}))
+        self.assertFalse(Booking.objects.exists())
+
+    def test_forged_ticket_is_refused(self):
+        self.client.cookies[ADMISSION_COOKIE.format(event_pk=self.event.pk)] = f"{self.user.pk}:{self.token}"
+        response = self.client.post(self.url, {"quantity": 1})
+        self.assertRedirects(response, reverse("waiting_room", kwargs={"event_pk": self.event.pk}))
+        self.assertFalse(Booking.objects.exists())
+
+    def test_other_users_ticket_is_refused(self):
+        self.admit(self.other_user.pk, self.token)
+        response = self.client.post(self.url, {"quantity": 1})
+        self.assertRedirects(response, reverse("waiting_room", kwargs={"event_pk": self.event.pk}))
+        self.assertFalse(Booking.objects.exists())
+
+
+@override_settings(TICKET_DELIVERY_MAX_ATTEMPTS=3)
+class TicketDeliveryQueueTests(TestCase):
+    """ Claiming leases deliveries to one worker; attempts are retried with backoff. """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user("buyer", "buyer@example.com", "password")
+        event = Event.objects.create(
+            title="Concert", category="Concert", date=timezone.now() + timedelta(days=7),
+            location="Main Hall", price=25, total_tickets=10, available_tickets=8,
+        )
+        cls.booking = Booking.objects.create(user=user, event=event, quantity=2, status=Booking.Status.CONFIRMED)
+
+    def setUp(self):
+        self.delivery = TicketDelivery.objects.create(booking=self.booking)
+
+    def send(self, failed=None):
+        """ Runs deliver_batch() with the mailer reporting `failed` (an error message) or success. """
+        report = TicketMailReport()
+        if failed:
+            report.failed[self.booking.pk] = failed
+        else:
+            report.sent.append(self.booking.pk)
+        with mock.patch("bookings.delivery.send_ticket_emails", return_value=report) as send_ticket_emails:
+            counts = deliver_batch([self.delivery.pk])
+        send_ticket_emails.assert_called_once()
+        self.delivery.refresh_from_db()
+        return counts
+
+    def test_claim_holds_a_lease(self):
+        self.assertEqual(claim_deliveries(10, lease_seconds=60), [self.delivery.pk])
+        self.assertEqual(claim_deliveries(10, lease_seconds=60), [])
+        with mock.patch("django.utils.timezone.now", return_value=timezone.now() + timedelta(seconds=30)):
+            self.assertEqual(claim_deliveries(10, lease_seconds=60), [])
+
+    def test_expired_lease_is_claimed_again(self):
+        claim_deliveries(10, lease_seconds=60)
+        with mock.patch("django.utils.timezone.now", return_value=timezone.now() + timedelta(seconds=61)):
+            self.assertEqual(claim_deliveries(10, lease_seconds=60), [self.delivery.pk])
+
+    def test_sent_delivery_is_done(self):
+        self.assertEqual(self.send(), {"sent": 1, "retried": 0, "failed": 0})
+        self.assertEqual((self.delivery.status, self.delivery.attempts), (TicketDelivery.Status.SENT, 1))
+        self.assertEqual(claim_deliveries(10), [])
+
+    def test_failure_schedules_a_retry(self):
+        started = timezone.now()
+        with mock.patch("bookings.delivery.retry_delay", return_value=timedelta(seconds=45)) as retry_delay:
+            self.assertEqual(self.send(failed="Mailbox full"), {"sent": 0, "retried": 1, "failed": 0})
+        retry_delay.assert_called_once_with(1)
+        self.assertEqual((self.delivery.status, self.delivery.attempts), (TicketDelivery.Status.PENDING, 1))
+        self.assertEqual(self.delivery.last_error, "Mailbox full")
+        self.assertGreaterEqual(self.delivery.next_attempt_at, started + timedelta(seconds=45))
+        self.assertLess(self.delivery.next_attempt_at, timezone.now() + timedelta(seconds=46))
+
+    def test_gives_up_after_max_attempts(self):
+        TicketDelivery.objects.filter(pk=self.delivery.pk).update(attempts=2)
+        self.assertEqual(self.send(failed="Mailbox full"), {"sent": 0, "retried": 0, "failed": 1})
+        self.assertEqual((self.delivery.status, self.delivery.attempts), (TicketDelivery.Status.FAILED, 3))
+
+    @override_settings(TICKET_DELIVERY_RETRY_BASE_SECONDS=30, TICKET_DELIVERY_RETRY_MAX_SECONDS=100)
+    def test_retry_delay_grows_up_to_the_cap(self):
+        for attempts, limit in ((1, 30), (2, 60), (3, 100), (10, 100)):
+            for _ in range(20):
+                self.assertLessEqual(retry_delay(attempts), timedelta(seconds=limit))
+
+
+class TicketPDFCacheTests(SimpleTestCase):
+    """ Tickets are cached per content and template version, with LRU eviction. """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = TicketPDFCache(directory.name, max_bytes=250)
+        self.renderer = SimpleNamespace(version="v1")
+        patcher = mock.patch("bookings.rendering.get_ticket_renderer", return_value=self.renderer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def booking(self, pk=1, **changes):
+        event = SimpleNamespace(
+            pk=7, title="Concert", date=timezone.now().replace(microsecond=0) + timedelta(days=7),
+            location="Main Hall",
+        )
+        booking = SimpleNamespace(
+            pk=pk, status="confirmed", quantity=2, total_price=Decimal("50.00"),
+            created_at=event.date - timedelta(days=30), event_id=event.pk, event=event,
+            user=SimpleNamespace(username="buyer", email="buyer@example.com"),
+        )
+        for name, value in changes.items():
+            target = booking.event if name in ("title", "location") else booking
+            setattr(target, name, value)
+        return booking
+
+    def test_same_ticket_is_a_hit(self):
+        self.cache.put(self.booking(), b"%PDF ticket")
+        self.assertEqual(self.cache.get(self.booking()), b"%PDF ticket")
+
+    def test_changed_field_is_a_miss(self):
+        self.cache.put(self.booking(), b"%PDF ticket")
+        self.assertIsNone(self.cache.get(self.booking(quantity=3)))
+        self.assertIsNone(self.cache.get(self.booking(location="Open Air Stage")))
+        self.assertIsNone(self.cache.get(self.booking(status="cancelled")))
+
+    def test_new_template_version_is_a_miss(self):
+        self.cache.put(self.booking(), b"%PDF ticket")
+        self.renderer.version = "v2"
+        self.assertIsNone(self.cache.get(self.booking()))
+
+    def test_least_recently_used_files_are_evicted(self):
+        first, second, third = self.booking(1), self.booking(2), self.booking(3)
+        self.cache.put(first, b"1" * 100)
+        self.cache.put(second, b"2" * 100)
+        os.utime(self.cache.path(first), (1000, 1000))
+        os.utime(self.cache.path(second), (2000, 2000))
+        self.assertIsNotNone(self.cache.get(first)) # Now the most recently used
+
+        self.cache.put(third, b"3" * 100) # 300 bytes, over the limit of 250
+        self.assertIsNone(self.cache.get(second))
+        self.assertIsNotNone(self.cache.get(first))
+        self.assertIsNotNone(self.cache.get(third))
@@ -0,0 +1,141 @@
+# bookings/ticket_cache.py
+""" Content-addressed on-disk cache for rendered PDF tickets.
+
+    Rendering a ticket with WeasyPrint is the most CPU-expensive thing we do, and
+    the same ticket is regenerated whenever a user or support asks for a resend.
+    Each PDF is stored under a key derived from every field printed on the ticket
+    plus the renderer's template version, so any change to the booking, its event
+    or the template produces a new key and a stale PDF can never be served.
+
+    Layout: <TICKET_CACHE_DIR>/<event_id>/<booking_id>-<digest>.pdf
+    The total size is bounded by TICKET_CACHE_MAX_BYTES with least-recently-used
+    eviction (a cache hit refreshes the file's mtime). Signal handlers in
+    bookings/signals.py delete a booking's or event's files as soon as it changes.
+"""
+import hashlib
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+
+class TicketPDFCache:
+    """ Size-bounded LRU file store for ticket PDFs. """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._size = None # Bytes on disk, scanned lazily on first write
+        self._lock = threading.Lock()
+
+    def key(self, booking):
+        """ Returns the content digest for everything rendered on the booking's ticket. """
+        # Imported lazily so the signal handlers can use the cache without loading WeasyPrint
+        from .rendering import get_ticket_renderer
+
+        event = booking.event
+        user = booking.user
+        parts = [
+            get_ticket_renderer().version,
+            booking.pk, booking.status, booking.quantity, booking.total_price, booking.created_at.isoformat(),
+            event.pk, event.title, event.date.isoformat(), event.location,
+            user.username, user.email,
+        ]
+        return hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+
+    def path(self, booking):
+        """ Returns the file path under which the booking's current ticket is stored. """
+        return self.directory / str(booking.event_id) / f"{booking.pk}-{self.key(booking)}.pdf"
+
+    def get(self, booking):
+        """ Returns the cached PDF bytes for the booking, or None on a miss. """
+        path = self.path(booking)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path) # Mark as recently used for LRU eviction
+        except FileNotFoundError:
+            pass # Evicted by another process in the meantime; we already have the bytes
+        return data
+
+    def put(self, booking, data):
+        """ Stores the PDF bytes for the booking and evicts old entries if over budget. """
+        path = self.path(booking)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a private temp file and rename, so readers never see a partial PDF
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def invalidate_booking(self, booking):
+        """ Deletes every cached ticket of a booking. """
+        event_dir = self.directory / str(booking.event_id)
+        for path in event_dir.glob(f"{booking.pk}-*.pdf"):
+            _unlink(path)
+
+    def invalidate_event(self, event_pk):
+        """ Deletes every cached ticket of an event. """
+        shutil.rmtree(self.directory / str(event_pk), ignore_errors=True)
+
+    def _files(self):
+        """ Yields (path, stat) for every cached PDF. """
+        if not self.directory.exists():
+            return
+        for event_dir in os.scandir(self.directory):
+            if not event_dir.is_dir():
+                continue
+            for entry in os.scandir(event_dir.path):
+                if entry.name.endswith(".pdf"):
+                    try:
+                        yield entry.path, entry.stat()
+                    except FileNotFoundError:
+                        continue
+
+    def _scan_size(self):
+        return sum(stat.st_size for _, stat in self._files())
+
+    def _evict(self):
+        """ Removes least recently used files until the cache is at 90% of its budget.
+            Evicting below the limit means the directory is not rescanned on every write.
+        """
+        files = sorted(self._files(), key=lambda item: item[1].st_mtime)
+        size = sum(stat.st_size for _, stat in files)
+        target = self.max_bytes * 0.9
+        for path, stat in files:
+            if size <= target:
+                break
+            _unlink(path)
+            size -= stat.st_size
+        self._size = size
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass # Already removed by another worker
+
+
+_cache = None
+
+
+def get_ticket_cache():
+    """ Returns the process-wide TicketPDFCache, or None if caching is disabled
+        (TICKET_CACHE_DIR set to an empty value).
+    """
+    global _cache
+    if _cache is None and settings.TICKET_CACHE_DIR:
+        _cache = TicketPDFCache(settings.TICKET_CACHE_DIR, settings.TICKET_CACHE_MAX_BYTES)
+    return _cache
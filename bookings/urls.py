@@ -1,13 +1,17 @@
 # bookings/urls.py
 from django.urls import path
-from .views import create_booking # Import the booking creation view
+from .views import booking_list, create_booking, waiting_room, waiting_room_status
 # Import other booking views like list or detail if created later
 
 urlpatterns = [
     # URL for handling the booking creation POST request from the event detail page
     path("create/<int:event_pk>/", create_booking, name="create_booking"),
-    # Add URLs for booking list, detail, etc. here later if needed
-    # path("", booking_list, name="booking_list"),
+    # Virtual waiting room for high-demand events (see bookings/waiting_room.py)
+    path("queue/<int:event_pk>/", waiting_room, name="waiting_room"),
+    path("queue/<int:event_pk>/status/", waiting_room_status, name="waiting_room_status"),
+    # The current user's booking history, keyset-paginated (see bookings/history.py)
+    path("", booking_list, name="booking_list"),
+    # Add URLs for booking detail, etc. here later if needed
     # path("<int:booking_pk>/", booking_detail, name="booking_detail"),
 ]
 
@@ -1,31 +1,51 @@
 # bookings/views.py
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
 from django.contrib import messages
-from django.db import transaction # For atomic database operations
 from django.urls import reverse
 from django.utils import timezone # To check event dates
 from django.conf import settings # To access settings like STRIPE keys
 
-from .models import Booking
+from .history import get_booking_history, get_upcoming_summary
+from .services import create_pending_booking, InsufficientTicketsError
+from .waiting_room import (
+    ADMISSION_COOKIE, ADMISSION_SALT, QUEUE_COOKIE, QUEUE_SALT,
+    admission_token, get_waiting_room, is_admitted, read_token_cookie, set_token_cookie,
+)
 from events.models import Event # Import Event model
+from users.decorators import async_login_required
+from monitoring.decorators import query_budget
 
-@login_required # Ensure user is logged in to book
-@transaction.atomic # Wrap the view in a database transaction
-def create_booking(request, event_pk):
+@query_budget(7) # Session, user, event, the reserving UPDATE and the booking INSERT, plus BEGIN/COMMIT
+@async_login_required # Ensure user is logged in to book
+async def create_booking(request, event_pk):
     """ Handles the creation of a new booking for a specific event.
         - Validates the requested quantity.
-        - Checks if sufficient tickets are available.
-        - Creates a Booking instance with status "pending".
-        - Decreases the event's available_tickets count.
+        - Reserves the tickets and creates a Booking instance with status "pending".
+        - For events with a waiting room, requires an admission ticket (see
+          bookings/waiting_room.py), used up by the booking, and sends everybody
+          else to the queue.
         - Redirects to the payment initiation page upon successful booking creation.
-        Uses transaction.atomic to ensure ticket availability check and booking creation
-        are performed as a single, indivisible operation to prevent race conditions.
+        The availability check and the decrement of available_tickets happen in a
+        single conditional UPDATE (see bookings.services.create_pending_booking), so
+        concurrent buyers cannot oversell the event and no row lock is held.
+        Async view: the event is loaded with the async ORM and the (transactional)
+        reservation runs in a worker thread.
     """
     # Retrieve the event, ensuring it exists and is upcoming
-    event = get_object_or_404(Event, pk=event_pk, date__gte=timezone.now())
+    try:
+        event = await Event.objects.aget(pk=event_pk, date__gte=timezone.now())
+    except Event.DoesNotExist:
+        raise Http404("No upcoming event matches the given query.")
 
     if request.method == "POST":
+        # High-demand events only accept buyers admitted through the waiting room
+        if not is_admitted(request, event):
+            messages.info(request, "This event is in high demand. Please wait for your turn to book.")
+            return redirect("waiting_room", event_pk=event.pk)
+
         # Process the booking form submission
         try:
             # Get and validate the requested quantity
@@ -36,54 +56,126 @@ def create_booking(request, event_pk):
             messages.error(request, "Invalid quantity specified. Please enter a valid number.")
             return redirect("event_detail", pk=event.pk)
 
-        # --- Atomic Transaction Starts Here --- 
-        # Lock the event row for update to prevent race conditions during check/update.
-        # NOTE: select_for_update() provides stronger locking guarantees on databases
-        # like PostgreSQL. SQLite's support is limited, but transaction.atomic still helps.
+        # An admission ticket is good for one booking: use up its token before booking,
+        # so a replayed or concurrently resubmitted cookie cannot book a second time
+        admission = None
+        if event.admission_rate:
+            token = admission_token(request, event)
+            # Blocking SQLite call behind a lock: keep it off the event loop
+            seq = await sync_to_async(get_waiting_room().consume)(event.pk, token)
+            if seq is None:
+                messages.info(request, "Your turn to book has already been used. Please queue again.")
+                response = redirect("waiting_room", event_pk=event.pk)
+                response.delete_cookie(ADMISSION_COOKIE.format(event_pk=event.pk))
+                return response
+            admission = (token, seq)
+
         try:
-            # Re-fetch the event within the transaction with locking
-            event_locked = Event.objects.select_for_update().get(pk=event_pk)
-        except Event.DoesNotExist:
-             # Should not happen if initial get_object_or_404 worked, but good practice
-             messages.error(request, "Event not found or has already passed.")
-             return redirect("event_list")
-
-        # Check if enough tickets are available (using the locked event instance)
-        if event_locked.available_tickets >= quantity:
-            # Create the booking instance
-            booking = Booking.objects.create(
-                user=request.user,
-                event=event_locked,
-                quantity=quantity,
-                status=Booking.Status.PENDING, # Initial status is pending
-                # total_price is calculated automatically in the Booking model's save() method
-            )
-            
-            # Decrease the available tickets count for the event
-            event_locked.available_tickets -= quantity
-            event_locked.save()
-
-            # --- Atomic Transaction Ends Here (Commit) --- 
-
-            messages.success(request, f"Booking created for {quantity} ticket(s). Please proceed to payment.")
-            # Redirect to the payment initiation view, passing the new booking's PK
-            return redirect(reverse("initiate_payment", kwargs={"booking_pk": booking.pk}))
-        
-        else:
-            # --- Atomic Transaction Ends Here (Rollback if error occurred before commit) ---
-            messages.error(request, f"Sorry, only {event_locked.available_tickets} ticket(s) are available for this event.")
+            booking = await sync_to_async(create_pending_booking)(request.user, event, quantity)
+        except InsufficientTicketsError as e:
+            if admission:
+                # Nothing was booked: the user keeps their turn
+                await sync_to_async(get_waiting_room().restore)(event.pk, *admission)
+            messages.error(request, f"Sorry, only {e.available} ticket(s) are available for this event.")
             return redirect("event_detail", pk=event.pk)
 
+        messages.success(request, f"Booking created for {quantity} ticket(s). Please proceed to payment.")
+        # Redirect to the payment initiation view, passing the new booking's PK
+        response = redirect(reverse("initiate_payment", kwargs={"booking_pk": booking.pk}))
+        # Its token is used up: drop the admission ticket as well
+        response.delete_cookie(ADMISSION_COOKIE.format(event_pk=event.pk))
+        return response
+
     else:
         # If the view is accessed via GET, it's not a valid booking attempt
         messages.error(request, "Invalid request method.")
         return redirect("event_detail", pk=event.pk)
 
+@query_budget(3)
+@login_required
+def waiting_room(request, event_pk):
+    """ Places the user in the waiting room of a high-demand event (or keeps their
+        existing place) and shows their position. The page polls waiting_room_status
+        until the user is admitted. Users of events without a waiting room, and users
+        already admitted, are sent straight to the event page.
+    """
+    event = get_object_or_404(
+        Event.objects.only("pk", "title", "date", "admission_rate"), pk=event_pk, date__gte=timezone.now()
+    )
+    if is_admitted(request, event):
+        return redirect("event_detail", pk=event.pk)
+
+    room = get_waiting_room()
+    cookie = QUEUE_COOKIE.format(event_pk=event.pk)
+    queued = read_token_cookie(request, cookie, QUEUE_SALT, settings.WAITING_ROOM_QUEUE_SECONDS)
+    status = None
+    if queued and queued[0] == str(request.user.pk):
+        token = queued[1]
+        status = room.status(event.pk, token)
+    if status is None:
+        # Not in the queue yet (or the queue was reset): join at the back
+        token = room.join(event.pk, event.admission_rate)
+        status = room.status(event.pk, token)
+
+    response = render(request, "bookings/waiting_room.html", {"event": event, "status": status})
+    set_token_cookie(response, cookie, QUEUE_SALT, request.user.pk, token, settings.WAITING_ROOM_QUEUE_SECONDS)
+    if status["admitted"]:
+        _admit(response, event.pk, request.user.pk, token)
+    return response
+
+@query_budget(0) # Polled every few seconds by every queued user: cookies and the queue backend only
+def waiting_room_status(request, event_pk):
+    """ JSON position/ETA of the user's place in an event's waiting room:
+        {"position", "admitted", "eta_seconds", "poll_seconds"} plus "url" (the
+        event page) once admitted, when the admission ticket cookie is also set.
+        Polled by every waiting browser, so it only reads the signed queue cookie
+        and the waiting room backend: no session, user or event query.
+    """
+    queued = read_token_cookie(
+        request, QUEUE_COOKIE.format(event_pk=event_pk), QUEUE_SALT, settings.WAITING_ROOM_QUEUE_SECONDS
+    )
+    status = get_waiting_room().status(event_pk, queued[1]) if queued else None
+    if status is None:
+        return JsonResponse({"error": "You are not in the queue for this event."}, status=404)
+
+    # Ask clients far back in the queue to poll less often
+    status["poll_seconds"] = min(30, max(2, status["eta_seconds"] // 10))
+    if not status["admitted"]:
+        return JsonResponse(status)
+    status["url"] = reverse("event_detail", kwargs={"pk": event_pk})
+    response = JsonResponse(status)
+    _admit(response, event_pk, queued[0], queued[1])
+    return response
+
+def _admit(response, event_pk, user_pk, token):
+    """ Hands out the signed admission ticket checked by create_booking. """
+    set_token_cookie(
+        response, ADMISSION_COOKIE.format(event_pk=event_pk), ADMISSION_SALT,
+        user_pk, token, settings.WAITING_ROOM_ADMISSION_SECONDS,
+    )
+
 # Note: The initiate_payment view is now in payments/views.py
 # We keep the import here as it was previously defined but now moved.
 # from payments.views import initiate_payment 
 
+@query_budget(5) # Session, user, one history page and the summary on a cache miss (2)
+@login_required
+def booking_list(request):
+    """ Displays the current user's bookings, newest first, one page at a time.
+        Uses keyset pagination on (-created_at, -id): the `after` parameter carries
+        the position of the last booking shown. Each page is one indexed query
+        that loads the bookings together with their events (see bookings/history.py).
+    """
+    bookings_page = get_booking_history(request.user, request.GET.get("after"))
+    context = {
+        "bookings": bookings_page,
+        "summary": get_upcoming_summary(request.user), # Cached per user
+        "next_cursor": bookings_page.next_cursor, # None on the last page
+        "is_first_page": not request.GET.get("after"),
+        "now": timezone.now(),
+    }
+    return render(request, "bookings/booking_list.html", context)
+
 # Potential future views:
-# - booking_list(request): Display a list of the current user's bookings.
 # - booking_detail(request, booking_pk): Display details of a specific booking.
 
@@ -0,0 +1,282 @@
+# bookings/waiting_room.py
+""" Virtual waiting room in front of create_booking for high-demand events.
+
+    When a hot event opens, everybody tries to book in the same second. Events with
+    an `admission_rate` (users per minute, 0 = no waiting room) instead send buyers
+    through a per-event FIFO queue: joining hands out a random queue token with the
+    next sequence number, and the queue admits sequence numbers at the configured
+    rate. The rate is applied lazily on every read, so no background process is
+    needed, and admission never runs ahead of the people actually waiting: after an
+    idle period a new crowd is still admitted at the configured pace.
+
+    Admitted users receive a signed, time-limited admission ticket (a cookie signed
+    with the project's SECRET_KEY) that create_booking checks, so the database sees
+    a bounded rate of booking attempts while the queue absorbs the rush. The ticket
+    is good for one booking: create_booking consumes its token in the backend, so a
+    replayed cookie is refused. Used tokens are forgotten at once, and tokens whose
+    cookies can no longer be valid are pruned as new users join.
+
+    Queue state lives in a pluggable backend (WAITING_ROOM_BACKEND), separate from
+    the main database. SQLiteWaitingRoom keeps it in the WAITING_ROOM_LOCATION file,
+    shared by all local worker processes, so they admit from one queue at one rate
+    and every worker knows every token. ":memory:" keeps one queue per process,
+    which only suits tests and single-process servers.
+"""
+import abc
+import math
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Signed cookies carrying the queue token of an event, and the admission ticket once admitted
+QUEUE_COOKIE = "queue_{event_pk}"
+QUEUE_SALT = "bookings.waiting_room.queue"
+ADMISSION_COOKIE = "admission_{event_pk}"
+ADMISSION_SALT = "bookings.waiting_room.admission"
+
+
+class WaitingRoomBackend(abc.ABC):
+    """ Interface every waiting room backend implements. `now` is a Unix timestamp
+        and defaults to the current time.
+    """
+
+    @abc.abstractmethod
+    def join(self, event_pk, rate, now=None):
+        """ Appends a new user to the event's queue and returns their queue token.
+            `rate` (users admitted per minute) becomes the queue's admission rate,
+            so status polls never need to load the event.
+        """
+        pass
+
+    @abc.abstractmethod
+    def status(self, event_pk, token, now=None):
+        """ Returns the position of a queue token as a dict with `position` (users
+            ahead, including this one; 0 once admitted), `admitted` and `eta_seconds`,
+            or None if the token is unknown.
+        """
+        pass
+
+    @abc.abstractmethod
+    def consume(self, event_pk, token, now=None):
+        """ Uses up an admitted queue token, so its admission ticket books only once.
+            Returns the token's sequence number the first time, or None if the token
+            is unknown, not admitted yet or already used.
+        """
+        pass
+
+    @abc.abstractmethod
+    def restore(self, event_pk, token, seq, now=None):
+        """ Gives back a token taken by consume() when the booking it was used for
+            failed, at its original place in the queue.
+        """
+        pass
+
+
+class SQLiteWaitingRoom(WaitingRoomBackend):
+    """ Waiting room stored in SQLite (in memory unless `location` is a file path).
+        Each queue keeps the last sequence number handed out (`tail`) and how far
+        admission has progressed (`served`, fractional so slow rates accumulate).
+        Entries not seen for `entry_seconds` (default: the longer of the queue and
+        admission cookie lifetimes) can no longer be used and are pruned.
+    """
+
+    def __init__(self, location=":memory:", entry_seconds=None):
+        self.entry_seconds = entry_seconds or max(
+            settings.WAITING_ROOM_QUEUE_SECONDS, settings.WAITING_ROOM_ADMISSION_SECONDS
+        )
+        if location != ":memory:":
+            Path(location).parent.mkdir(parents=True, exist_ok=True)
+        # One shared connection; the lock serializes access from request threads
+        self._connection = sqlite3.connect(location, timeout=10, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        if location != ":memory:":
+            self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS waiting_room_queue (
+                event_pk INTEGER PRIMARY KEY,
+                tail INTEGER NOT NULL,
+                served REAL NOT NULL,
+                rate INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS waiting_room_entry (
+                event_pk INTEGER NOT NULL,
+                token TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                seen_at REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (event_pk, token)
+            );
+        """)
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(waiting_room_entry)")}
+        if "seen_at" not in columns:
+            # Queue file created before entries were pruned: keep the current entries for now
+            self._connection.execute("ALTER TABLE waiting_room_entry ADD COLUMN seen_at REAL NOT NULL DEFAULT 0")
+            self._connection.execute("UPDATE waiting_room_entry SET seen_at = ?", (time.time(),))
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS waiting_room_entry_seen ON waiting_room_entry (seen_at)"
+        )
+
+    def join(self, event_pk, rate, now=None):
+        now = now or time.time()
+        token = secrets.token_urlsafe(16)
+        with self._transaction() as cursor:
+            tail, _, _ = self._advance(cursor, event_pk, now, rate)
+            cursor.execute(
+                "UPDATE waiting_room_queue SET tail = ?, rate = ? WHERE event_pk = ?", (tail + 1, rate, event_pk)
+            )
+            cursor.execute(
+                "INSERT INTO waiting_room_entry (event_pk, token, seq, seen_at) VALUES (?, ?, ?, ?)",
+                (event_pk, token, tail + 1, now),
+            )
+            # Forget the tokens whose queue and admission cookies have all expired
+            cursor.execute("DELETE FROM waiting_room_entry WHERE seen_at < ?", (now - self.entry_seconds,))
+        return token
+
+    def status(self, event_pk, token, now=None):
+        now = now or time.time()
+        with self._transaction() as cursor:
+            row = cursor.execute(
+                "SELECT seq FROM waiting_room_entry WHERE event_pk = ? AND token = ?", (event_pk, token)
+            ).fetchone()
+            if row is None:
+                return None
+            # Every queue or admission cookie is issued right after a status read
+            cursor.execute(
+                "UPDATE waiting_room_entry SET seen_at = ? WHERE event_pk = ? AND token = ?", (now, event_pk, token)
+            )
+            _, served, rate = self._advance(cursor, event_pk, now)
+        return _queue_status(row[0], served, rate)
+
+    def consume(self, event_pk, token, now=None):
+        now = now or time.time()
+        with self._transaction() as cursor:
+            row = cursor.execute(
+                "SELECT seq FROM waiting_room_entry WHERE event_pk = ? AND token = ?", (event_pk, token)
+            ).fetchone()
+            if row is None:
+                return None
+            _, served, _ = self._advance(cursor, event_pk, now)
+            if row[0] > math.floor(served):
+                return None
+            cursor.execute("DELETE FROM waiting_room_entry WHERE event_pk = ? AND token = ?", (event_pk, token))
+        return row[0]
+
+    def restore(self, event_pk, token, seq, now=None):
+        now = now or time.time()
+        with self._transaction() as cursor:
+            cursor.execute(
+                "INSERT OR IGNORE INTO waiting_room_entry (event_pk, token, seq, seen_at) VALUES (?, ?, ?, ?)",
+                (event_pk, token, seq, now),
+            )
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE") # Take the write lock up front (shared file case)
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+    @staticmethod
+    def _advance(cursor, event_pk, now, rate=None):
+        """ Moves the event's admission point forward by the time elapsed since the
+            last read, never past the last user in the queue. Creates the queue (with
+            `rate`) on first use. Returns (tail, served, rate).
+        """
+        row = cursor.execute(
+            "SELECT tail, served, rate, updated_at FROM waiting_room_queue WHERE event_pk = ?", (event_pk,)
+        ).fetchone()
+        if row is None:
+            cursor.execute(
+                "INSERT INTO waiting_room_queue (event_pk, tail, served, rate, updated_at) VALUES (?, 0, 0, ?, ?)",
+                (event_pk, rate, now),
+            )
+            return 0, 0.0, rate
+        tail, served, rate, updated_at = row
+        served = min(tail, served + max(0.0, now - updated_at) * rate / 60)
+        cursor.execute(
+            "UPDATE waiting_room_queue SET served = ?, updated_at = ? WHERE event_pk = ?",
+            (served, now, event_pk),
+        )
+        return tail, served, rate
+
+
+def _queue_status(seq, served, rate):
+    admitted = seq <= math.floor(served)
+    return {
+        "position": 0 if admitted else seq - math.floor(served),
+        "admitted": admitted,
+        "eta_seconds": 0 if admitted else math.ceil((seq - served) * 60 / rate),
+    }
+
+
+_waiting_room = None
+
+
+def get_waiting_room():
+    """ Returns the process-wide waiting room backend configured by WAITING_ROOM_BACKEND
+        (a dotted class path) and WAITING_ROOM_LOCATION.
+    """
+    global _waiting_room
+    if _waiting_room is None:
+        _waiting_room = import_string(settings.WAITING_ROOM_BACKEND)(settings.WAITING_ROOM_LOCATION)
+    return _waiting_room
+
+
+def reset_waiting_room():
+    """ Drops the backend built by get_waiting_room(); the next call builds it again
+        from the settings (e.g. after overriding WAITING_ROOM_LOCATION in tests).
+    """
+    global _waiting_room
+    _waiting_room = None
+
+
+def read_token_cookie(request, cookie, salt, max_age=None):
+    """ Returns (user_pk, token) from a signed waiting room cookie, or None if the
+        cookie is missing, tampered with or expired. Cookie values are
+        "<user pk>:<token>", so a queue place or admission ticket is bound to the
+        user it was issued to and cannot be handed to somebody else.
+    """
+    value = request.get_signed_cookie(cookie, default=None, salt=salt, max_age=max_age)
+    if value is None or ":" not in value:
+        return None
+    user_pk, token = value.split(":", 1)
+    return user_pk, token
+
+
+def set_token_cookie(response, cookie, salt, user_pk, token, max_age):
+    """ Stores a user's queue token or admission ticket in a signed cookie. """
+    response.set_signed_cookie(
+        cookie, f"{user_pk}:{token}", salt=salt, max_age=max_age, httponly=True, samesite="Lax"
+    )
+
+
+def admission_token(request, event):
+    """ Returns the queue token of the request's admission ticket for `event`, or
+        None unless the request carries a valid, unexpired admission ticket issued
+        to the current user for this event.
+    """
+    admission = read_token_cookie(
+        request, ADMISSION_COOKIE.format(event_pk=event.pk), ADMISSION_SALT, settings.WAITING_ROOM_ADMISSION_SECONDS
+    )
+    if admission is None or admission[0] != str(request.user.pk):
+        return None
+    return admission[1]
+
+
+def is_admitted(request, event):
+    """ Returns True if the request may book `event`: either the event has no
+        waiting room, or the request carries an admission ticket (see admission_token()).
+        The ticket may still have been used already: create_booking consumes it.
+    """
+    return not event.admission_rate or admission_token(request, event) is not None
@@ -0,0 +1,52 @@
+# bookings/workers.py
+""" Entry points for spawned worker processes (ProcessPoolExecutor).
+
+    A spawned worker unpickles these functions by importing this module before
+    Django is set up, so nothing here may import models at module level; the ORM
+    is only touched after init_worker() has run django.setup().
+"""
+import django
+
+
+def init_worker():
+    """ Prepares a freshly spawned worker process to use the ORM. """
+    django.setup()
+
+
+def deliver_tickets(delivery_pks):
+    """ Sends one claimed batch of ticket deliveries (see bookings/delivery.py). """
+    from django.db import connections
+    from .delivery import deliver_batch
+
+    try:
+        return deliver_batch(delivery_pks)
+    finally:
+        connections.close_all()
+
+
+def render_tickets(booking_pks, output_dir=None):
+    """ Renders one chunk of tickets (see bookings.rendering.render_tickets_parallel).
+        Writes the PDFs into `output_dir` if given, otherwise returns them.
+        Returns a list of (filename, size, pdf_bytes_or_None) tuples.
+    """
+    import os
+    from django.db import connections
+    from .models import Booking
+    from .rendering import ticket_filename
+    from .utils import generate_ticket_pdf
+
+    results = []
+    try:
+        bookings = Booking.objects.filter(pk__in=booking_pks).select_related("user", "event")
+        for booking in bookings:
+            pdf = generate_ticket_pdf(booking).getvalue()
+            filename = ticket_filename(booking)
+            if output_dir:
+                with open(os.path.join(output_dir, filename), "wb") as pdf_file:
+                    pdf_file.write(pdf)
+                results.append((filename, len(pdf), None))
+            else:
+                results.append((filename, len(pdf), pdf))
+    finally:
+        connections.close_all()
+    return results
@@ -5,7 +5,7 @@ from .models import Event
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
     """Admin configuration for the Event model."""
-    list_display = ("title", "category", "date", "location", "price", "available_tickets", "total_tickets")
+    list_display = ("title", "category", "date", "location", "price", "available_tickets", "total_tickets", "inventory_shards", "admission_rate")
     list_filter = ("category", "date", "location")
     search_fields = ("title", "category", "location", "description") # Assuming description might be added later
     ordering = ("date",)
@@ -13,6 +13,8 @@ class EventAdmin(admin.ModelAdmin):
     # list_editable = ("available_tickets",) 
     # Add date hierarchy for easier navigation
     date_hierarchy = "date"
+    # Shard layout is managed with `manage.py shard_inventory`, show it for reference only
+    readonly_fields = ("inventory_shards",)
 
     # Customize the form if needed
     # fields = (...) # or fieldsets = (...)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class EventsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'events'
+
+    def ready(self):
+        # Register signal handlers (search index updates)
+        from django.db.models.signals import post_migrate
+        from . import signals
+        post_migrate.connect(signals.create_search_index, sender=self)
@@ -0,0 +1,138 @@
+# events/availability.py
+""" In-process pub/sub that pushes seat availability to connected browsers.
+
+    During an on-sale every open event page used to reload itself to see the seat
+    count, each reload costing a query and a full render. The detail page now keeps
+    a Server-Sent Events connection open (events.views.event_availability_stream)
+    and the broker below fans each change out to all subscribers of that event:
+    one availability read per event, however many clients are watching.
+
+    Every watched event gets a single poller task on the ASGI event loop that runs
+    only while it has subscribers. It re-reads the availability when the booking
+    code reports a change in this process (notify_availability_changed) and, as a
+    fallback for changes made by other processes (other workers, the expire_holds
+    sweeper), every EVENT_STREAM_POLL_SECONDS. Subscribers only ever see the latest
+    value: a slow client skips intermediate counts instead of queueing them.
+"""
+import asyncio
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .inventory import get_available_tickets
+from .models import Event
+
+
+class _Channel:
+    """ Subscribers of one event on one event loop, plus their poller task. """
+
+    def __init__(self, event_pk, loop):
+        self.event_pk = event_pk
+        self.loop = loop
+        self.subscribers = set() # asyncio.Queue(maxsize=1) per connected client
+        self.wakeup = asyncio.Event()
+        self.value = None # Last (available_tickets, total_tickets) read
+        self.task = None
+
+
+class AvailabilityBroker:
+    """ Fans availability changes out to the subscribers of each event. """
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self._channels = {} # (event_pk, loop) -> _Channel
+        self._lock = threading.Lock() # publish() is called from worker threads
+
+    async def subscribe(self, event_pk, heartbeat=None):
+        """ Yields (available_tickets, total_tickets) for an event, first the current
+            value and then every change. Yields None when nothing changed for
+            `heartbeat` seconds, so the caller can keep the connection alive.
+        """
+        queue = asyncio.Queue(maxsize=1)
+        channel = self._join(event_pk, queue)
+        try:
+            if channel.value is not None:
+                queue.put_nowait(channel.value)
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self._leave(channel, queue)
+
+    def publish(self, event_pk):
+        """ Reports that an event's availability changed. Thread-safe and cheap when
+            nobody in this process watches the event.
+        """
+        with self._lock:
+            channels = [channel for (pk, _), channel in self._channels.items() if pk == event_pk]
+        for channel in channels:
+            try:
+                channel.loop.call_soon_threadsafe(channel.wakeup.set)
+            except RuntimeError:
+                pass # The loop has been closed; its channel is going away
+
+    def _join(self, event_pk, queue):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            channel = self._channels.get((event_pk, loop))
+            if channel is None:
+                channel = self._channels[(event_pk, loop)] = _Channel(event_pk, loop)
+            channel.subscribers.add(queue)
+        if channel.task is None:
+            channel.task = loop.create_task(self._poll(channel))
+        return channel
+
+    def _leave(self, channel, queue):
+        with self._lock:
+            channel.subscribers.discard(queue)
+            if channel.subscribers:
+                return
+            self._channels.pop((channel.event_pk, channel.loop), None)
+        if channel.task is not None:
+            channel.task.cancel() # Last subscriber gone: stop polling this event
+
+    async def _poll(self, channel):
+        """ Reads the availability on every wake-up (or poll interval) and pushes changes. """
+        while True:
+            channel.wakeup.clear()
+            value = await sync_to_async(_read_availability)(channel.event_pk)
+            if value is not None and value != channel.value:
+                channel.value = value
+                for queue in list(channel.subscribers):
+                    if queue.full():
+                        queue.get_nowait() # Drop the value the client has not picked up yet
+                    queue.put_nowait(value)
+            try:
+                await asyncio.wait_for(channel.wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+def _read_availability(event_pk):
+    event = Event.objects.filter(pk=event_pk).only("available_tickets", "total_tickets", "inventory_shards").first()
+    if event is None:
+        return None
+    return get_available_tickets(event), event.total_tickets
+
+
+_broker = None
+
+
+def get_availability_broker():
+    """ Returns the process-wide AvailabilityBroker. """
+    global _broker
+    if _broker is None:
+        _broker = AvailabilityBroker(settings.EVENT_STREAM_POLL_SECONDS)
+    return _broker
+
+
+def notify_availability_changed(event_pk):
+    """ Tells the stream subscribers of an event that its availability changed,
+        once the current transaction (if any) has committed.
+    """
+    broker = get_availability_broker()
+    transaction.on_commit(lambda: broker.publish(event_pk))
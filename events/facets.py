@@ -0,0 +1,87 @@
+# events/facets.py
+""" Cached category facet (categories of upcoming events with counts) for the listing.
+
+    Computing the facet is a GROUP BY over every upcoming event, which the listing
+    used to run on each request. The result is now kept in two tiers: the shared
+    Django cache (visible to every process) and a process-local copy that saves the
+    round trip and unpickling. Both are keyed by a shared "generation" value, which
+    Event save/delete signals replace (events/signals.py), so an edit anywhere
+    invalidates every process after a single cache read.
+
+    An entry also expires when the clock reaches the date of the earliest upcoming
+    event it counts, since that event then drops out of the facet. Seat counts move
+    with every booking without touching the Event row through save(), so they may
+    lag by up to EVENT_FACET_CACHE_TIMEOUT seconds.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+from django.utils import timezone
+
+from .models import Event
+
+GENERATION_KEY = "events:category_facets:generation"
+
+# Process-local tier: the last entry this process read from (or wrote to) the shared cache
+_local = {"generation": None, "entry": None}
+
+
+def get_category_facets():
+    """ Returns the categories of upcoming events, each as a dict with the category
+        name, the number of upcoming events and the seats still available, ordered
+        by category.
+    """
+    generation = _current_generation()
+    now = timezone.now()
+
+    entry = _local["entry"]
+    if _local["generation"] == generation and entry and now < entry["valid_until"]:
+        return entry["facets"]
+
+    key = f"events:category_facets:{generation}"
+    entry = cache.get(key)
+    if entry is None or now >= entry["valid_until"]:
+        entry = _compute(now)
+        timeout = max(1, int((entry["valid_until"] - now).total_seconds()))
+        cache.set(key, entry, timeout)
+
+    _local["generation"] = generation
+    _local["entry"] = entry
+    return entry["facets"]
+
+
+def invalidate_category_facets():
+    """ Invalidates the facet in every process by starting a new generation, once
+        the current transaction (if any) has committed: before that, a concurrent
+        request would compute the facet from the old rows and cache it under the
+        new generation.
+    """
+    transaction.on_commit(lambda: cache.set(GENERATION_KEY, time.time_ns(), None))
+
+
+def _current_generation():
+    """ Reads the shared generation, creating one if the cache lost it. """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def _compute(now):
+    """ Runs the GROUP BY and works out until when the result stays valid. """
+    upcoming = Event.objects.filter(date__gte=now)
+    facets = list(
+        upcoming.order_by("category")
+        .values("category")
+        .annotate(events=Count("id"), available_tickets=Sum("available_tickets"))
+    )
+    valid_until = now + timedelta(seconds=settings.EVENT_FACET_CACHE_TIMEOUT)
+    next_start = upcoming.aggregate(next_start=Min("date"))["next_start"]
+    if next_start is not None and next_start < valid_until:
+        valid_until = next_start # The earliest event stops being "upcoming" then
+    return {"facets": facets, "valid_until": valid_until}
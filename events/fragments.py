@@ -0,0 +1,103 @@
+# events/fragments.py
+""" Rendered-fragment cache for the event list cards and the event detail page.
+
+    The markup of an event (title, category, date, location, price) only changes
+    when the event is edited, so it is rendered once and reused from the Django
+    cache. Every fragment key contains the event's version, a value in the cache
+    that the Event save/delete signals replace (events/signals.py): an edit simply
+    makes the old fragments unreachable and they age out on their own.
+
+    Availability moves with every booking without an Event.save(), so it is never
+    part of a fragment. The listing shows the value already loaded with the page;
+    the detail page reads it from a separate short-lived cache entry, so a hit on a
+    popular event needs no database query at all.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from .inventory import get_available_tickets
+from .models import Event
+
+DETAIL_TEMPLATE = "events/event_detail_body.html"
+
+
+def _version_key(event_pk):
+    return f"events:version:{event_pk}"
+
+
+def get_event_versions(event_pks):
+    """ Returns {event_pk: version} for the given events with a single cache read,
+        creating a version for any event the cache does not know (yet).
+    """
+    keys = {_version_key(pk): pk for pk in event_pks}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for key, pk in keys.items():
+        if key not in found:
+            # add() keeps a version another process may have created meanwhile
+            cache.add(key, time.time_ns(), None)
+            versions[pk] = cache.get(key)
+    return versions
+
+
+def get_event_version(event_pk):
+    """ Returns the current version of a single event. """
+    return get_event_versions([event_pk])[event_pk]
+
+
+def bump_event_version(event_pk):
+    """ Starts a new version for an event, invalidating all of its cached fragments,
+        once the current transaction (if any) has committed. Bumped earlier, a
+        concurrent request could render the old, still committed row and cache it
+        under the new version for EVENT_FRAGMENT_CACHE_TIMEOUT.
+    """
+    transaction.on_commit(lambda: cache.set(_version_key(event_pk), time.time_ns(), None))
+
+
+def get_event_detail_fragment(event_pk):
+    """ Returns the cached detail payload of an event: a dict with its title, date
+        and rendered body. Loads and renders the event on a miss; returns None if
+        the event does not exist.
+    """
+    key = f"events:detail:{event_pk}:{get_event_version(event_pk)}"
+    payload = cache.get(key)
+    if payload is None:
+        event = Event.objects.filter(pk=event_pk).first()
+        if event is None:
+            return None
+        payload = {
+            "title": event.title,
+            "date": event.date,
+            "admission_rate": event.admission_rate,
+            "body": render_to_string(DETAIL_TEMPLATE, {"event": event}),
+        }
+        cache.set(key, payload, settings.EVENT_FRAGMENT_CACHE_TIMEOUT)
+        # The event is loaded anyway, so prime the availability entry as well
+        _cache_availability(event)
+    return payload
+
+
+def get_event_availability(event_pk):
+    """ Returns (available_tickets, total_tickets) for an event, cached for
+        EVENT_AVAILABILITY_CACHE_TIMEOUT seconds, or None if the event does not exist.
+    """
+    availability = cache.get(f"events:availability:{event_pk}")
+    if availability is None:
+        event = Event.objects.filter(pk=event_pk).only(
+            "available_tickets", "total_tickets", "inventory_shards"
+        ).first()
+        if event is None:
+            return None
+        availability = _cache_availability(event)
+    return availability
+
+
+def _cache_availability(event):
+    # For sharded events the column is only a periodically synced aggregate, use the shards
+    availability = (get_available_tickets(event), event.total_tickets)
+    cache.set(f"events:availability:{event.pk}", availability, settings.EVENT_AVAILABILITY_CACHE_TIMEOUT)
+    return availability
@@ -0,0 +1,288 @@
+# events/importing.py
+""" Streaming bulk import of events from CSV or JSON Lines files.
+
+    Event.save() runs full_clean() and the search/facet/fragment signals for every
+    row, which makes loading a season's catalogue of tens of thousands of events
+    through the admin or fixtures very slow. The importer instead reads the file one
+    row at a time and handles it in batches of `batch_size` rows:
+
+    - Validation runs column by column over the whole batch (required values,
+      lengths, numbers, dates), then the cross-field rules of Event.clean() on the
+      parsed columns. A row that fails is reported with its line number and skipped;
+      the import carries on with the other rows.
+    - The valid rows of a batch are inserted with a single bulk_create in their own
+      transaction, so a crash loses at most the batch in progress.
+    - Only the current batch and the first `max_errors` error messages are held in
+      memory, whatever the size of the file.
+
+    bulk_create() sends no post_save signals, so the search index is rebuilt and the
+    category facets are invalidated once at the end. Bookings are imported the same
+    way by bookings/importing.py, which reuses the reader and the column helpers.
+"""
+import csv
+import json
+import sys
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .facets import invalidate_category_facets
+from .models import Event
+from .search import get_search_backend
+
+FORMATS = ("csv", "jsonl")
+MISSING = object() # A blank cell, a null or an absent key
+
+
+class ImportResult:
+    """ Outcome of an import: row counts and the first `max_errors` row errors. """
+
+    def __init__(self, max_errors=1000):
+        self.rows = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = [] # (line number, message)
+        self.max_errors = max_errors
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, message))
+
+
+def detect_format(path, format=None):
+    """ Returns the format given, or the one implied by the file extension. """
+    if format:
+        return format
+    suffix = Path(str(path)).suffix.lower()
+    if suffix == ".csv":
+        return "csv"
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of '{path}'; pass csv or jsonl explicitly.")
+
+
+def read_rows(file, format):
+    """ Yields (line number, row dict or None, error message or None) for every
+        record of an open text file, one record at a time. CSV files need a header row.
+    """
+    if format == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            if None in row: # More cells than header columns
+                yield reader.line_num, None, "Too many values for the header row."
+            else:
+                yield reader.line_num, row, None
+    elif format == "jsonl":
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if isinstance(row, dict):
+                yield line_number, row, None
+            else:
+                yield line_number, None, "Expected a JSON object."
+    else:
+        raise ValueError(f"Unknown format '{format}'.")
+
+
+def open_input(path):
+    """ Opens `path` for reading rows ("-" is standard input). """
+    if str(path) == "-":
+        return sys.stdin
+    return open(path, newline="", encoding="utf-8-sig") # Tolerates the BOM of Excel exports
+
+
+def batched(iterable, size):
+    """ Yields lists of up to `size` items, consuming `iterable` lazily. """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# --- Column helpers ---
+# Each parses one column of a batch: it returns the parsed values in row order and
+# records a message in `errors` ({row index: [messages]}) for every invalid cell.
+
+def cell(row, name):
+    value = row.get(name)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return MISSING
+    return value.strip() if isinstance(value, str) else value
+
+
+def text_column(rows, name, errors, max_length, required=True):
+    values = []
+    for index, row in enumerate(rows):
+        value = cell(row, name)
+        if value is MISSING:
+            if required:
+                errors.setdefault(index, []).append(f"{name}: This field is required.")
+            values.append("")
+            continue
+        value = str(value)
+        if len(value) > max_length:
+            errors.setdefault(index, []).append(f"{name}: At most {max_length} characters (it has {len(value)}).")
+        values.append(value)
+    return values
+
+
+def integer_column(rows, name, errors, default=MISSING, minimum=0):
+    values = []
+    for index, row in enumerate(rows):
+        value = cell(row, name)
+        if value is MISSING:
+            if default is MISSING:
+                errors.setdefault(index, []).append(f"{name}: This field is required.")
+            values.append(None if default is MISSING else default)
+            continue
+        try:
+            number = int(value)
+            if isinstance(value, float) and number != value:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors.setdefault(index, []).append(f"{name}: '{value}' is not a whole number.")
+            values.append(None)
+            continue
+        if number < minimum:
+            errors.setdefault(index, []).append(f"{name}: Must be at least {minimum}.")
+        values.append(number)
+    return values
+
+
+def decimal_column(rows, name, errors, max_digits, decimal_places, default=MISSING):
+    values = []
+    limit = Decimal(10) ** (max_digits - decimal_places)
+    for index, row in enumerate(rows):
+        value = cell(row, name)
+        if value is MISSING:
+            if default is MISSING:
+                errors.setdefault(index, []).append(f"{name}: This field is required.")
+            values.append(None if default is MISSING else default)
+            continue
+        try:
+            number = Decimal(str(value))
+            if not number.is_finite():
+                raise InvalidOperation
+        except InvalidOperation:
+            errors.setdefault(index, []).append(f"{name}: '{value}' is not a number.")
+            values.append(None)
+            continue
+        if number < 0:
+            errors.setdefault(index, []).append(f"{name}: Must not be negative.")
+        elif number.as_tuple().exponent < -decimal_places:
+            errors.setdefault(index, []).append(f"{name}: At most {decimal_places} decimal places.")
+        elif number >= limit:
+            errors.setdefault(index, []).append(f"{name}: Must be less than {limit}.")
+        values.append(number)
+    return values
+
+
+def datetime_column(rows, name, errors):
+    """ ISO 8601 dates or date-times; naive values are in the current time zone. """
+    values = []
+    tz = timezone.get_current_timezone()
+    for index, row in enumerate(rows):
+        value = cell(row, name)
+        parsed = None
+        if value is MISSING:
+            errors.setdefault(index, []).append(f"{name}: This field is required.")
+        else:
+            try:
+                parsed = parse_datetime(str(value))
+                if parsed is None and (day := parse_date(str(value))) is not None:
+                    parsed = datetime.combine(day, time())
+            except ValueError: # Well formed but impossible, e.g. February 30th
+                parsed = None
+            if parsed is None:
+                errors.setdefault(index, []).append(f"{name}: '{value}' is not a valid ISO 8601 date/time.")
+            elif timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed, tz)
+        values.append(parsed)
+    return values
+
+
+class EventImporter:
+    """ Imports events from rows with the columns title, category, date, location,
+        price, total_tickets and optionally available_tickets (defaults to
+        total_tickets, as in Event.save()) and admission_rate (defaults to 0).
+    """
+
+    def __init__(self, batch_size=1000, allow_past=False, dry_run=False, max_errors=1000):
+        self.batch_size = batch_size
+        self.allow_past = allow_past
+        self.dry_run = dry_run
+        self.max_errors = max_errors
+
+    def run(self, records):
+        """ Imports the (line number, row, error) records of read_rows(). Returns an ImportResult. """
+        result = ImportResult(self.max_errors)
+        for batch in batched(records, self.batch_size):
+            result.rows += len(batch)
+            rows, lines, batch_errors = [], [], []
+            for line, row, error in batch:
+                if error:
+                    batch_errors.append((line, error))
+                else:
+                    rows.append(row)
+                    lines.append(line)
+            events, errors = self.validate(rows)
+            batch_errors.extend((lines[index], " ".join(messages)) for index, messages in errors.items())
+            for line, message in sorted(batch_errors):
+                result.add_error(line, message)
+            if events and not self.dry_run:
+                with transaction.atomic():
+                    Event.objects.bulk_create(events) # Bypasses Event.save(): validated above
+            result.created += len(events)
+        if result.created and not self.dry_run:
+            # bulk_create() sent no post_save: update what the Event signals would have
+            get_search_backend().rebuild()
+            invalidate_category_facets()
+        return result
+
+    def validate(self, rows):
+        """ Validates a batch of row dicts. Returns the Event instances of the valid
+            rows and {row index: [messages]} for the others.
+        """
+        errors = {}
+        field = Event._meta.get_field
+        titles = text_column(rows, "title", errors, field("title").max_length)
+        categories = text_column(rows, "category", errors, field("category").max_length)
+        locations = text_column(rows, "location", errors, field("location").max_length)
+        dates = datetime_column(rows, "date", errors)
+        price_field = field("price")
+        prices = decimal_column(rows, "price", errors, price_field.max_digits, price_field.decimal_places)
+        totals = integer_column(rows, "total_tickets", errors)
+        availables = integer_column(rows, "available_tickets", errors, default=None)
+        admission_rates = integer_column(rows, "admission_rate", errors, default=0)
+
+        # Cross-field rules, on the parsed columns
+        now = timezone.now()
+        for index, (date, total, available) in enumerate(zip(dates, totals, availables)):
+            if available is None:
+                availables[index] = available = total # As Event.save() does for new events
+            if total is not None and available is not None and available > total:
+                errors.setdefault(index, []).append("available_tickets: Available tickets cannot exceed total tickets.")
+            if date is not None and date < now and not self.allow_past:
+                errors.setdefault(index, []).append("date: The event date is in the past.")
+
+        events = [
+            Event(
+                title=title, category=category, date=date, location=location, price=price,
+                total_tickets=total, available_tickets=available, admission_rate=admission_rate,
+            )
+            for index, (title, category, date, location, price, total, available, admission_rate) in enumerate(
+                zip(titles, categories, dates, locations, prices, totals, availables, admission_rates)
+            )
+            if index not in errors
+        ]
+        return events, errors
@@ -0,0 +1,200 @@
+# events/inventory.py
+""" Ticket inventory operations (reserve, release, availability) for events.
+
+    By default an event's availability lives in the single Event.available_tickets
+    column, which bookings decrement with one conditional UPDATE. Every booking for
+    that event still has to write the same row, so for hot on-sales the inventory
+    can be split into N EventInventoryShard rows: a booking decrements one shard
+    with a conditional atomic UPDATE and only falls back to other shards when the
+    chosen one cannot cover the requested quantity.
+    Throughput then grows with the shard count instead of being capped by one lock.
+"""
+import random
+
+from django.db import transaction
+from django.db.models import F, Sum, Subquery, OuterRef, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from .models import Event, EventInventoryShard
+
+
+def shard_event_inventory(event, shard_count):
+    """ Splits an event's available tickets across `shard_count` counter shards.
+        Any existing shards are merged back first, so this can also be used to
+        re-shard an event. Returns the refreshed Event instance.
+    """
+    if shard_count < 1:
+        raise ValueError("Shard count must be at least 1.")
+
+    with transaction.atomic():
+        # Fold existing shards (if any) back into the event row before re-splitting
+        event = merge_event_inventory(event)
+        total = event.available_tickets
+
+        # Spread the tickets as evenly as possible; the first shards get the remainder
+        base, remainder = divmod(total, shard_count)
+        EventInventoryShard.objects.bulk_create([
+            EventInventoryShard(
+                event_id=event.pk,
+                index=index,
+                available_tickets=base + (1 if index < remainder else 0),
+            )
+            for index in range(shard_count)
+        ])
+        Event.objects.filter(pk=event.pk).update(inventory_shards=shard_count)
+        event.inventory_shards = shard_count
+    return event
+
+
+def merge_event_inventory(event):
+    """ Collapses an event's shards back into Event.available_tickets and deletes them.
+        Typically run once the on-sale rush is over. Returns the refreshed Event instance.
+    """
+    with transaction.atomic():
+        # Lock the event row so no other re-shard/merge interleaves with this one
+        event = Event.objects.select_for_update().get(pk=event.pk)
+        if event.inventory_shards:
+            total = _shard_total(event.pk)
+            EventInventoryShard.objects.filter(event_id=event.pk).delete()
+            Event.objects.filter(pk=event.pk).update(available_tickets=total, inventory_shards=0)
+            event.available_tickets = total
+            event.inventory_shards = 0
+    return event
+
+
+def get_available_tickets(event):
+    """ Returns the exact number of tickets still available for an event.
+        For sharded events this is the aggregate of all shard counters.
+    """
+    if not event.inventory_shards:
+        return event.available_tickets
+    return _shard_total(event.pk)
+
+
+def refresh_available_tickets(event_pk):
+    """ Writes the aggregate of a sharded event's counters back to Event.available_tickets
+        with a single UPDATE, so listings that read the column stay reasonably fresh.
+        Not called on the booking path, since that would reintroduce the hot row.
+    """
+    shard_total = (
+        EventInventoryShard.objects.filter(event_id=OuterRef("pk"))
+        .values("event_id")
+        .annotate(total=Sum("available_tickets"))
+        .values("total")
+    )
+    return Event.objects.filter(pk=event_pk, inventory_shards__gt=0).update(
+        available_tickets=Coalesce(Subquery(shard_total), Value(0))
+    )
+
+
+def reserve_tickets(event, quantity, upcoming_only=True):
+    """ Atomically takes `quantity` tickets from an upcoming event's inventory.
+        Unsharded events are decremented with a single conditional UPDATE
+        (`available_tickets = available_tickets - q WHERE available_tickets >= q`),
+        so no read-check-write cycle or row lock is needed. Sharded events go through
+        the shard counters instead.
+        Returns True if the tickets were reserved, False if not enough are left
+        (or the event has already started). With `upcoming_only=False` past events
+        are reserved from as well, e.g. when importing historical bookings.
+    """
+    if event.inventory_shards:
+        return _reserve_from_shards(event, quantity)
+
+    events = Event.objects.filter(pk=event.pk, available_tickets__gte=quantity)
+    if upcoming_only:
+        events = events.filter(date__gte=timezone.now())
+    updated = events.update(available_tickets=F("available_tickets") - quantity)
+    return updated == 1
+
+
+def release_tickets(event, quantity):
+    """ Returns `quantity` tickets to an event's inventory (e.g. on cancellation).
+        For sharded events the tickets go to a random shard; the aggregate is all that matters.
+        Either way the availability never rises above total_tickets (e.g. after a
+        manual rebalance in the admin).
+    """
+    if not event.inventory_shards:
+        Event.objects.filter(pk=event.pk).update(
+            available_tickets=Least(F("available_tickets") + quantity, F("total_tickets"))
+        )
+        return
+
+    # Room left under total_tickets, computed in the same UPDATE as the increment
+    total = Event.objects.filter(pk=event.pk).values("total_tickets")
+    held = (
+        EventInventoryShard.objects.filter(event_id=event.pk)
+        .values("event_id")
+        .annotate(total=Sum("available_tickets"))
+        .values("total")
+    )
+    room = Subquery(total) - Coalesce(Subquery(held), Value(0))
+    index = random.randrange(event.inventory_shards)
+    EventInventoryShard.objects.filter(event_id=event.pk, index=index).update(
+        available_tickets=F("available_tickets") + Greatest(Least(Value(quantity), room), Value(0))
+    )
+
+
+def _reserve_from_shards(event, quantity):
+    """ Takes `quantity` tickets from a sharded event's counters.
+        Starts at a random shard so concurrent buyers spread across rows, and walks
+        the remaining shards if the chosen one is too low. Falls back to gathering
+        the quantity from several shards when no single shard can cover it.
+    """
+    shard_count = event.inventory_shards
+    start = random.randrange(shard_count)
+    for offset in range(shard_count):
+        index = (start + offset) % shard_count
+        # Conditional UPDATE: only succeeds if this shard still holds enough tickets
+        updated = EventInventoryShard.objects.filter(
+            event_id=event.pk, index=index, available_tickets__gte=quantity
+        ).update(available_tickets=F("available_tickets") - quantity)
+        if updated:
+            return True
+
+    # No single shard can cover the request; try to assemble it from several shards
+    return _reserve_across_shards(event, quantity)
+
+
+def _shard_total(event_pk):
+    """ Sums the shard counters of a single event. """
+    total = EventInventoryShard.objects.filter(event_id=event_pk).aggregate(
+        total=Sum("available_tickets")
+    )["total"]
+    return total or 0
+
+
+class _ShardRaceLost(Exception):
+    """ Raised internally to roll back a multi-shard reservation that lost a race. """
+
+
+def _reserve_across_shards(event, quantity):
+    """ Reserves `quantity` tickets by draining several partially filled shards.
+        Runs in a savepoint; every decrement is still a conditional UPDATE, so if a
+        concurrent booking empties one of the shards mid-way the whole attempt is
+        rolled back instead of overselling.
+    """
+    try:
+        with transaction.atomic():
+            shards = list(
+                EventInventoryShard.objects.select_for_update()
+                .filter(event_id=event.pk, available_tickets__gt=0)
+                .values_list("index", "available_tickets")
+            )
+            if sum(available for _, available in shards) < quantity:
+                return False
+
+            remaining = quantity
+            for index, available in shards:
+                take = min(available, remaining)
+                updated = EventInventoryShard.objects.filter(
+                    event_id=event.pk, index=index, available_tickets__gte=take
+                ).update(available_tickets=F("available_tickets") - take)
+                if not updated:
+                    raise _ShardRaceLost()
+                remaining -= take
+                if not remaining:
+                    return True
+    except _ShardRaceLost:
+        return False
+    return False
@@ -0,0 +1,106 @@
+# events/management/commands/benchmark_search.py
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from events.models import Event
+from events.pagination import paginate_keyset
+from events.search import IContainsSearchBackend, get_search_backend
+
+WORDS = (
+    "summer", "jazz", "festival", "rock", "night", "symphony", "orchestra", "comedy", "tour", "live",
+    "classic", "indie", "techno", "opera", "ballet", "marathon", "derby", "final", "cup", "open",
+    "python", "data", "cloud", "summit", "workshop", "design", "startup", "product", "security", "ai",
+)
+CITIES = (
+    "London", "Berlin", "Madrid", "Paris", "Lisbon", "Vienna", "Prague", "Dublin", "Oslo", "Warsaw",
+    "Helsinki", "Athens", "Rome", "Zurich", "Brussels", "Amsterdam", "Copenhagen", "Stockholm",
+)
+VENUES = ("Arena", "Stadium", "Hall", "Theatre", "Expo Centre", "Park", "Club", "Conference Centre")
+CATEGORIES = ("Concert", "Workshop", "Conference", "Sports", "Theatre", "Festival")
+
+
+def _percentile(sorted_values, percent):
+    """ Nearest-rank percentile of an already sorted list. """
+    rank = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class Command(BaseCommand):
+    """ Compares first-page listing latency of the icontains scan with the configured
+        search backend. Synthetic events are inserted inside a transaction that is
+        rolled back at the end, so the database is left untouched.
+
+        Example:
+            python manage.py benchmark_search --events 100000 --queries 300
+    """
+    help = "Benchmark event search latency: icontains scan vs. the configured full-text backend."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=100000, help="Synthetic events to search.")
+        parser.add_argument("--queries", type=int, default=200, help="Search queries per backend.")
+        parser.add_argument("--page-size", type=int, default=12, help="Events fetched per query.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        queries = [self._random_query(rng) for _ in range(options["queries"])]
+        backends = [("icontains", IContainsSearchBackend()), (type(get_search_backend()).__name__, get_search_backend())]
+
+        # Build the index once outside the rolled-back transaction, so that e.g. a newly
+        # created FTS table survives the rollback
+        get_search_backend().rebuild()
+
+        with transaction.atomic():
+            self._seed(rng, options["events"])
+            for name, backend in backends:
+                started = time.perf_counter()
+                backend.rebuild()
+                self.stdout.write(f"{name}: index built in {time.perf_counter() - started:.2f}s")
+            for name, backend in backends:
+                self._run(name, backend, queries, options["page_size"])
+            transaction.set_rollback(True) # Discard the synthetic events (and their index rows)
+
+    def _seed(self, rng, count):
+        started = time.perf_counter()
+        now = timezone.now()
+        batch = []
+        for index in range(count):
+            tickets = rng.randint(50, 50000)
+            batch.append(Event(
+                title=" ".join(rng.sample(WORDS, 3)).title(),
+                category=rng.choice(CATEGORIES),
+                date=now + timedelta(minutes=rng.randint(60, 60 * 24 * 365)),
+                location=f"{rng.choice(CITIES)} {rng.choice(VENUES)}",
+                price=rng.randint(5, 300),
+                total_tickets=tickets,
+                available_tickets=tickets,
+            ))
+            if len(batch) == 5000:
+                Event.objects.bulk_create(batch) # Bypasses Event.save(), so no per-row signals
+                batch = []
+        Event.objects.bulk_create(batch)
+        self.stdout.write(f"Seeded {count} events in {time.perf_counter() - started:.1f}s")
+
+    def _random_query(self, rng):
+        """ A one- or two-word query, the last word truncated as if still being typed. """
+        words = rng.sample(WORDS + tuple(city.lower() for city in CITIES), rng.choice((1, 2)))
+        words[-1] = words[-1][:rng.randint(min(3, len(words[-1])), len(words[-1]))]
+        return " ".join(words)
+
+    def _run(self, name, backend, queries, page_size):
+        latencies = []
+        base = Event.objects.filter(date__gte=timezone.now())
+        for query in queries:
+            started = time.perf_counter()
+            paginate_keyset(backend.filter_queryset(base, query), ("date", "id"), None, page_size)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        self.stdout.write(
+            f"{name}: {len(queries)} queries, p50={_percentile(latencies, 50) * 1000:.2f}ms "
+            f"p99={_percentile(latencies, 99) * 1000:.2f}ms "
+            f"total={sum(latencies):.2f}s"
+        )
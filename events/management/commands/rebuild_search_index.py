@@ -0,0 +1,21 @@
+# events/management/commands/rebuild_search_index.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """ Rebuilds the event search index from scratch, e.g. after bulk imports that
+        bypassed Event.save() or after switching EVENT_SEARCH_BACKEND.
+    """
+    help = "Rebuild the full-text search index of events."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        started = time.perf_counter()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {type(backend).__name__} index in {time.perf_counter() - started:.2f}s."
+        ))
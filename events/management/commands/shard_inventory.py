@@ -0,0 +1,54 @@
+# events/management/commands/shard_inventory.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from events.models import Event
+from events import inventory
+
+
+class Command(BaseCommand):
+    """ Splits, merges or re-syncs the sharded ticket inventory of an event.
+
+        Examples:
+            python manage.py shard_inventory 42 --shards 16   # before a big on-sale
+            python manage.py shard_inventory 42 --sync        # refresh the listing count
+            python manage.py shard_inventory 42 --merge       # once the rush is over
+    """
+    help = "Split an event's available tickets into counter shards, or merge/sync them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("event_pk", type=int, help="Primary key of the event.")
+        parser.add_argument(
+            "--shards", type=int, default=settings.INVENTORY_SHARD_COUNT,
+            help="Number of counter shards to create (default: INVENTORY_SHARD_COUNT).",
+        )
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument("--merge", action="store_true", help="Collapse the shards back into the event row.")
+        group.add_argument("--sync", action="store_true", help="Write the shard total back to Event.available_tickets.")
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(pk=options["event_pk"])
+        except Event.DoesNotExist:
+            raise CommandError(f"Event {options['event_pk']} does not exist.")
+
+        if options["merge"]:
+            event = inventory.merge_event_inventory(event)
+            self.stdout.write(self.style.SUCCESS(
+                f"Merged shards of '{event.title}': {event.available_tickets} ticket(s) available."
+            ))
+        elif options["sync"]:
+            if not event.inventory_shards:
+                raise CommandError(f"Event {event.pk} is not sharded.")
+            inventory.refresh_available_tickets(event.pk)
+            self.stdout.write(self.style.SUCCESS(
+                f"Synced '{event.title}': {inventory.get_available_tickets(event)} ticket(s) available."
+            ))
+        else:
+            try:
+                event = inventory.shard_event_inventory(event, options["shards"])
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(
+                f"Split {event.available_tickets} ticket(s) of '{event.title}' across {event.inventory_shards} shard(s)."
+            ))
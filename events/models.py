@@ -36,6 +36,19 @@ class Event(models.Model):
         help_text="The number of tickets currently available for booking.",
         # editable=False # Consider making this non-editable directly in admin after initial setup
     )
+    # Number of counter shards the availability is split across (see events/inventory.py).
+    # 0 means the event is not sharded and available_tickets is the authoritative count.
+    inventory_shards = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False, # Managed by the shard_inventory management command
+        help_text="Number of inventory counter shards (0 = not sharded)."
+    )
+    # Buyers admitted per minute through the virtual waiting room (see bookings/waiting_room.py).
+    # 0 disables the waiting room and anyone may book straight away.
+    admission_rate = models.PositiveIntegerField(
+        default=0,
+        help_text="Buyers admitted to booking per minute during high demand (0 = no waiting room)."
+    )
     # Optional: Add a description field
     # description = models.TextField(blank=True, null=True, help_text="A detailed description of the event.")
     # Optional: Add an image field
@@ -78,4 +91,43 @@ class Event(models.Model):
         ordering = ["date"] # Order events by date by default in querysets
         verbose_name = "Event"
         verbose_name_plural = "Events"
+        indexes = [
+            # Back the keyset-paginated listing: upcoming events ordered by (date, id),
+            # optionally filtered by category
+            models.Index(fields=["date"], name="event_date_idx"),
+            models.Index(fields=["category", "date"], name="event_category_date_idx"),
+        ]
+
+
+class EventInventoryShard(models.Model):
+    """ One counter shard of an event's ticket inventory.
+        Hot events split their available tickets across several shard rows so that
+        concurrent bookings decrement different rows instead of queueing on the single
+        Event row lock. The event's true availability is the sum of its shards.
+    """
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE, # Shards are meaningless without their event
+        related_name="shards", # Allows accessing event.shards
+        help_text="The event this inventory shard belongs to."
+    )
+    index = models.PositiveSmallIntegerField(
+        help_text="Position of this shard within the event (0 to inventory_shards - 1)."
+    )
+    available_tickets = models.PositiveIntegerField(
+        help_text="Tickets currently available in this shard."
+    )
 
+    def __str__(self):
+        """ String representation of the EventInventoryShard object. """
+        return f"Shard {self.index} of event {self.event_id} ({self.available_tickets} left)"
+
+    class Meta:
+        """ Meta options for the EventInventoryShard model. """
+        ordering = ["event", "index"]
+        verbose_name = "Event Inventory Shard"
+        verbose_name_plural = "Event Inventory Shards"
+        constraints = [
+            # One row per (event, shard index); also serves as the lookup index for bookings
+            models.UniqueConstraint(fields=["event", "index"], name="unique_event_shard_index"),
+        ]
@@ -0,0 +1,91 @@
+# events/pagination.py
+""" Keyset (seek) pagination.
+
+    OFFSET pagination makes the database walk and discard every row before the
+    requested page, so page N costs O(N). Keyset pagination instead remembers the
+    sort key of the last row shown (the "cursor") and asks for rows after it, which
+    an index on the ordering columns answers directly: every page costs the same.
+    The ordering must be unique, so it always ends with the primary key.
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+
+class KeysetPage:
+    """ One page of results plus the cursor of the following page (None on the last page). """
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def paginate_keyset(queryset, ordering, cursor=None, per_page=20):
+    """ Returns the KeysetPage of `queryset` that follows `cursor`.
+        `ordering` lists the sort fields, e.g. ("date", "id") or ("-created_at", "-id"),
+        and must uniquely order the rows. Works for model instances as well as
+        `.values()` querysets (which must include the ordering fields).
+        An invalid or tampered cursor simply yields the first page.
+    """
+    values = decode_cursor(queryset.model, ordering, cursor)
+    if values is not None:
+        queryset = queryset.filter(_after(ordering, values))
+
+    rows = list(queryset.order_by(*ordering)[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(ordering, rows[-1])
+    return KeysetPage(rows, next_cursor)
+
+
+def encode_cursor(ordering, row):
+    """ Builds an opaque URL-safe cursor from the ordering fields of a row. """
+    values = []
+    for field in ordering:
+        name = field.lstrip("-")
+        value = row[name] if isinstance(row, dict) else getattr(row, name)
+        values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(model, ordering, cursor):
+    """ Parses a cursor back into Python values, or returns None if it is missing or invalid. """
+    if not cursor:
+        return None
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(raw, list) or len(raw) != len(ordering):
+            return None
+        return [
+            model._meta.get_field(field.lstrip("-")).to_python(value)
+            for field, value in zip(ordering, raw)
+        ]
+    except Exception:
+        return None
+
+
+def _after(ordering, values):
+    """ Builds the "row comes after the cursor" condition for a multi-column ordering:
+        (a > va) OR (a = va AND b > vb) OR ...
+    """
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        clause = Q(**{f"{name}__{lookup}": values[position]})
+        for previous_field, previous_value in zip(ordering[:position], values[:position]):
+            clause &= Q(**{previous_field.lstrip("-"): previous_value})
+        condition |= clause
+    return condition
@@ -0,0 +1,179 @@
+# events/search.py
+""" Full-text search for events.
+
+    The listing used to search with `title__icontains | location__icontains`, i.e.
+    `LIKE '%q%'`, which cannot use an index and scans every event on each keystroke.
+    Search is now delegated to a pluggable backend (Bridge pattern, like the payment
+    processors): SQLiteFTS5SearchBackend keeps an FTS5 inverted index of title,
+    location and category, updated incrementally by the Event save/delete signals
+    (events/signals.py). IContainsSearchBackend keeps the old behaviour for database
+    engines without a full-text backend yet. Select one with EVENT_SEARCH_BACKEND.
+"""
+import abc
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Event
+
+
+class SearchBackend(abc.ABC):
+    """ Interface every event search backend implements. """
+
+    @abc.abstractmethod
+    def filter_queryset(self, queryset, query):
+        """ Restricts an Event queryset to events matching `query` (ordering untouched). """
+        pass
+
+    @abc.abstractmethod
+    def search(self, query, limit=10):
+        """ Returns the primary keys of the best matching events, most relevant first. """
+        pass
+
+    def index_event(self, event):
+        """ Adds or refreshes a single event in the index (no-op for index-less backends). """
+        pass
+
+    def remove_event(self, event_pk):
+        """ Removes a single event from the index. """
+        pass
+
+    def rebuild(self):
+        """ Rebuilds the whole index from the events table. """
+        pass
+
+    def prepare(self):
+        """ Creates the index storage if it does not exist yet (run after migrate). """
+        pass
+
+
+class IContainsSearchBackend(SearchBackend):
+    """ Case-insensitive substring search with LIKE; needs no index, scans the table. """
+
+    def filter_queryset(self, queryset, query):
+        return queryset.filter(Q(title__icontains=query) | Q(location__icontains=query))
+
+    def search(self, query, limit=10):
+        return list(
+            self.filter_queryset(Event.objects.all(), query).order_by("date").values_list("pk", flat=True)[:limit]
+        )
+
+
+class SQLiteFTS5SearchBackend(SearchBackend):
+    """ SQLite FTS5 inverted index over title, location and category.
+        Every word of the query must match the start of a word in the event
+        (prefix matching), and results are ranked with bm25, titles weighing most.
+    """
+    table = "events_event_fts"
+    # bm25 column weights: title, location, category
+    weights = (10.0, 4.0, 2.0)
+
+    def __init__(self):
+        self._table_ready = False
+
+    def filter_queryset(self, queryset, query):
+        expression = self.match_expression(query)
+        if expression is None:
+            return queryset
+        self._ensure_table()
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s", [expression]
+        ))
+
+    def search(self, query, limit=10):
+        expression = self.match_expression(query)
+        if expression is None:
+            return []
+        self._ensure_table()
+        weights = ", ".join(str(weight) for weight in self.weights)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s "
+                f"ORDER BY bm25({self.table}, {weights}) LIMIT %s",
+                [expression, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def index_event(self, event):
+        self._ensure_table()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [event.pk])
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, title, location, category) VALUES (%s, %s, %s, %s)",
+                [event.pk, event.title, event.location, event.category],
+            )
+
+    def remove_event(self, event_pk):
+        self._ensure_table()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [event_pk])
+
+    def rebuild(self):
+        self._ensure_table()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, title, location, category) "
+                f"SELECT id, title, location, category FROM {Event._meta.db_table}"
+            )
+
+    def prepare(self):
+        self._ensure_table()
+
+    @staticmethod
+    def match_expression(query):
+        """ Turns free text into an FTS5 query: every word quoted and prefix-matched.
+            Returns None if the text contains no searchable words.
+        """
+        words = re.findall(r"\w+", query or "")
+        if not words:
+            return None
+        return " ".join(f'"{word}"*' for word in words)
+
+    def _ensure_table(self):
+        """ Creates the FTS5 table on first use and fills it from existing events.
+            The table is normally created after migrate (see EventsConfig.ready); this
+            covers databases migrated before. The "ready" flag is only set once the
+            table is known to be committed: a table created inside a transaction that
+            is rolled back (a TestCase, a failed admin save) is gone again, and the
+            next call has to create it anew.
+        """
+        if self._table_ready:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [self.table])
+            exists = cursor.fetchone() is not None
+            if not exists:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {self.table} USING fts5("
+                    f"title, location, category, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+                )
+        if not exists:
+            self.rebuild()
+        transaction.on_commit(self._mark_table_ready) # Right away outside atomic blocks
+
+    def _mark_table_ready(self):
+        self._table_ready = True
+
+
+_backend = None
+
+
+def get_search_backend():
+    """ Returns the process-wide search backend configured by EVENT_SEARCH_BACKEND
+        (a dotted class path). Defaults to FTS5 on SQLite and icontains elsewhere.
+    """
+    global _backend
+    if _backend is None:
+        path = settings.EVENT_SEARCH_BACKEND
+        if not path:
+            path = (
+                "events.search.SQLiteFTS5SearchBackend" if connection.vendor == "sqlite"
+                else "events.search.IContainsSearchBackend"
+            )
+        _backend = import_string(path)()
+    return _backend
@@ -0,0 +1,34 @@
+# events/signals.py
+""" Signal handlers connected in EventsConfig.ready(). """
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .facets import invalidate_category_facets
+from .fragments import bump_event_version
+from .models import Event
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Event)
+def index_event(sender, instance, **kwargs):
+    """ Keeps the search index, category facet and cached fragments in step with a
+        created or edited event.
+    """
+    get_search_backend().index_event(instance)
+    invalidate_category_facets()
+    bump_event_version(instance.pk)
+
+
+@receiver(post_delete, sender=Event)
+def unindex_event(sender, instance, **kwargs):
+    """ Removes a deleted event from the search index, category facet and fragment cache. """
+    get_search_backend().remove_event(instance.pk)
+    invalidate_category_facets()
+    bump_event_version(instance.pk)
+
+
+def create_search_index(sender, **kwargs):
+    """ Creates the search index storage (e.g. the SQLite FTS5 table) after migrate,
+        outside of any request or test transaction.
+    """
+    get_search_backend().prepare()
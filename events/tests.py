@@ -1,3 +1,206 @@
+# events/tests.py
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from monitoring.testing import QueryBudgetTestMixin
+from . import inventory
+from .models import Event, EventInventoryShard
+from .pagination import encode_cursor, paginate_keyset
+
+
+class EventViewQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """ The event pages stay within their declared @query_budget, cold cache included. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("buyer", "buyer@example.com", "password")
+        cls.events = [
+            Event.objects.create(
+                title=f"Concert {number}", category="Concert" if number % 2 else "Workshop",
+                date=timezone.now() + timedelta(days=number + 1), location="Main Hall",
+                price=25, total_tickets=100, available_tickets=100,
+            )
+            for number in range(15)
+        ]
+
+    def setUp(self):
+        cache.clear() # Measure the cache misses too
+        self.client.force_login(self.user)
+
+    def test_event_list(self):
+        response = self.client.get(reverse("event_list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_event_list_filtered_by_category(self):
+        response = self.client.get(reverse("event_list"), {"category": "Concert"})
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_event_list_next_page(self):
+        first = self.client.get(reverse("event_list"))
+        self.assertIsNotNone(first.context["next_query"])
+        response = self.client.get(f"{reverse('event_list')}?{first.context['next_query']}")
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_event_detail(self):
+        response = self.client.get(reverse("event_detail", kwargs={"pk": self.events[0].pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+
+class EventDetailFragmentTests(TestCase):
+    """ The cached detail fragment follows edits and deletions of its event. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = Event.objects.create(
+            title="Concert", category="Concert", date=timezone.now() + timedelta(days=7),
+            location="Main Hall", price=25, total_tickets=100, available_tickets=100,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("event_detail", kwargs={"pk": self.event.pk})
+
+    def test_save_invalidates_the_fragment(self):
+        self.assertContains(self.client.get(self.url), "Main Hall")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.location = "Open Air Stage"
+            self.event.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, "Open Air Stage")
+        self.assertNotContains(response, "Main Hall")
+
+    def test_cached_fragment_is_not_served_before_commit(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=False):
+            self.event.location = "Open Air Stage"
+            self.event.save()
+            self.assertContains(self.client.get(self.url), "Main Hall")
+
+    def test_deleted_event_with_a_cached_fragment_is_not_found(self):
+        self.client.get(self.url)
+        # Deleted, but the version bump has not run yet and the availability entry expired
+        with self.captureOnCommitCallbacks(execute=False):
+            Event.objects.filter(pk=self.event.pk).delete()
+        cache.delete(f"events:availability:{self.event.pk}")
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class KeysetPaginationTests(TestCase):
+    """ paginate_keyset() walks every row exactly once, ties on the first ordering field included. """
+
+    @classmethod
+    def setUpTestData(cls):
+        date = timezone.now() + timedelta(days=1)
+        # Pairs of events share a date, so the id has to break the ties
+        cls.events = [
+            Event.objects.create(
+                title=f"Event {number}", category="Concert", date=date + timedelta(hours=number // 2),
+                location="Main Hall", price=10, total_tickets=10, available_tickets=10,
+            )
+            for number in range(7)
+        ]
+
+    def walk(self, queryset, ordering, per_page):
+        pages, cursor = [], None
+        while True:
+            page = paginate_keyset(queryset, ordering, cursor, per_page)
+            pages.append(list(page))
+            if not page.has_next:
+                return pages
+            cursor = page.next_cursor
+
+    def test_ascending(self):
+        pages = self.walk(Event.objects.all(), ("date", "id"), 3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([event for page in pages for event in page], self.events)
+
+    def test_descending(self):
+        pages = self.walk(Event.objects.all(), ("-date", "-id"), 2)
+        self.assertEqual([event for page in pages for event in page], self.events[::-1])
+
+    def test_values_queryset(self):
+        pages = self.walk(Event.objects.values("pk", "id", "date"), ("date", "id"), 4)
+        self.assertEqual([row["id"] for page in pages for row in page], [event.pk for event in self.events])
+
+    def test_exact_last_page_has_no_next(self):
+        page = paginate_keyset(Event.objects.all(), ("date", "id"), per_page=7)
+        self.assertEqual(len(page), 7)
+        self.assertFalse(page.has_next)
+
+    def test_invalid_cursor_yields_first_page(self):
+        first = paginate_keyset(Event.objects.all(), ("date", "id"), per_page=3)
+        for cursor in ("not-a-cursor", encode_cursor(("id",), self.events[2])):
+            page = paginate_keyset(Event.objects.all(), ("date", "id"), cursor, per_page=3)
+            self.assertEqual(list(page), list(first))
+
+
+class InventoryTests(TestCase):
+    """ Sharded and unsharded inventory: splitting, merging, reserving and releasing. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = Event.objects.create(
+            title="Concert", category="Concert", date=timezone.now() + timedelta(days=7),
+            location="Main Hall", price=25, total_tickets=10, available_tickets=10,
+        )
+
+    def shards(self):
+        return list(EventInventoryShard.objects.filter(event=self.event).values_list("available_tickets", flat=True))
+
+    def test_shard_splits_evenly(self):
+        event = inventory.shard_event_inventory(self.event, 3)
+        self.assertEqual(event.inventory_shards, 3)
+        self.assertEqual(self.shards(), [4, 3, 3])
+        self.assertEqual(inventory.get_available_tickets(event), 10)
+
+    def test_reshard_and_merge(self):
+        event = inventory.shard_event_inventory(self.event, 3)
+        self.assertTrue(inventory.reserve_tickets(event, 2))
+        event = inventory.shard_event_inventory(event, 2)
+        self.assertEqual(self.shards(), [4, 4])
+        event = inventory.merge_event_inventory(event)
+        self.assertEqual((event.inventory_shards, event.available_tickets), (0, 8))
+        self.assertEqual(self.shards(), [])
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.inventory_shards, self.event.available_tickets), (0, 8))
+
+    def test_refresh_writes_the_shard_total(self):
+        event = inventory.shard_event_inventory(self.event, 2)
+        inventory.reserve_tickets(event, 3)
+        self.assertEqual(inventory.refresh_available_tickets(event.pk), 1)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, 7)
+
+    def test_reserve_across_shards(self):
+        event = inventory.shard_event_inventory(self.event, 4) # 3, 3, 2, 2
+        # No single shard holds 7 tickets: they are gathered from several
+        self.assertTrue(inventory.reserve_tickets(event, 7))
+        self.assertEqual(sum(self.shards()), 3)
+        self.assertTrue(all(available >= 0 for available in self.shards()))
+        self.assertFalse(inventory.reserve_tickets(event, 4))
+        self.assertEqual(sum(self.shards()), 3)
+
+    def test_release_is_capped_at_total_tickets(self):
+        inventory.reserve_tickets(self.event, 4)
+        inventory.release_tickets(self.event, 6) # More than was taken, e.g. after a rebalance
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, 10)
 
-# Create your tests here.
+    def test_sharded_release_is_capped_at_total_tickets(self):
+        event = inventory.shard_event_inventory(self.event, 3)
+        inventory.reserve_tickets(event, 4)
+        inventory.release_tickets(event, 3)
+        self.assertEqual(inventory.get_available_tickets(event), 9)
+        inventory.release_tickets(event, 5)
+        self.assertEqual(inventory.get_available_tickets(event), 10)
+        inventory.release_tickets(event, 1)
+        self.assertEqual(inventory.get_available_tickets(event), 10)
@@ -1,9 +1,12 @@
 # events/urls.py
 from django.urls import path
-from .views import event_list, event_detail # Import event_detail
+from .views import event_list, event_list_json, event_search_json, event_detail, event_availability_stream
 
 urlpatterns = [
     path("", event_list, name="event_list"),
+    path("api/", event_list_json, name="event_list_json"), # JSON variant of the listing
+    path("api/search/", event_search_json, name="event_search_json"), # Ranked type-ahead suggestions
     path("<int:pk>/", event_detail, name="event_detail"), # Add URL for event detail
+    path("<int:pk>/availability/stream/", event_availability_stream, name="event_availability_stream"), # Server-Sent Events
 ]
 
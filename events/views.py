@@ -1,71 +1,188 @@
 # events/views.py
-from django.shortcuts import render, get_object_or_404
-from django.db.models import Q # For complex queries (e.g., OR conditions)
+import asyncio
+import json
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.shortcuts import render
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone # To filter events based on current time
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger # Optional: For pagination
+from django.utils.safestring import mark_safe
+
+from monitoring.decorators import query_budget
 
 from .models import Event
+from .availability import get_availability_broker
+from .facets import get_category_facets
+from .fragments import get_event_availability, get_event_detail_fragment, get_event_versions
+from .pagination import paginate_keyset
+from .search import get_search_backend
 
-def event_list(request):
-    """ Displays a list of upcoming events.
-        Handles filtering by search query (title, location) and category.
-        Also retrieves distinct categories for the filter dropdown.
-        Optional pagination can be added.
+# Unique ordering used for keyset pagination (backed by the event_date_idx index)
+EVENT_ORDERING = ("date", "id")
+# Number of type-ahead suggestions returned by event_search_json
+SEARCH_SUGGESTIONS = 8
+
+def _filtered_events(request):
+    """ Builds the upcoming-events queryset for the search (q) and category filters.
+        Shared by the HTML listing and its JSON variant.
     """
     # Start with a base queryset of upcoming events
-    base_queryset = Event.objects.filter(date__gte=timezone.now()).select_related() # select_related can optimize if needed later
-    queryset = base_queryset
-    
+    queryset = Event.objects.filter(date__gte=timezone.now())
+
     # Get search and filter parameters from the GET request
     query = request.GET.get("q")
     category = request.GET.get("category")
 
     # Apply search filters if parameters are provided
     if query:
-        # Filter by title OR location containing the query (case-insensitive)
-        queryset = queryset.filter(
-            Q(title__icontains=query) | Q(location__icontains=query)
-        )
-    
+        # Full-text match on title, location and category (see events/search.py)
+        queryset = get_search_backend().filter_queryset(queryset, query)
+
     if category:
-        # Filter by exact category match (case-insensitive)
-        queryset = queryset.filter(category__iexact=category)
-
-    # Get distinct categories from *upcoming* events for the filter dropdown
-    # Using the base_queryset ensures categories shown are relevant to available events
-    categories = base_queryset.values_list("category", flat=True).distinct().order_by("category")
-
-    # --- Optional: Add Pagination --- 
-    # page = request.GET.get("page", 1)
-    # paginator = Paginator(queryset, 10) # Show 10 events per page
-    # try:
-    #     events_page = paginator.page(page)
-    # except PageNotAnInteger:
-    #     events_page = paginator.page(1)
-    # except EmptyPage:
-    #     events_page = paginator.page(paginator.num_pages)
-    # ----------------------------- 
+        # Exact match on the values offered by the dropdown, so the (category, date) index is used
+        queryset = queryset.filter(category=category)
+
+    return queryset, query, category
+
+@query_budget(5) # Session, user, the category facet on a cache miss (2) and the page
+def event_list(request):
+    """ Displays a list of upcoming events, one page at a time.
+        Handles filtering by search query (title, location, category) and category.
+        Also retrieves the cached category facet for the filter dropdown.
+        Uses keyset pagination on (date, id): the `after` parameter carries the
+        position of the last event shown, so every page costs the same.
+    """
+    queryset, query, category = _filtered_events(request)
+
+    # Categories of *upcoming* events (with counts) for the filter dropdown, served from cache
+    category_facets = get_category_facets()
+
+    events_page = paginate_keyset(
+        queryset, EVENT_ORDERING, request.GET.get("after"), settings.EVENTS_PER_PAGE
+    )
+    # Versions of the cached event cards, fetched for the whole page in one cache read
+    versions = get_event_versions([event.pk for event in events_page])
+    for event in events_page:
+        event.fragment_version = versions[event.pk]
+
+    # Query strings for the "first page" / "next page" links, keeping the active filters
+    filters = {key: value for key, value in (("q", query), ("category", category)) if value}
+    next_query = urlencode({**filters, "after": events_page.next_cursor}) if events_page.has_next else None
 
     context = {
-        "events": queryset, # Pass the filtered queryset to the template (or events_page if using pagination)
-        # "events": events_page, # Use this if pagination is enabled
-        "categories": categories, # Pass distinct categories for the dropdown
+        "events": events_page, # The current page of events
+        "filter_query": urlencode(filters), # Query string of the first page with the same filters
+        "next_query": next_query, # Query string of the next page (None on the last page)
+        "is_first_page": not request.GET.get("after"),
+        "category_facets": category_facets, # Categories with event counts for the dropdown
         "selected_category": category, # Pass selected category back to template to keep dropdown state
         "search_query": query, # Pass search query back to template to keep input state
+        "fragment_timeout": settings.EVENT_FRAGMENT_CACHE_TIMEOUT,
     }
     return render(request, "events/event_list.html", context)
 
+@query_budget(1) # The page; no session or user access
+def event_list_json(request):
+    """ JSON variant of event_list with the same filters and keyset pagination.
+        Returns {"results": [...], "next": <cursor or null>}; pass `after=<next>`
+        to fetch the following page.
+    """
+    queryset, _, _ = _filtered_events(request)
+    queryset = queryset.values(
+        "id", "title", "category", "date", "location", "price", "available_tickets", "total_tickets"
+    )
+    events_page = paginate_keyset(
+        queryset, EVENT_ORDERING, request.GET.get("after"), settings.EVENTS_PER_PAGE
+    )
+    results = [
+        {**event, "price": str(event["price"]), "url": reverse("event_detail", args=[event["id"]])}
+        for event in events_page
+    ]
+    return JsonResponse({"results": results, "next": events_page.next_cursor})
+
+@query_budget(2) # The full-text match and the matching events
+def event_search_json(request):
+    """ Ranked prefix search for type-ahead suggestions: returns the best matching
+        upcoming events for `q`, most relevant first.
+    """
+    query = request.GET.get("q", "")
+    # Over-fetch a little, since ranked ids may include events that already took place
+    ranked_pks = get_search_backend().search(query, limit=SEARCH_SUGGESTIONS * 3)
+    events = Event.objects.filter(pk__in=ranked_pks, date__gte=timezone.now()).in_bulk()
+    results = [
+        {"id": pk, "title": events[pk].title, "url": reverse("event_detail", args=[pk])}
+        for pk in ranked_pks if pk in events
+    ][:SEARCH_SUGGESTIONS]
+    return JsonResponse({"results": results})
+
+@query_budget(3) # Session, user and the event on a fragment cache miss
 def event_detail(request, pk):
     """ Displays the details for a specific upcoming event.
-        Uses get_object_or_404 to handle cases where the event doesn't exist or has passed.
+        The event's markup comes from the fragment cache and its availability from
+        a short-lived cache entry (events/fragments.py), so a cache hit renders the
+        page without touching the database. Raises 404 if the event doesn't exist
+        or has passed.
     """
-    # Retrieve the specific event by its primary key (pk)
+    fragment = get_event_detail_fragment(pk)
     # Ensure the event exists and its date is in the future (or present)
-    event = get_object_or_404(Event, pk=pk, date__gte=timezone.now())
-    
+    if fragment is None or fragment["date"] < timezone.now():
+        raise Http404("No upcoming event matches the given query.")
+    availability = get_event_availability(pk)
+    if availability is None:
+        # Deleted since its fragment was cached (the version bump is not visible yet)
+        raise Http404("No upcoming event matches the given query.")
+    available_tickets, total_tickets = availability
+
     # The booking form is part of the template, logic is handled by create_booking view
     context = {
-        "event": event,
+        "event_pk": pk,
+        "event_title": fragment["title"],
+        "admission_rate": fragment["admission_rate"], # Non-zero: booking goes through the waiting room
+        "event_body": mark_safe(fragment["body"]), # Rendered (and escaped) by our own template
+        "available_tickets": available_tickets,
+        "total_tickets": total_tickets,
+        "live_availability": settings.EVENT_STREAM_ENABLED, # Subscribe to event_availability_stream
     }
     return render(request, "events/event_detail.html", context)
 
+async def event_availability_stream(request, pk):
+    """ Server-Sent Events stream of an upcoming event's ticket availability.
+        Sends an `availability` event with {"available_tickets", "total_tickets"}
+        on connect and after every change (see events/availability.py). Needs an
+        ASGI server; the stream ends after EVENT_STREAM_MAX_SECONDS and the
+        browser's EventSource reconnects on its own.
+        Under WSGI, Django would collect the whole stream before sending any of it,
+        holding a worker for the full EVENT_STREAM_MAX_SECONDS; such requests (and
+        all requests while EVENT_STREAM_ENABLED is off) get a 204, which also tells
+        EventSource not to reconnect.
+    """
+    if not settings.EVENT_STREAM_ENABLED or not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    if not await Event.objects.filter(pk=pk, date__gte=timezone.now()).aexists():
+        raise Http404("No upcoming event matches the given query.")
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.EVENT_STREAM_MAX_SECONDS
+        yield "retry: 3000\n\n" # Reconnect delay (ms) for the browser
+        updates = get_availability_broker().subscribe(pk, heartbeat=settings.EVENT_STREAM_HEARTBEAT_SECONDS)
+        try:
+            async for value in updates:
+                if value is None:
+                    yield ": keep-alive\n\n" # Comment line, ignored by EventSource
+                else:
+                    available_tickets, total_tickets = value
+                    data = json.dumps({"available_tickets": available_tickets, "total_tickets": total_tickets})
+                    yield f"event: availability\ndata: {data}\n\n"
+                if loop.time() >= deadline:
+                    break
+        finally:
+            await updates.aclose() # Unsubscribe right away
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no" # Stop nginx from buffering the stream
+    return response
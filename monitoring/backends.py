@@ -0,0 +1,43 @@
+# monitoring/backends.py
+""" Django template backend that times template rendering for the request metrics. """
+import time
+
+from django.template.backends.django import DjangoTemplates
+
+from .metrics import current_stats
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """ DjangoTemplates whose templates add their render time to the current
+        request's stats (monitoring/metrics.py). Configure it as the BACKEND of the
+        TEMPLATES setting; it takes the same options as DjangoTemplates.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+class InstrumentedTemplate:
+    """ Wraps a backend template and times its render() calls. """
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name) # origin, backend, template, ...
+
+    def render(self, context=None, request=None):
+        stats = current_stats()
+        if stats is None:
+            return self.template.render(context, request)
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth: # Count only the outermost render
+                stats.template_seconds += time.perf_counter() - started
@@ -0,0 +1,13 @@
+# monitoring/decorators.py
+
+
+def query_budget(max_queries):
+    """ Declares how many SQL queries a view may issue per request, including the
+        session and user lookups of the middleware. RequestMetricsMiddleware reports
+        requests over budget, and fails them when QUERY_BUDGET_ENFORCE is on (as in
+        tests, see monitoring/testing.py). Works for sync and async views.
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries # Copied onto outer decorators by functools.wraps
+        return view_func
+    return decorator
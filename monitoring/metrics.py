@@ -0,0 +1,169 @@
+# monitoring/metrics.py
+""" Per-request query, database time, template time and latency metrics.
+
+    RequestMetricsMiddleware opens a RequestStats for every request and keeps it in
+    a context variable. Two hooks add to the stats of the current request: the
+    execute wrapper installed on every database connection (instrument_connection)
+    and the instrumented template backend (monitoring/backends.py). Context
+    variables follow the request into sync_to_async worker threads, so async views
+    are measured the same way. Outside a request the hooks do nothing.
+
+    When the request ends, the stats go into fixed-bucket histograms per view, kept
+    in memory per process and exposed by the metrics view (/metrics/).
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+# Upper bounds of the histogram buckets (the last, implicit bucket is +Inf)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+# name -> (help text, buckets, RequestStats attribute)
+METRICS = {
+    "http_request_duration_seconds": ("Time spent handling a request.", SECONDS_BUCKETS, "duration"),
+    "http_request_db_seconds": ("Time spent executing SQL queries.", SECONDS_BUCKETS, "db_seconds"),
+    "http_request_template_seconds": ("Time spent rendering templates.", SECONDS_BUCKETS, "template_seconds"),
+    "http_request_queries": ("SQL queries executed per request.", QUERY_BUCKETS, "queries"),
+}
+
+
+class RequestStats:
+    """ What one request spent on SQL, templates and in total. """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0 # Nested renders are already timed by the outer one
+
+
+_current = contextvars.ContextVar("monitoring_request_stats", default=None)
+
+
+def start_request():
+    """ Starts collecting stats for the current request; returns (stats, reset token). """
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current_stats():
+    """ Returns the RequestStats of the request being handled, or None. """
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """ Database execute wrapper: counts and times the query for the current request. """
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def instrument_connection(sender, connection, **kwargs):
+    """ connection_created handler: installs record_query on a new connection. """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    """ Cumulative-bucket histogram (Prometheus style). Not thread-safe on its own;
+        the registry serializes updates.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # One per bucket plus +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """ Returns [(upper bound, observations <= bound)], ending with ("+Inf", count). """
+        total = 0
+        result = []
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """ Estimates a quantile as the upper bound of the bucket that contains it. """
+        if not self.count:
+            return 0
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return self.buckets[-1] if bound == "+Inf" else bound
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """ Histograms of every metric per view, for this process. """
+
+    def __init__(self):
+        self._histograms = {} # (metric name, view) -> Histogram
+        self._lock = threading.Lock()
+
+    def observe(self, view, stats):
+        with self._lock:
+            for name, (_, buckets, attribute) in METRICS.items():
+                histogram = self._histograms.get((name, view))
+                if histogram is None:
+                    histogram = self._histograms[(name, view)] = Histogram(buckets)
+                histogram.observe(getattr(stats, attribute))
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render_prometheus(self):
+        """ Returns the histograms in the Prometheus text exposition format. """
+        with self._lock:
+            items = sorted(self._histograms.items())
+            lines = []
+            for name, (help_text, _, _) in METRICS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, view), histogram in items:
+                    if metric != name:
+                        continue
+                    label = view.replace("\\", "\\\\").replace('"', '\\"')
+                    for bound, total in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{view="{label}",le="{bound}"}} {total}')
+                    lines.append(f'{name}_sum{{view="{label}"}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{view="{label}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """ Returns {view: {metric: {count, mean, p50, p95, p99}}} for humans and scripts. """
+        with self._lock:
+            result = {}
+            for (name, view), histogram in sorted(self._histograms.items()):
+                result.setdefault(view, {})[name] = {
+                    "count": histogram.count,
+                    "mean": round(histogram.sum / histogram.count, 6) if histogram.count else 0,
+                    "p50": histogram.quantile(0.50),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99),
+                }
+            return result
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,72 @@
+# monitoring/middleware.py
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import end_request, registry, start_request
+
+
+class QueryBudgetExceeded(Exception):
+    """ A view issued more SQL queries than its @query_budget allows. """
+    pass
+
+
+class RequestMetricsMiddleware:
+    """ Records query count, database time, template time and total latency of every
+        request into the per-view histograms of monitoring.metrics, and checks the
+        view's query budget (monitoring.decorators.query_budget).
+        Place it first in MIDDLEWARE so the session and user lookups of the other
+        middleware are counted too. Supports sync and async requests.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        return self._finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        return self._finish(request, response, stats)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, "query_budget", None)
+
+    def _finish(self, request, response, stats):
+        stats.duration = time.perf_counter() - stats.started
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "<unmatched>" # Bounded label set, unlike paths
+        registry.observe(view, stats)
+        response.request_stats = stats # For tests (monitoring/testing.py)
+
+        if settings.METRICS_SERVER_TIMING:
+            # Shown per request in the browser's developer tools
+            response["Server-Timing"] = (
+                f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", '
+                f"tpl;dur={stats.template_seconds * 1000:.1f}, "
+                f"total;dur={stats.duration * 1000:.1f}"
+            )
+
+        budget = getattr(request, "query_budget", None)
+        if budget is not None and stats.queries > budget:
+            message = f"{view} ran {stats.queries} SQL queries, over its budget of {budget}"
+            if settings.QUERY_BUDGET_ENFORCE:
+                raise QueryBudgetExceeded(message)
+            print(f"Query budget warning: {message} ({request.path})")
+        return response
@@ -0,0 +1,47 @@
+# monitoring/testing.py
+""" Test helpers for query budgets.
+
+    Usage in a test module:
+
+        from monitoring.testing import QueryBudgetTestMixin
+
+        class EventViewTests(QueryBudgetTestMixin, TestCase):
+            def test_event_list(self):
+                response = self.client.get(reverse("event_list"))
+                self.assertWithinQueryBudget(response)          # the view's @query_budget
+                self.assertWithinQueryBudget(response, 3)       # or an explicit limit
+
+    With the mixin, QUERY_BUDGET_ENFORCE is on, so any request whose view exceeds its
+    declared @query_budget raises QueryBudgetExceeded and fails the test even without
+    an explicit assertion.
+"""
+from django.test import override_settings
+
+
+class QueryBudgetTestMixin:
+    """ Mixin for django.test.TestCase classes that enforces view query budgets. """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        enforce = override_settings(QUERY_BUDGET_ENFORCE=True)
+        enforce.enable()
+        cls.addClassCleanup(enforce.disable)
+
+    def assertWithinQueryBudget(self, response, max_queries=None):
+        """ Fails if the request behind `response` issued more than `max_queries`
+            SQL queries (default: the budget declared on its view).
+        """
+        stats = getattr(response, "request_stats", None)
+        if stats is None:
+            self.fail("No request stats on the response; is RequestMetricsMiddleware installed?")
+        # Client responses carry wsgi_request, AsyncClient responses asgi_request
+        request = getattr(response, "wsgi_request", None) or response.asgi_request
+        if max_queries is None:
+            max_queries = getattr(request, "query_budget", None)
+            if max_queries is None:
+                self.fail("The view declares no @query_budget; pass max_queries.")
+        self.assertLessEqual(
+            stats.queries, max_queries,
+            f"{request.path} ran {stats.queries} SQL queries, over the budget of {max_queries}",
+        )
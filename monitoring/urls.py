@@ -0,0 +1,7 @@
+# monitoring/urls.py
+from django.urls import path
+from .views import metrics
+
+urlpatterns = [
+    path("", metrics, name="metrics"),
+]
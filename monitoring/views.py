@@ -0,0 +1,17 @@
+# monitoring/views.py
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+
+from .metrics import registry
+
+
+def metrics(request):
+    """ Exposes the request histograms of this process in the Prometheus text format,
+        or as per-view count/mean/p50/p95/p99 with ?format=json.
+        Only reachable from METRICS_ALLOWED_IPS (local by default) or by staff users.
+    """
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        return HttpResponseForbidden("Metrics are only available locally.")
+    if request.GET.get("format") == "json":
+        return JsonResponse(registry.summary())
+    return HttpResponse(registry.render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
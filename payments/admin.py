@@ -1,3 +1,21 @@
+# payments/admin.py
 from django.contrib import admin
+from .models import WebhookEvent
 
-# Register your models here.
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    """Admin configuration for the webhook inbox."""
+    list_display = ("id", "provider", "event_type", "event_id", "status", "attempts", "received_at", "processed_at")
+    list_filter = ("provider", "status", "event_type")
+    search_fields = ("event_id", "last_error")
+    date_hierarchy = "received_at"
+    readonly_fields = ("provider", "event_id", "event_type", "payload", "attempts", "last_error", "received_at", "processed_at")
+    actions = ["reprocess"]
+
+    def reprocess(self, request, queryset):
+        # Put failed or ignored events back in the inbox for the next `process_webhooks` run
+        updated = queryset.exclude(status=WebhookEvent.Status.RECEIVED).update(
+            status=WebhookEvent.Status.RECEIVED, attempts=0, processed_at=None
+        )
+        self.message_user(request, f"{updated} webhook event(s) queued for reprocessing.")
+    reprocess.short_description = "Reprocess selected events"
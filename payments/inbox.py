@@ -0,0 +1,97 @@
+# payments/inbox.py
+""" Webhook inbox: record now, process in batches.
+
+    Payment providers retry a webhook until they get a 2xx, and bursts of retries
+    used to run the whole confirmation path (booking lookup, related loads, checks)
+    for every duplicate delivery. The webhook view now only verifies the signature
+    and records the event with a single INSERT that the unique (provider, event_id)
+    index turns into a no-op for duplicates, then acknowledges straight away.
+
+    process_webhook_inbox() applies the recorded events in order, in batches: the
+    payment processor handles a whole batch at once (Stripe confirms all paid
+    bookings of a batch with a few bulk queries). Failures are retried on later runs and marked
+    FAILED after WEBHOOK_MAX_ATTEMPTS; a failed event is not retried within the
+    same run. Run it with `manage.py process_webhooks`.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+
+from .models import WebhookEvent
+
+
+def record_webhook_event(provider, event_id, event_type, payload):
+    """ Stores a verified provider event in the inbox. A duplicate (same provider
+        and event id) is skipped by the database in the same statement.
+    """
+    WebhookEvent.objects.bulk_create(
+        [WebhookEvent(provider=provider, event_id=event_id, event_type=event_type, payload=payload)],
+        ignore_conflicts=True, # INSERT ... ON CONFLICT DO NOTHING
+    )
+
+
+def process_webhook_inbox(batch_size=500):
+    """ Processes received webhook events until the inbox is empty. Returns a dict
+        with the number of events processed, ignored, retried and failed.
+    """
+    totals = {"processed": 0, "ignored": 0, "retried": 0, "failed": 0}
+    retry_later = set() # Events that failed in this run wait for the next one
+    while True:
+        batch = _process_batch(batch_size, retry_later)
+        for key, value in batch.items():
+            totals[key] += value
+        if sum(batch.values()) < batch_size:
+            return totals
+
+
+def _process_batch(batch_size, retry_later):
+    """ Claims and processes one batch of received events in a single transaction. """
+    # Imported here: the processors module imports this one for record_webhook_event()
+    from .processors import get_payment_processor
+
+    counts = {"processed": 0, "ignored": 0, "retried": 0, "failed": 0}
+    with transaction.atomic():
+        # skip_locked lets several processors share the inbox on databases with row locks
+        events = list(
+            WebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=WebhookEvent.Status.RECEIVED)
+            .exclude(pk__in=retry_later)
+            .order_by("received_at", "pk")[:batch_size]
+        )
+        if not events:
+            return counts
+
+        # Each event goes to the processor of the provider that sent it
+        by_provider = {}
+        for event in events:
+            by_provider.setdefault(event.provider, []).append(event)
+        outcomes = {}
+        for provider, provider_events in by_provider.items():
+            try:
+                processor = get_payment_processor(provider)
+            except ImproperlyConfigured as e: # Retried, then failed, like any other error
+                outcomes.update((event.pk, e) for event in provider_events)
+                continue
+            outcomes.update(processor.process_webhook_events(provider_events))
+        now = timezone.now()
+        for event in events:
+            outcome = outcomes.get(event.pk, False)
+            if isinstance(outcome, Exception):
+                event.attempts += 1
+                event.last_error = str(outcome)
+                print(f"Webhook Error: Processing {event} failed (attempt {event.attempts}): {outcome}")
+                if event.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                    event.status = WebhookEvent.Status.FAILED
+                    event.processed_at = now
+                    counts["failed"] += 1
+                else:
+                    retry_later.add(event.pk)
+                    counts["retried"] += 1
+                continue
+            event.status = WebhookEvent.Status.PROCESSED if outcome else WebhookEvent.Status.IGNORED
+            event.processed_at = now
+            counts["processed" if outcome else "ignored"] += 1
+
+        WebhookEvent.objects.bulk_update(events, ["status", "attempts", "last_error", "processed_at"])
+    return counts
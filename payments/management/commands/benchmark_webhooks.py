@@ -0,0 +1,140 @@
+# payments/management/commands/benchmark_webhooks.py
+import contextlib
+import io
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from bookings.models import Booking, TicketDelivery
+from events.models import Event
+from payments.inbox import process_webhook_inbox
+from payments.models import WebhookEvent
+
+
+def _confirm_per_event(event):
+    """ The original webhook path, run once per delivered event: fetch the booking,
+        save() it (recomputing total_price through a lazy event load) and insert
+        its ticket delivery.
+    """
+    session = event.payload["data"]["object"]
+    with transaction.atomic():
+        booking = Booking.objects.get(pk=session["metadata"]["booking_pk"])
+        if booking.status == Booking.Status.PENDING:
+            booking.status = Booking.Status.CONFIRMED
+            booking.stripe_payment_intent_id = session.get("payment_intent")
+            booking.save()
+            TicketDelivery.objects.create(booking=booking)
+    WebhookEvent.objects.filter(pk=event.pk).update(
+        status=WebhookEvent.Status.PROCESSED, processed_at=timezone.now()
+    )
+
+
+class Command(BaseCommand):
+    """ Replays a backlog of synthetic checkout.session.completed webhook events
+        and compares confirming them one at a time with the batch path of the
+        webhook inbox (bulk read, bulk_update and bulk delivery inserts).
+
+        Example:
+            python manage.py benchmark_webhooks --events 10000 --batch-size 500
+
+        A throwaway user, event, bookings and webhook events are created for each run
+        and deleted afterwards. The batch path processes the whole inbox, so run this
+        against a development database whose inbox is empty.
+    """
+    help = "Benchmark replaying webhook backlogs (per-event vs. batch confirmation)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=10000, help="Synthetic webhook events per path.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Inbox batch size of the batch path.")
+        parser.add_argument(
+            "--duplicates", type=float, default=0.1,
+            help="Fraction of extra events that repeat an already sent session (provider retries).",
+        )
+        parser.add_argument(
+            "--paths", default="per-event,batch", help="Comma-separated paths to run (per-event, batch).",
+        )
+
+    def handle(self, *args, **options):
+        user, _ = get_user_model().objects.get_or_create(
+            username="benchmark_webhooks_user", defaults={"email": "benchmark@example.com"}
+        )
+        for name in options["paths"].split(","):
+            name = name.strip()
+            if name not in ("per-event", "batch"):
+                self.stderr.write(f"Unknown path '{name}', skipping.")
+                continue
+
+            event = Event.objects.create(
+                title=f"Webhook benchmark event ({name})",
+                category="Benchmark",
+                date=timezone.now() + timedelta(days=30),
+                location="Benchmark Arena",
+                price=10,
+                total_tickets=options["events"],
+            )
+            webhook_events = WebhookEvent.objects.none()
+            try:
+                webhook_events = self._seed(user, event, name, options)
+                queries = [0]
+
+                def count_queries(execute, sql, params, many, context):
+                    queries[0] += 1
+                    return execute(sql, params, many, context)
+
+                started = time.perf_counter()
+                with connection.execute_wrapper(count_queries), contextlib.redirect_stdout(io.StringIO()):
+                    if name == "per-event":
+                        for webhook_event in webhook_events.order_by("received_at", "pk").iterator(chunk_size=1000):
+                            _confirm_per_event(webhook_event)
+                    else:
+                        process_webhook_inbox(batch_size=options["batch_size"])
+                elapsed = time.perf_counter() - started
+                self._report(name, event, webhook_events.count(), elapsed, queries[0])
+            finally:
+                webhook_events.delete()
+                event.delete() # Cascades to the benchmark bookings and deliveries
+        user.delete()
+
+    def _seed(self, user, event, name, options):
+        """ Creates one pending booking per event and the (partly duplicated) webhook events paying for them. """
+        bookings = Booking.objects.bulk_create(
+            (
+                Booking(
+                    user=user, event=event, quantity=1, total_price=event.price,
+                    status=Booking.Status.PENDING, expires_at=timezone.now() + timedelta(hours=1),
+                )
+                for _ in range(options["events"])
+            ),
+            batch_size=1000,
+        )
+        duplicates = int(options["events"] * options["duplicates"])
+        webhook_events = [
+            WebhookEvent(
+                provider="stripe",
+                event_id=f"evt_benchmark_{name}_{position}",
+                event_type="checkout.session.completed",
+                payload={"data": {"object": {
+                    "id": f"cs_benchmark_{booking.pk}",
+                    "metadata": {"booking_pk": str(booking.pk)},
+                    "payment_status": "paid",
+                    "payment_intent": f"pi_benchmark_{booking.pk}",
+                }}},
+            )
+            for position, booking in enumerate(bookings + bookings[:duplicates])
+        ]
+        WebhookEvent.objects.bulk_create(webhook_events, batch_size=1000)
+        return WebhookEvent.objects.filter(event_id__startswith=f"evt_benchmark_{name}_")
+
+    def _report(self, name, event, replayed, elapsed, queries):
+        confirmed = Booking.objects.filter(event=event, status=Booking.Status.CONFIRMED).count()
+        deliveries = TicketDelivery.objects.filter(booking__event=event).count()
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Path: {name}"))
+        self.stdout.write(
+            f"  events={replayed} confirmed={confirmed} deliveries={deliveries} "
+            f"queries={queries} elapsed={elapsed:.2f}s"
+        )
+        self.stdout.write(f"  throughput={replayed / (elapsed or 1e-9):.0f} events/sec")
@@ -0,0 +1,241 @@
+# payments/management/commands/loadtest_checkout.py
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from bookings.models import Booking
+from events.models import Event
+from payments.processors import get_payment_processor, reset_payment_processors
+
+
+class _StubStripeHandler(BaseHTTPRequestHandler):
+    """ Answers every Checkout Session creation after `server.latency` seconds,
+        like a slow payment provider, and fails `server.error_rate` of them with a 500.
+    """
+    protocol_version = "HTTP/1.1" # Keep-alive, as the real API
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.latency)
+        if random.random() < self.server.error_rate:
+            status, body = 500, json.dumps({"error": {"type": "api_error", "message": "Injected failure"}}).encode()
+        else:
+            status, body = 200, json.dumps({
+                "id": f"cs_test_{next(self.server.counter)}",
+                "object": "checkout.session",
+                "expires_at": int(time.time()) + 24 * 3600,
+            }).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Keep the command output readable
+
+
+class _StubStripeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024 # Accept hundreds of simultaneous connections
+
+    def handle_error(self, request, client_address):
+        pass # Clients that hit their deadline hang up before the answer; that is expected
+
+
+def _percentile(sorted_values, percent):
+    """ Nearest-rank percentile of an already sorted list. """
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class Command(BaseCommand):
+    """ Load-tests checkout initiation (payments.views.initiate_payment) against a
+        local stub of the Stripe API that answers after a configurable latency, once
+        through Django's WSGI handler with a fixed pool of worker threads and once
+        through the ASGI handler on a single event loop.
+
+        Example:
+            python manage.py loadtest_checkout --requests 500 --latency 0.3 --wsgi-threads 8
+
+        Under WSGI every in-flight checkout occupies a worker thread for the whole
+        provider round trip, so throughput is capped at about threads / latency. Under
+        ASGI the view awaits the provider through Stripe's async HTTP client and a
+        single worker keeps up to --concurrency checkouts in flight.
+        With --processor fake the checkouts go to FakePaymentProcessor instead, which
+        only waits --latency seconds: no HTTP at all, so the numbers isolate the cost
+        of Django, the database and the view itself.
+        --error-rate makes that share of the provider calls fail, and --deadline
+        overrides PAYMENT_DEADLINE_SECONDS; after each run the retry, timeout and
+        circuit breaker metrics of the processor are reported
+        (see payments/resilience.py).
+        A throwaway user, event and pending bookings are created and deleted afterwards.
+    """
+    help = "Load-test checkout initiation under WSGI and ASGI against a stub payment provider."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Checkout initiations per entry point.")
+        parser.add_argument("--latency", type=float, default=0.25, help="Stub provider response time in seconds.")
+        parser.add_argument("--wsgi-threads", type=int, default=8, help="Worker threads of the WSGI run.")
+        parser.add_argument("--concurrency", type=int, default=200, help="In-flight requests of the ASGI run.")
+        parser.add_argument(
+            "--entry-points", default="wsgi,asgi", help="Comma-separated entry points to test (wsgi, asgi).",
+        )
+        parser.add_argument(
+            "--processor", choices=["stub", "fake"], default="stub",
+            help="Stripe processor against a local stub server, or the in-process fake processor.",
+        )
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Share of provider calls that fail (0-1).")
+        parser.add_argument("--deadline", type=float, default=None, help="Checkout deadline in seconds.")
+
+    def handle(self, *args, **options):
+        server = None
+        if options["processor"] == "fake":
+            processors = {"fake": {
+                "CLASS": "payments.processors.FakePaymentProcessor",
+                "OPTIONS": {"latency": options["latency"], "failure_rate": options["error_rate"]},
+            }}
+        else:
+            server = _StubStripeServer(("127.0.0.1", 0), _StubStripeHandler)
+            server.latency = options["latency"]
+            server.error_rate = options["error_rate"]
+            server.counter = itertools.count(1)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            processors = {"stub": {
+                "CLASS": "payments.processors.StripePaymentProcessor",
+                "OPTIONS": {
+                    "secret_key": "sk_test_loadtest",
+                    "publishable_key": "pk_test_loadtest",
+                    "webhook_secret": "",
+                    "api_base": f"http://127.0.0.1:{server.server_address[1]}",
+                    "pool_size": max(options["wsgi_threads"], options["concurrency"]),
+                    # A blocking request cannot be cancelled, so bound each one by the deadline
+                    "timeout": options["deadline"] or settings.PAYMENT_DEADLINE_SECONDS,
+                },
+            }}
+
+        user = get_user_model().objects.create_user(
+            username="loadtest_checkout_user", email="loadtest@example.com", password=None
+        )
+        event = Event.objects.create(
+            title="Load test event",
+            category="Benchmark",
+            date=timezone.now() + timedelta(days=30),
+            location="Benchmark Arena",
+            price=10,
+            total_tickets=options["requests"],
+        )
+        # initiate_payment leaves the bookings pending, so both runs can use them
+        bookings = Booking.objects.bulk_create(
+            Booking(
+                user=user, event=event, quantity=1, total_price=event.price,
+                status=Booking.Status.PENDING, expires_at=timezone.now() + timedelta(hours=1),
+            )
+            for _ in range(options["requests"])
+        )
+        urls = [reverse("initiate_payment", kwargs={"booking_pk": booking.pk}) for booking in bookings]
+
+        try:
+            # Overriding the settings makes get_payment_processor() build the load test processor
+            with override_settings(
+                PAYMENT_PROCESSOR=options["processor"],
+                PAYMENT_PROCESSORS=processors,
+                PAYMENT_DEADLINE_SECONDS=options["deadline"] or settings.PAYMENT_DEADLINE_SECONDS,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                DEBUG=False, # Do not collect every SQL query
+            ):
+                for name in options["entry_points"].split(","):
+                    name = name.strip()
+                    reset_payment_processors() # Fresh breaker and counters for every run
+                    # Forget the sessions of the previous run, which would otherwise be reused
+                    Booking.objects.filter(event=event).update(stripe_payment_intent_id=None, checkout_expires_at=None)
+                    if name == "wsgi":
+                        results = self._run_wsgi(user, urls, options["wsgi_threads"])
+                        self._report(f"WSGI ({options['wsgi_threads']} threads)", results)
+                        self._report_resilience()
+                    elif name == "asgi":
+                        results = asyncio.run(self._run_asgi(user, urls, options["concurrency"]))
+                        self._report(f"ASGI (1 event loop, {options['concurrency']} in flight)", results)
+                        self._report_resilience()
+                    else:
+                        self.stderr.write(f"Unknown entry point '{name}', skipping.")
+        finally:
+            if server is not None:
+                server.shutdown()
+            event.delete() # Cascades to the load test bookings
+            user.delete()
+
+    def _run_wsgi(self, user, urls, threads):
+        """ Issues the requests through the WSGI handler from a fixed thread pool. """
+        local = threading.local()
+
+        def request(url):
+            if not hasattr(local, "client"):
+                local.client = Client()
+                local.client.force_login(user)
+            started = time.perf_counter()
+            response = local.client.get(url)
+            return response.status_code, time.perf_counter() - started
+
+        def close_connection(_):
+            connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            outcomes = list(pool.map(request, urls))
+            list(pool.map(close_connection, range(threads))) # Best effort: free thread connections
+        return outcomes, time.perf_counter() - started
+
+    async def _run_asgi(self, user, urls, concurrency):
+        """ Issues the requests through the ASGI handler, `concurrency` at a time. """
+        client = AsyncClient()
+        await asyncio.get_running_loop().run_in_executor(None, client.force_login, user)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request(url):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(url)
+                return response.status_code, time.perf_counter() - started
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(request(url) for url in urls))
+        return outcomes, time.perf_counter() - started
+
+    def _report(self, name, results):
+        outcomes, elapsed = results
+        latencies = sorted(latency for _, latency in outcomes)
+        ok = sum(1 for status, _ in outcomes if status == 200)
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Entry point: {name}"))
+        self.stdout.write(f"  requests={len(outcomes)} ok={ok} errors={len(outcomes) - ok} elapsed={elapsed:.2f}s")
+        self.stdout.write(
+            f"  throughput={len(outcomes) / (elapsed or 1e-9):.1f} checkouts/sec "
+            f"p50={_percentile(latencies, 50) * 1000:.1f}ms "
+            f"p99={_percentile(latencies, 99) * 1000:.1f}ms"
+        )
+
+    def _report_resilience(self):
+        metrics = get_payment_processor().metrics()
+        breaker = metrics.pop("breaker")
+        self.stdout.write("  " + " ".join(f"{key}={value}" for key, value in metrics.items() if key != "processor"))
+        self.stdout.write(
+            f"  breaker={breaker['state']} times_opened={breaker['times_opened']} "
+            f"window_failures={breaker['window_failures']}/{breaker['window_calls']}"
+        )
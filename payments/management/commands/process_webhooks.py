@@ -0,0 +1,38 @@
+# payments/management/commands/process_webhooks.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.inbox import process_webhook_inbox
+
+
+class Command(BaseCommand):
+    """ Applies the webhook events recorded in the inbox (see payments/inbox.py).
+
+        Examples:
+            python manage.py process_webhooks                 # drain once (e.g. from cron)
+            python manage.py process_webhooks --loop --interval 1
+    """
+    help = "Process received payment webhook events in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Events processed per transaction.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling the inbox until interrupted.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            totals = process_webhook_inbox(batch_size=options["batch_size"])
+            if any(totals.values()) or not options["loop"]:
+                self.stdout.write(
+                    f"Webhook events: {totals['processed']} processed, {totals['ignored']} ignored, "
+                    f"{totals['retried']} to retry, {totals['failed']} failed "
+                    f"in {(time.perf_counter() - started) * 1000:.1f}ms."
+                )
+            if not options["loop"]:
+                return
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
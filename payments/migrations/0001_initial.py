@@ -0,0 +1,39 @@
+# Generated by Django 4.2.21 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(help_text='Payment provider that sent the event, e.g. stripe.', max_length=20)),
+                ('event_id', models.CharField(help_text="The provider's unique id of the event.", max_length=255)),
+                ('event_type', models.CharField(help_text="The provider's event type, e.g. checkout.session.completed.", max_length=100)),
+                ('payload', models.JSONField(help_text='The verified event body as sent by the provider.')),
+                ('status', models.CharField(choices=[('received', 'Received'), ('processed', 'Processed'), ('ignored', 'Ignored'), ('failed', 'Failed')], default='received', help_text='The processing state of this event.', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Number of failed processing attempts.')),
+                ('last_error', models.TextField(blank=True, help_text='Error message of the most recent failed attempt.')),
+                ('received_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when the event was first received.')),
+                ('processed_at', models.DateTimeField(blank=True, help_text='Timestamp when the event was processed, ignored or given up on.', null=True)),
+            ],
+            options={
+                'verbose_name': 'Webhook Event',
+                'verbose_name_plural': 'Webhook Events',
+                'ordering': ['received_at'],
+                'indexes': [models.Index(fields=['status', 'received_at'], name='webhook_status_received_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='webhookevent',
+            constraint=models.UniqueConstraint(fields=('provider', 'event_id'), name='unique_webhook_event'),
+        ),
+    ]
@@ -1,3 +1,75 @@
+# payments/models.py
 from django.db import models
+from django.utils.translation import gettext_lazy as _ # For internationalization of choices
 
-# Create your models here.
+
+class WebhookEvent(models.Model):
+    """ Inbox entry for a webhook event received from a payment provider.
+        The webhook view only verifies the signature and inserts the event here; the
+        unique (provider, event_id) constraint makes provider retries a no-op insert.
+        `manage.py process_webhooks` applies received events in batches
+        (see payments/inbox.py).
+    """
+
+    class Status(models.TextChoices):
+        RECEIVED = "received", _("Received")
+        PROCESSED = "processed", _("Processed")
+        IGNORED = "ignored", _("Ignored") # Event type we do not act on, or nothing left to do
+        FAILED = "failed", _("Failed") # Gave up after WEBHOOK_MAX_ATTEMPTS
+
+    provider = models.CharField(
+        max_length=20,
+        help_text="Payment provider that sent the event, e.g. stripe."
+    )
+    event_id = models.CharField(
+        max_length=255,
+        help_text="The provider's unique id of the event."
+    )
+    event_type = models.CharField(
+        max_length=100,
+        help_text="The provider's event type, e.g. checkout.session.completed."
+    )
+    payload = models.JSONField(
+        help_text="The verified event body as sent by the provider."
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.RECEIVED,
+        help_text="The processing state of this event."
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of failed processing attempts."
+    )
+    last_error = models.TextField(
+        blank=True,
+        help_text="Error message of the most recent failed attempt."
+    )
+    received_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp when the event was first received."
+    )
+    processed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Timestamp when the event was processed, ignored or given up on."
+    )
+
+    def __str__(self):
+        """ String representation of the WebhookEvent object. """
+        return f"{self.provider} {self.event_type} {self.event_id} ({self.status})"
+
+    class Meta:
+        """ Meta options for the WebhookEvent model. """
+        ordering = ["received_at"]
+        verbose_name = "Webhook Event"
+        verbose_name_plural = "Webhook Events"
+        constraints = [
+            # Deduplicates provider retries with an index lookup at insert time
+            models.UniqueConstraint(fields=["provider", "event_id"], name="unique_webhook_event"),
+        ]
+        indexes = [
+            # Lets the processor find the received events without scanning the whole log
+            models.Index(fields=["status", "received_at"], name="webhook_status_received_idx"),
+        ]
@@ -1,76 +1,142 @@
 # payments/processors.py
 import abc
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import requests
 import stripe
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.module_loading import import_string
 from django.http import HttpResponse # For webhook response
 from bookings.models import Booking
-from bookings.utils import send_ticket_email
+from bookings.services import confirm_paid_bookings
+from .inbox import record_webhook_event
 
 class PaymentProcessor(abc.ABC):
     """ Abstract Base Class defining the interface for payment processors.
         This acts as the Abstraction in the Bridge pattern.
+        Instances are built once per process by get_payment_processor() and shared
+        by all requests and threads, so they must not keep per-request state.
     """
+    name = None # Registry name; also the provider name recorded with webhook events
     
     @abc.abstractmethod
-    def initiate_payment(self, request, booking):
+    def initiate_payment(self, request, booking, idempotency_key=None):
         """ Initiates the payment process for a given booking.
             Should return context data needed for the frontend (e.g., session ID, keys) 
-            or raise an exception on failure.
+            or raise PaymentProcessingError on failure. Retries of the same checkout
+            pass the same `idempotency_key`, which the provider should receive so it
+            never creates a second session for one checkout.
         """
         pass
 
+    async def ainitiate_payment(self, request, booking, idempotency_key=None):
+        """ Async variant of initiate_payment for async views. Processors whose
+            provider has an async HTTP client should override it; the default runs
+            initiate_payment in a worker thread.
+        """
+        return await sync_to_async(self.initiate_payment)(request, booking, idempotency_key=idempotency_key)
+
+    def get_open_checkout(self, booking):
+        """ Returns the payment context of the booking's checkout session if it is
+            still open long enough to be reused (see CHECKOUT_SESSION_MIN_REMAINING_SECONDS),
+            without calling the provider or writing to the database; else None.
+            Processors without reusable sessions keep this default.
+        """
+        return None
+
+    def is_retryable(self, error):
+        """ Returns True if a PaymentProcessingError was caused by a transient provider
+            problem (timeout, connection error, rate limit, server error) that a retry
+            may fix. Such errors also count towards the circuit breaker (payments/resilience.py).
+        """
+        return False
+
     @abc.abstractmethod
     def handle_webhook(self, request):
         """ Handles incoming webhook events from the payment provider.
-            Should verify the webhook signature and update booking status accordingly.
-            Returns an HttpResponse (e.g., status 200 for success, 400/500 for errors).
+            Should verify the webhook signature and record the event in the webhook
+            inbox (payments.inbox.record_webhook_event) without processing it.
+            Returns an HttpResponse (e.g., status 200 for success, 400 for bad requests).
         """
         pass
 
+    @abc.abstractmethod
+    def process_webhook_event(self, event):
+        """ Applies a recorded WebhookEvent (e.g. confirms the paid booking).
+            Called by `manage.py process_webhooks` inside a transaction. Returns True
+            if the event was acted upon, False if it was ignored; raises to retry it.
+        """
+        pass
+
+    def process_webhook_events(self, events):
+        """ Applies a batch of recorded WebhookEvents and returns {event pk: outcome},
+            where the outcome is True (processed), False (ignored) or the exception
+            that made it fail. Processors that can apply events in bulk override this;
+            the default processes them one by one, each in its own savepoint.
+        """
+        outcomes = {}
+        for event in events:
+            try:
+                with transaction.atomic(): # A failing event does not undo the others
+                    outcomes[event.pk] = self.process_webhook_event(event)
+            except Exception as e:
+                outcomes[event.pk] = e
+        return outcomes
+
 class StripePaymentProcessor(PaymentProcessor):
-    
-    def __init__(self):
-        stripe.api_key = settings.STRIPE_SECRET_KEY
-        self.webhook_secret = settings.STRIPE_WEBHOOK_SECRET
+    name = "stripe"
 
-    def initiate_payment(self, request, booking):
+    def __init__(self, secret_key, publishable_key, webhook_secret, api_base="", pool_size=10, timeout=80):
+        """ Builds a StripeClient bound to this processor's key (instead of setting the
+            global stripe.api_key) whose HTTP client keeps up to `pool_size` keep-alive
+            connections to the API, shared by all request threads. Async calls go
+            through an httpx client that pools its connections the same way.
+            `timeout` bounds each API request; retries are left to the
+            ResilientPaymentProcessor wrapper, so the SDK's own retries are disabled.
+        """
+        self.publishable_key = publishable_key
+        self.webhook_secret = webhook_secret
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self.client = stripe.StripeClient(
+            secret_key,
+            base_addresses={"api": api_base} if api_base else {},
+            max_network_retries=0,
+            http_client=stripe.RequestsClient(
+                timeout=timeout,
+                session=session,
+                async_fallback_client=stripe.HTTPXClient(timeout=timeout),
+            ),
+        )
+
+    def initiate_payment(self, request, booking, idempotency_key=None):
         """ Creates a Stripe Checkout Session. """
         try:
-            success_url = request.build_absolute_uri(reverse("payment_success", kwargs={"booking_pk": booking.pk}))
-            cancel_url = request.build_absolute_uri(reverse("payment_cancelled"))
-
-            checkout_session = stripe.checkout.Session.create(
-                payment_method_types=["card"],
-                line_items=[
-                    {
-                        "price_data": {
-                            "currency": "usd",
-                            "product_data": {
-                                "name": f"Tickets for {booking.event.title}",
-                                "description": f"{booking.quantity} x ticket(s)",
-                            },
-                            "unit_amount": int(booking.event.price * 100),
-                        },
-                        "quantity": booking.quantity,
-                    },
-                ],
-                mode="payment",
-                metadata={"booking_pk": booking.pk},
-                customer_email=request.user.email,
-                success_url=success_url,
-                cancel_url=cancel_url,
+            checkout_session = self.client.checkout.sessions.create(
+                params=self._session_params(request, booking), options=self._request_options(idempotency_key)
             )
-            
-            # Store session ID for reference
-            booking.stripe_payment_intent_id = checkout_session.id
-            booking.save()
+
+            # Store session ID for reference; one UPDATE of the checkout fields, no save()
+            Booking.objects.filter(pk=booking.pk).update(**self._remember_checkout(booking, checkout_session))
 
             # Return context needed for the template
-            return {
-                "stripe_publishable_key": settings.STRIPE_PUBLISHABLE_KEY,
-                "stripe_session_id": checkout_session.id
-            }
+            return self._payment_context(checkout_session.id)
         except stripe.error.StripeError as e:
             print(f"Stripe error during payment initiation for booking {booking.pk}: {e}")
             raise PaymentProcessingError(f"Stripe error: {e}") from e
@@ -78,8 +144,107 @@ class StripePaymentProcessor(PaymentProcessor):
             print(f"Unexpected error during payment initiation for booking {booking.pk}: {e}")
             raise PaymentProcessingError(f"Unexpected error: {e}") from e
 
+    async def ainitiate_payment(self, request, booking, idempotency_key=None):
+        """ Creates a Stripe Checkout Session without blocking a thread: the API call
+            goes through Stripe's async HTTP client (httpx) and the booking is updated
+            with the async ORM, so the event loop serves other requests meanwhile.
+        """
+        try:
+            checkout_session = await self.client.checkout.sessions.create_async(
+                params=self._session_params(request, booking), options=self._request_options(idempotency_key)
+            )
+
+            await Booking.objects.filter(pk=booking.pk).aupdate(**self._remember_checkout(booking, checkout_session))
+
+            return self._payment_context(checkout_session.id)
+        except stripe.error.StripeError as e:
+            print(f"Stripe error during payment initiation for booking {booking.pk}: {e}")
+            raise PaymentProcessingError(f"Stripe error: {e}") from e
+        except Exception as e:
+            print(f"Unexpected error during payment initiation for booking {booking.pk}: {e}")
+            raise PaymentProcessingError(f"Unexpected error: {e}") from e
+
+    def _session_params(self, request, booking):
+        """ Builds the Checkout Session parameters; `booking.event` must be loaded. """
+        success_url = request.build_absolute_uri(reverse("payment_success", kwargs={"booking_pk": booking.pk}))
+        cancel_url = request.build_absolute_uri(reverse("payment_cancelled"))
+
+        # Expire the checkout together with the seat hold where Stripe allows it
+        # (sessions must stay open for at least 30 minutes).
+        session_options = {}
+        if booking.expires_at and booking.expires_at - timezone.now() > timedelta(minutes=30):
+            session_options["expires_at"] = int(booking.expires_at.timestamp())
+
+        return dict(
+            payment_method_types=["card"],
+            line_items=[
+                {
+                    "price_data": {
+                        "currency": "usd",
+                        "product_data": {
+                            "name": f"Tickets for {booking.event.title}",
+                            "description": f"{booking.quantity} x ticket(s)",
+                        },
+                        "unit_amount": int(booking.event.price * 100),
+                    },
+                    "quantity": booking.quantity,
+                },
+            ],
+            mode="payment",
+            metadata={"booking_pk": booking.pk},
+            customer_email=request.user.email,
+            success_url=success_url,
+            cancel_url=cancel_url,
+            **session_options,
+        )
+
+    @staticmethod
+    def _request_options(idempotency_key):
+        return {"idempotency_key": idempotency_key} if idempotency_key else {}
+
+    def is_retryable(self, error):
+        cause = error.__cause__
+        if isinstance(cause, (stripe.error.APIConnectionError, stripe.error.RateLimitError)):
+            return True # Connection problems and timeouts, or HTTP 429
+        return isinstance(cause, stripe.error.StripeError) and (cause.http_status or 0) >= 500
+
+    def get_open_checkout(self, booking):
+        min_remaining = timedelta(seconds=settings.CHECKOUT_SESSION_MIN_REMAINING_SECONDS)
+        if (
+            booking.stripe_payment_intent_id
+            and booking.checkout_expires_at
+            and booking.checkout_expires_at - timezone.now() >= min_remaining
+        ):
+            return self._payment_context(booking.stripe_payment_intent_id)
+        return None
+
+    @staticmethod
+    def _remember_checkout(booking, checkout_session):
+        """ Records a new checkout session on the booking instance and returns the
+            field values to write. Sessions without an expiry get Stripe's default 24 hours.
+        """
+        expires_at = checkout_session.get("expires_at")
+        booking.stripe_payment_intent_id = checkout_session["id"]
+        booking.checkout_expires_at = (
+            datetime.fromtimestamp(expires_at, tz=dt_timezone.utc) if expires_at
+            else timezone.now() + timedelta(hours=24)
+        )
+        return {
+            "stripe_payment_intent_id": booking.stripe_payment_intent_id,
+            "checkout_expires_at": booking.checkout_expires_at,
+            "updated_at": timezone.now(),
+        }
+
+    def _payment_context(self, session_id):
+        return {
+            "stripe_publishable_key": self.publishable_key,
+            "stripe_session_id": session_id
+        }
+
     def handle_webhook(self, request):
-        """ Handles Stripe webhook events, specifically checkout.session.completed. """
+        """ Verifies a Stripe webhook and records it in the inbox; returns 200 at once.
+            Processing happens in `manage.py process_webhooks` (see payments/inbox.py).
+        """
         payload = request.body
         sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
         event = None
@@ -95,45 +260,184 @@ class StripePaymentProcessor(PaymentProcessor):
             print(f"Stripe Webhook error: Invalid signature - {e}")
             return HttpResponse(status=400)
 
-        # Handle the checkout.session.completed event
-        if event["type"] == "checkout.session.completed":
-            session = event["data"]["object"]
-            booking_pk = session.get("metadata", {}).get("booking_pk")
-            payment_status = session.get("payment_status")
+        # One INSERT; Stripe's retries of the same event are dropped by the unique index
+        record_webhook_event(self.name, event["id"], event["type"], json.loads(payload))
+        return HttpResponse(status=200)
 
-            if booking_pk and payment_status == "paid":
-                try:
-                    booking = Booking.objects.get(pk=booking_pk)
-                    if booking.status == Booking.Status.PENDING:
-                        booking.status = Booking.Status.CONFIRMED
-                        booking.stripe_payment_intent_id = session.get("payment_intent")
-                        booking.save()
-                        print(f"Webhook: Booking {booking_pk} confirmed via Stripe.")
-                        send_ticket_email(booking)
-                    else:
-                        print(f"Webhook: Booking {booking_pk} already processed (status: {booking.status}). Ignoring.")
-                except Booking.DoesNotExist:
-                    print(f"Webhook Error: Booking {booking_pk} not found.")
-                    return HttpResponse(status=404)
-                except Exception as e:
-                    print(f"Webhook Error: Error processing booking {booking_pk}: {e}")
-                    return HttpResponse(status=500)
-            else:
-                print(f"Webhook: Received session {session.id} for booking {booking_pk} but payment status is \'{payment_status}\' or booking_pk missing.")
-        else:
-            print(f"Webhook: Unhandled event type {event["type"]}")
+    def process_webhook_events(self, events):
+        """ Confirms the bookings of all paid checkout sessions in the batch with a
+            few bulk queries (bookings.services.confirm_paid_bookings); other events
+            go through process_webhook_event(). If the bulk confirmation fails, the
+            events are retried one by one so a single bad event cannot block the batch.
+        """
+        payment_intents = {} # booking pk -> payment intent id
+        booking_events = {} # booking pk -> pks of the events paying for it
+        others = []
+        for event in events:
+            booking_pk = self._paid_booking_pk(event)
+            if booking_pk is None:
+                others.append(event)
+                continue
+            session = event.payload["data"]["object"]
+            payment_intents.setdefault(booking_pk, session.get("payment_intent"))
+            booking_events.setdefault(booking_pk, []).append(event.pk)
 
+        outcomes = super().process_webhook_events(others)
+        if not payment_intents:
+            return outcomes
+        try:
+            with transaction.atomic():
+                confirmed = confirm_paid_bookings(payment_intents)
+        except Exception as e:
+            print(f"Webhook Error: Bulk confirmation of {len(payment_intents)} booking(s) failed, retrying one by one: {e}")
+            paid_events = [event for event in events if event not in others]
+            return {**outcomes, **super().process_webhook_events(paid_events)}
+
+        for booking_pk, event_pks in booking_events.items():
+            # Only the first event confirms a booking; duplicates for it are ignored
+            outcomes[event_pks[0]] = booking_pk in confirmed
+            outcomes.update((pk, False) for pk in event_pks[1:])
+        print(f"Webhook: Confirmed {len(confirmed)} of {len(payment_intents)} paid booking(s) via {self.name}, ticket deliveries queued.")
+        return outcomes
+
+    def process_webhook_event(self, event):
+        """ Handles the checkout.session.completed event: confirms the paid booking and
+            queues its ticket delivery (the PDF and email are produced by
+            `manage.py deliver_tickets`). Other event types are ignored. Batches go
+            through process_webhook_events(); this is the one-event path.
+        """
+        if event.event_type != "checkout.session.completed":
+            print(f"Webhook: Unhandled event type {event.event_type}")
+            return False
+
+        booking_pk = self._paid_booking_pk(event)
+        session = event.payload["data"]["object"]
+        if booking_pk is None:
+            print(f"Webhook: Received session {session.get('id')} but payment status is \'{session.get('payment_status')}\' or booking_pk missing.")
+            return False
+
+        if not confirm_paid_bookings({booking_pk: session.get("payment_intent")}):
+            print(f"Webhook: Booking {booking_pk} not found or already processed. Ignoring.")
+            return False
+        print(f"Webhook: Booking {booking_pk} confirmed via {self.name}, ticket delivery queued.")
+        return True
+
+    @staticmethod
+    def _paid_booking_pk(event):
+        """ Returns the booking pk of a paid checkout.session.completed event, else None. """
+        if event.event_type != "checkout.session.completed":
+            return None
+        session = event.payload["data"]["object"]
+        booking_pk = (session.get("metadata") or {}).get("booking_pk")
+        if session.get("payment_status") != "paid" or not str(booking_pk or "").isdigit():
+            return None
+        return int(booking_pk)
+
+class FakePaymentProcessor(StripePaymentProcessor):
+    """ Local payment processor that never leaves the process, for development and
+        load tests: checkout initiation only waits `latency` seconds and stores a
+        fake session id, so initiation latency can be measured without a network or
+        a provider account. `failure_rate` (0-1) makes that share of the calls fail
+        with a retryable connection error, to exercise retries and the circuit
+        breaker. Webhooks are Stripe-shaped JSON events authenticated by an
+        X-Fake-Webhook-Secret header; they are applied by the Stripe event code.
+    """
+    name = "fake"
+
+    def __init__(self, latency=0.0, webhook_secret="", failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.webhook_secret = webhook_secret
+        self.publishable_key = "pk_test_fake"
+        self._session_ids = itertools.count(1)
+
+    def initiate_payment(self, request, booking, idempotency_key=None):
+        """ Simulates a Checkout Session creation. """
+        if self.latency:
+            time.sleep(self.latency)
+        self._maybe_fail(booking)
+        checkout = self._remember_checkout(booking, self._new_session(booking))
+        Booking.objects.filter(pk=booking.pk).update(**checkout)
+        return self._payment_context(booking.stripe_payment_intent_id)
+
+    async def ainitiate_payment(self, request, booking, idempotency_key=None):
+        """ Simulates a Checkout Session creation without blocking the event loop. """
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self._maybe_fail(booking)
+        checkout = self._remember_checkout(booking, self._new_session(booking))
+        await Booking.objects.filter(pk=booking.pk).aupdate(**checkout)
+        return self._payment_context(booking.stripe_payment_intent_id)
+
+    def _maybe_fail(self, booking):
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise PaymentProcessingError("Fake provider error") from ConnectionError(
+                f"Injected failure for booking {booking.pk}"
+            )
+
+    def is_retryable(self, error):
+        return isinstance(error.__cause__, ConnectionError)
+
+    def _new_session(self, booking):
+        return {"id": f"cs_fake_{booking.pk}_{next(self._session_ids)}", "expires_at": None}
+
+    def handle_webhook(self, request):
+        """ Records a Stripe-shaped JSON event ({"id", "type", "data": {"object"}}). """
+        secret = request.META.get("HTTP_X_FAKE_WEBHOOK_SECRET", "")
+        if not self.webhook_secret or not constant_time_compare(secret, self.webhook_secret):
+            print("Fake Webhook error: Invalid or missing webhook secret")
+            return HttpResponse(status=400)
+        try:
+            event = json.loads(request.body)
+            event_id, event_type = event["id"], event["type"]
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Fake Webhook error: Invalid payload - {e}")
+            return HttpResponse(status=400)
+        record_webhook_event(self.name, event_id, event_type, event)
         return HttpResponse(status=200)
 
 # Custom exception for payment errors
 class PaymentProcessingError(Exception):
     pass
 
-# --- Factory Function (Optional but useful) ---
-# This function selects the appropriate processor based on settings
-def get_payment_processor():
-    """ Returns an instance of the configured payment processor. """
-    # For now, we only have Stripe
-    # In the future, this could read from settings.PAYMENT_PROCESSOR_CLASS
-    return StripePaymentProcessor()
+# --- Processor Registry ---
+# Processors (and their pooled HTTP clients) are built once per process and shared
+_processors = {}
+_processors_lock = threading.Lock()
+
+def get_payment_processor(name=None):
+    """ Returns the processor registered under `name` in settings.PAYMENT_PROCESSORS,
+        by default the one selected by settings.PAYMENT_PROCESSOR. The processor is
+        built from its CLASS and OPTIONS on first use, wrapped in a
+        ResilientPaymentProcessor (deadline, retries, circuit breaker) and reused afterwards.
+    """
+    name = name or settings.PAYMENT_PROCESSOR
+    processor = _processors.get(name)
+    if processor is None:
+        with _processors_lock: # Two threads must not build two clients
+            processor = _processors.get(name)
+            if processor is None:
+                try:
+                    config = settings.PAYMENT_PROCESSORS[name]
+                except KeyError:
+                    raise ImproperlyConfigured(f"No payment processor named '{name}' in PAYMENT_PROCESSORS.")
+                processor = import_string(config["CLASS"])(**config.get("OPTIONS", {}))
+                processor.name = name # Webhook events are recorded under the registry name
+                # Imported here: the resilience module imports this one
+                from .resilience import ResilientPaymentProcessor
+                processor = _processors[name] = ResilientPaymentProcessor(processor)
+    return processor
+
+def reset_payment_processors():
+    """ Drops the built processors (and their breaker state); the next
+        get_payment_processor() call builds them again from the settings.
+    """
+    with _processors_lock:
+        _processors.clear()
+
+@receiver(setting_changed)
+def _reset_payment_processors(setting, **kwargs):
+    """ Rebuilds the processors when tests (or load tests) override their settings. """
+    if setting.startswith("PAYMENT_"): # Processor, resilience and breaker settings
+        reset_payment_processors()
 
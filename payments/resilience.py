@@ -0,0 +1,244 @@
+# payments/resilience.py
+""" Deadlines, retries and a circuit breaker around payment provider calls.
+
+    When the provider is slow, every checkout used to wait for the SDK's default
+    timeout (80 seconds): request threads piled up behind it and the whole site
+    stalled, not just checkout. get_payment_processor() therefore hands out every
+    processor wrapped in a ResilientPaymentProcessor, which bounds checkout
+    initiation:
+
+    - Deadline: a checkout gives up after PAYMENT_DEADLINE_SECONDS, retries included.
+      Each provider attempt is further bounded by the processor's own HTTP timeout
+      (STRIPE_TIMEOUT_SECONDS); async calls are cancelled exactly at the deadline.
+    - Retries: transient failures (connection errors, timeouts, rate limits, 5xx;
+      see PaymentProcessor.is_retryable) are retried up to PAYMENT_MAX_ATTEMPTS times
+      with full-jitter exponential backoff, so a crowd of failed checkouts does not
+      retry in lockstep. All attempts of one checkout share an idempotency key, so
+      the provider never creates two sessions for it.
+    - Circuit breaker: when at least PAYMENT_BREAKER_FAILURE_RATE of the provider
+      calls in the last PAYMENT_BREAKER_WINDOW_SECONDS failed (and there were at
+      least PAYMENT_BREAKER_MINIMUM_CALLS), the breaker opens and checkouts fail
+      fast with PaymentProcessingError for PAYMENT_BREAKER_OPEN_SECONDS. It then
+      lets a single trial call through (half-open): success closes it again,
+      failure re-opens it.
+
+    Webhook handling only touches the local database and is passed through as is.
+    Breaker state and call counters are per process; see metrics().
+"""
+import asyncio
+import random
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+
+from .processors import PaymentProcessingError, PaymentProcessor
+
+
+class CircuitBreaker:
+    """ Failure-rate circuit breaker over a sliding time window. Thread-safe. """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_rate, minimum_calls, window_seconds, open_seconds, clock=time.monotonic):
+        self.failure_rate = failure_rate
+        self.minimum_calls = minimum_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.times_opened = 0
+        self._calls = deque() # (timestamp, failed) of recent provider calls
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """ Returns True if a provider call may be made now. In the half-open state
+            only one trial call is let through at a time.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if self.clock() - self.opened_at < self.open_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def record(self, failed):
+        """ Records the outcome of a call that allow() let through. """
+        with self._lock:
+            now = self.clock()
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = self.CLOSED
+                    self._calls.clear() # Start the closed state with a clean window
+                return
+            self._calls.append((now, failed))
+            while self._calls and self._calls[0][0] <= now - self.window_seconds:
+                self._calls.popleft()
+            failures = sum(1 for _, call_failed in self._calls if call_failed)
+            if (
+                self.state == self.CLOSED
+                and len(self._calls) >= self.minimum_calls
+                and failures >= self.failure_rate * len(self._calls)
+            ):
+                self._open(now)
+
+    def _open(self, now):
+        self.state = self.OPEN
+        self.opened_at = now
+        self.times_opened += 1
+        self._calls.clear()
+
+    def snapshot(self):
+        """ Returns the breaker state, the calls in the current window and how long it has been open. """
+        with self._lock:
+            return {
+                "state": self.state,
+                "window_calls": len(self._calls),
+                "window_failures": sum(1 for _, failed in self._calls if failed),
+                "times_opened": self.times_opened,
+                "open_for_seconds": round(self.clock() - self.opened_at, 3) if self.state != self.CLOSED else 0,
+            }
+
+
+class ResilientPaymentProcessor(PaymentProcessor):
+    """ Wraps a payment processor with a deadline, retries and a circuit breaker
+        around checkout initiation; everything else is delegated unchanged.
+    """
+
+    def __init__(self, processor, deadline=None, max_attempts=None, backoff_base=None, backoff_max=None, breaker=None):
+        self.processor = processor
+        self.name = processor.name
+        self.deadline = deadline if deadline is not None else settings.PAYMENT_DEADLINE_SECONDS
+        self.max_attempts = max_attempts or settings.PAYMENT_MAX_ATTEMPTS
+        self.backoff_base = backoff_base if backoff_base is not None else settings.PAYMENT_RETRY_BASE_SECONDS
+        self.backoff_max = backoff_max if backoff_max is not None else settings.PAYMENT_RETRY_MAX_SECONDS
+        self.breaker = breaker or CircuitBreaker(
+            failure_rate=settings.PAYMENT_BREAKER_FAILURE_RATE,
+            minimum_calls=settings.PAYMENT_BREAKER_MINIMUM_CALLS,
+            window_seconds=settings.PAYMENT_BREAKER_WINDOW_SECONDS,
+            open_seconds=settings.PAYMENT_BREAKER_OPEN_SECONDS,
+        )
+        self._counters = dict.fromkeys(
+            ("calls", "succeeded", "failed", "retries", "timeouts", "rejected"), 0
+        )
+        self._counters_lock = threading.Lock()
+
+    def initiate_payment(self, request, booking, idempotency_key=None):
+        deadline = time.monotonic() + self.deadline
+        idempotency_key = idempotency_key or self._idempotency_key(booking)
+        self._count("calls")
+        for attempt in range(1, self.max_attempts + 1):
+            self._admit(booking)
+            try:
+                result = self.processor.initiate_payment(request, booking, idempotency_key=idempotency_key)
+            except PaymentProcessingError as e:
+                delay = self._failed(e, attempt, deadline, booking)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.record(failed=False) # Not a provider failure; frees a half-open trial
+                raise
+            return self._succeeded(deadline, booking, result)
+
+    async def ainitiate_payment(self, request, booking, idempotency_key=None):
+        deadline = time.monotonic() + self.deadline
+        idempotency_key = idempotency_key or self._idempotency_key(booking)
+        self._count("calls")
+        for attempt in range(1, self.max_attempts + 1):
+            self._admit(booking)
+            try:
+                result = await asyncio.wait_for(
+                    self.processor.ainitiate_payment(request, booking, idempotency_key=idempotency_key),
+                    max(0.0, deadline - time.monotonic()),
+                )
+            except asyncio.TimeoutError as e:
+                self._count("timeouts")
+                self.breaker.record(failed=True)
+                self._count("failed")
+                print(f"Payment Error: {self.name} checkout for booking {booking.pk} hit the {self.deadline}s deadline")
+                raise PaymentProcessingError("The payment provider did not respond in time. Please try again.") from e
+            except PaymentProcessingError as e:
+                delay = self._failed(e, attempt, deadline, booking)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException: # E.g. the client went away and the view was cancelled
+                self.breaker.record(failed=False)
+                raise
+            return self._succeeded(deadline, booking, result)
+
+    def _admit(self, booking):
+        """ Fails fast while the breaker is open. """
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise PaymentProcessingError(
+                "The payment provider is currently unavailable. Please try again in a few minutes."
+            )
+
+    def _succeeded(self, deadline, booking, result):
+        self.breaker.record(failed=False)
+        if time.monotonic() > deadline:
+            # A blocking call cannot be interrupted; it still counts towards the timeouts
+            self._count("timeouts")
+            print(f"Payment Warning: {self.name} checkout for booking {booking.pk} finished after its deadline")
+        self._count("succeeded")
+        return result
+
+    def _failed(self, error, attempt, deadline, booking):
+        """ Records a failed attempt and returns the backoff delay before the next
+            one, or re-raises `error` if it may not (or can no longer) be retried.
+        """
+        retryable = self.processor.is_retryable(error)
+        # Only provider trouble counts towards the breaker, not rejected requests
+        self.breaker.record(failed=retryable)
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        if not retryable or attempt >= self.max_attempts or time.monotonic() + delay >= deadline:
+            self._count("failed")
+            if retryable and time.monotonic() >= deadline:
+                self._count("timeouts")
+            raise error
+        self._count("retries")
+        print(f"Payment Warning: {self.name} attempt {attempt} for booking {booking.pk} failed, retrying in {delay:.2f}s: {error}")
+        return delay
+
+    def _count(self, counter):
+        with self._counters_lock:
+            self._counters[counter] += 1
+
+    @staticmethod
+    def _idempotency_key(booking):
+        # One key per checkout attempt by the user, shared by its retries
+        return f"checkout-{booking.pk}-{uuid.uuid4().hex}"
+
+    def metrics(self):
+        """ Returns the call counters and the breaker state of this process. """
+        with self._counters_lock:
+            counters = dict(self._counters)
+        return {"processor": self.name, **counters, "breaker": self.breaker.snapshot()}
+
+    def get_open_checkout(self, booking):
+        return self.processor.get_open_checkout(booking)
+
+    def is_retryable(self, error):
+        return self.processor.is_retryable(error)
+
+    def handle_webhook(self, request):
+        return self.processor.handle_webhook(request)
+
+    def process_webhook_event(self, event):
+        return self.processor.process_webhook_event(event)
+
+    def process_webhook_events(self, events):
+        return self.processor.process_webhook_events(events)
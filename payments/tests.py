@@ -1,3 +1,361 @@
-from django.test import TestCase
+# payments/tests.py
+import asyncio
+import json
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from bookings.models import Booking
+from events.models import Event
+from monitoring.testing import QueryBudgetTestMixin
+from .inbox import process_webhook_inbox
+from .models import WebhookEvent
+from .processors import FakePaymentProcessor, PaymentProcessingError, PaymentProcessor, reset_payment_processors
+from .resilience import CircuitBreaker, ResilientPaymentProcessor
+
+FAKE_PROCESSORS = {
+    "fake": {
+        "CLASS": "payments.processors.FakePaymentProcessor",
+        "OPTIONS": {"webhook_secret": "test_webhook_secret"},
+    },
+}
+
+
+@override_settings(PAYMENT_PROCESSOR="fake", PAYMENT_PROCESSORS=FAKE_PROCESSORS)
+class InitiatePaymentQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """ initiate_payment stays within its declared @query_budget, whether it starts a
+        checkout or reuses the one still open.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("buyer", "buyer@example.com", "password")
+        event = Event.objects.create(
+            title="Concert", category="Concert", date=timezone.now() + timedelta(days=7),
+            location="Main Hall", price=25, total_tickets=100, available_tickets=98,
+        )
+        cls.booking = Booking.objects.create(
+            user=cls.user, event=event, quantity=2, total_price=50,
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+
+    def setUp(self):
+        cache.clear()
+        reset_payment_processors() # Build the fake processor from the overridden settings
+        self.addCleanup(reset_payment_processors)
+        self.client.force_login(self.user)
+
+    def test_initiate_payment(self):
+        response = self.client.get(reverse("initiate_payment", kwargs={"booking_pk": self.booking.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_initiate_payment_reuses_open_checkout(self):
+        url = reverse("initiate_payment", kwargs={"booking_pk": self.booking.pk})
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response, 3) # No checkout UPDATE
+
+
+class FakeClock:
+    """ Monotonic clock moved by hand. """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """ The breaker opens on the failure rate of its window, fails fast while open
+        and lets a single trial call through once the open period is over.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            failure_rate=0.5, minimum_calls=4, window_seconds=10, open_seconds=30, clock=self.clock,
+        )
+
+    def record(self, *outcomes):
+        for failed in outcomes:
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record(failed)
+
+    def test_stays_closed_below_minimum_calls(self):
+        self.record(True, True, True)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_stays_closed_below_failure_rate(self):
+        self.record(False, False, False, True, False)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_opens_at_failure_rate(self):
+        self.record(False, True, False, True)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.times_opened, 1)
+
+    def test_old_calls_leave_the_window(self):
+        self.record(True, True, True)
+        self.clock.now = 20
+        self.record(False)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.snapshot()["window_calls"], 1)
+
+    def test_half_open_trial_success_closes(self):
+        self.record(True, True, True, True)
+        self.clock.now = 30
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allow()) # One trial call at a time
+        self.breaker.record(False)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_half_open_trial_failure_reopens(self):
+        self.record(True, True, True, True)
+        self.clock.now = 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record(True)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.times_opened, 2)
+        self.clock.now = 59
+        self.assertFalse(self.breaker.allow())
+
+
+@override_settings(PAYMENT_PROCESSOR="fake", PAYMENT_PROCESSORS=FAKE_PROCESSORS, CHECKOUT_SESSION_MIN_REMAINING_SECONDS=300)
+class OpenCheckoutReuseTests(TestCase):
+    """ initiate_payment reuses a checkout session that is still open long enough and
+        starts a new one otherwise.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("buyer", "buyer@example.com", "password")
+        event = Event.objects.create(
+            title="Concert", category="Concert", date=timezone.now() + timedelta(days=7),
+            location="Main Hall", price=25, total_tickets=100, available_tickets=98,
+        )
+        cls.booking = Booking.objects.create(
+            user=cls.user, event=event, quantity=2, total_price=50,
+            expires_at=timezone.now() + timedelta(days=1), stripe_payment_intent_id="cs_open",
+        )
+
+    def setUp(self):
+        reset_payment_processors()
+        self.addCleanup(reset_payment_processors)
+        self.client.force_login(self.user)
+        self.url = reverse("initiate_payment", kwargs={"booking_pk": self.booking.pk})
+
+    def set_checkout_expiry(self, expires_at):
+        Booking.objects.filter(pk=self.booking.pk).update(checkout_expires_at=expires_at)
+
+    def test_open_session_is_reused_without_calling_the_provider(self):
+        self.set_checkout_expiry(timezone.now() + timedelta(hours=1))
+        with mock.patch.object(FakePaymentProcessor, "initiate_payment") as initiate_payment, \
+                mock.patch.object(FakePaymentProcessor, "ainitiate_payment") as ainitiate_payment:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["stripe_session_id"], "cs_open")
+        initiate_payment.assert_not_called()
+        ainitiate_payment.assert_not_called()
+
+    def test_expired_session_is_replaced(self):
+        self.set_checkout_expiry(timezone.now() - timedelta(minutes=1))
+        self.assert_new_session()
+
+    def test_session_closing_soon_is_replaced(self):
+        self.set_checkout_expiry(timezone.now() + timedelta(seconds=60)) # Less than the minimum left
+        self.assert_new_session()
+
+    def assert_new_session(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        session_id = response.context["stripe_session_id"]
+        self.assertNotEqual(session_id, "cs_open")
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.stripe_payment_intent_id, session_id)
+        self.assertGreater(self.booking.checkout_expires_at, timezone.now() + timedelta(hours=1))
+
+
+@override_settings(PAYMENT_PROCESSOR="fake", PAYMENT_PROCESSORS=FAKE_PROCESSORS, WEBHOOK_MAX_ATTEMPTS=3)
+class WebhookInboxTests(TestCase):
+    """ Webhook deliveries are stored once per (provider, event id), processed once,
+        and retried by process_webhooks when processing fails.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("buyer", "buyer@example.com", "password")
+        event = Event.objects.create(
+            title="Concert", category="Concert", date=timezone.now() + timedelta(days=7),
+            location="Main Hall", price=25, total_tickets=100, available_tickets=98,
+        )
+        cls.booking = Booking.objects.create(
+            user=cls.user, event=event, quantity=2, total_price=50,
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+
+    def setUp(self):
+        reset_payment_processors()
+        self.addCleanup(reset_payment_processors)
+
+    def deliver(self, event_id="evt_1"):
+        payload = {
+            "id": event_id,
+            "type": "checkout.session.completed",
+            "data": {"object": {
+                "id": "cs_1", "payment_status": "paid", "payment_intent": "pi_1",
+                "metadata": {"booking_pk": str(self.booking.pk)},
+            }},
+        }
+        response = self.client.post(
+            reverse("payment_webhook", kwargs={"provider": "fake"}), json.dumps(payload),
+            content_type="application/json", HTTP_X_FAKE_WEBHOOK_SECRET="test_webhook_secret",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_duplicate_delivery_is_stored_and_processed_once(self):
+        self.deliver()
+        self.deliver()
+        self.assertEqual(WebhookEvent.objects.filter(provider="fake", event_id="evt_1").count(), 1)
+
+        self.assertEqual(process_webhook_inbox(), {"processed": 1, "ignored": 0, "retried": 0, "failed": 0})
+        self.deliver() # A provider retry after processing
+        self.assertEqual(process_webhook_inbox(), {"processed": 0, "ignored": 0, "retried": 0, "failed": 0})
+
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, Booking.Status.CONFIRMED)
+        self.assertEqual(self.booking.deliveries.count(), 1)
+
+    def test_failed_event_is_retried_by_process_webhooks(self):
+        self.deliver()
+        with mock.patch("payments.processors.confirm_paid_bookings", side_effect=DatabaseError("Database is down")):
+            call_command("process_webhooks", stdout=StringIO())
+        event = WebhookEvent.objects.get(event_id="evt_1")
+        self.assertEqual((event.status, event.attempts), (WebhookEvent.Status.RECEIVED, 1))
+        self.assertIn("Database is down", event.last_error)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, Booking.Status.PENDING)
+
+        call_command("process_webhooks", stdout=StringIO())
+        event.refresh_from_db()
+        self.assertEqual(event.status, WebhookEvent.Status.PROCESSED)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, Booking.Status.CONFIRMED)
+
+    def test_event_fails_after_max_attempts(self):
+        self.deliver()
+        with mock.patch("payments.processors.confirm_paid_bookings", side_effect=DatabaseError("Database is down")):
+            for _ in range(3):
+                process_webhook_inbox()
+        event = WebhookEvent.objects.get(event_id="evt_1")
+        self.assertEqual((event.status, event.attempts), (WebhookEvent.Status.FAILED, 3))
+        self.assertEqual(process_webhook_inbox()["processed"], 0) # Given up on
+
+
+class ScriptedProcessor(PaymentProcessor):
+    """ Inner processor whose checkout calls follow a script: each entry is returned,
+        or raised if it is an exception. ConnectionError causes are retryable.
+    """
+    name = "scripted"
+
+    def __init__(self, *outcomes, delay=0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.keys = [] # Idempotency key of every call
+
+    def initiate_payment(self, request, booking, idempotency_key=None):
+        self.keys.append(idempotency_key)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def ainitiate_payment(self, request, booking, idempotency_key=None):
+        await asyncio.sleep(self.delay)
+        return self.initiate_payment(request, booking, idempotency_key)
+
+    def is_retryable(self, error):
+        return isinstance(error.__cause__, ConnectionError)
+
+    def handle_webhook(self, request):
+        raise NotImplementedError
+
+    def process_webhook_event(self, event):
+        raise NotImplementedError
+
+
+def provider_down():
+    error = PaymentProcessingError("Provider unreachable")
+    error.__cause__ = ConnectionError("Connection refused")
+    return error
+
+
+class ResilientPaymentProcessorTests(SimpleTestCase):
+    """ Retries of transient failures, the deadline and the breaker around a checkout. """
+
+    booking = SimpleNamespace(pk=1)
+
+    def wrap(self, processor, **options):
+        options = {"deadline": 5, "max_attempts": 3, "backoff_base": 0, "backoff_max": 0, **options}
+        options.setdefault("breaker", CircuitBreaker(
+            failure_rate=0.5, minimum_calls=100, window_seconds=30, open_seconds=15,
+        ))
+        return ResilientPaymentProcessor(processor, **options)
+
+    def test_retryable_errors_are_retried_with_one_idempotency_key(self):
+        processor = ScriptedProcessor(provider_down(), provider_down(), {"session_id": "cs_1"})
+        self.assertEqual(self.wrap(processor).initiate_payment(None, self.booking), {"session_id": "cs_1"})
+        self.assertEqual(len(processor.keys), 3)
+        self.assertEqual(len(set(processor.keys)), 1)
+
+    def test_retries_stop_at_max_attempts(self):
+        processor = ScriptedProcessor(provider_down(), provider_down(), provider_down(), {"session_id": "cs_1"})
+        with self.assertRaises(PaymentProcessingError):
+            self.wrap(processor).initiate_payment(None, self.booking)
+        self.assertEqual(len(processor.keys), 3)
+
+    def test_other_errors_are_not_retried(self):
+        processor = ScriptedProcessor(PaymentProcessingError("Card declined"), {"session_id": "cs_1"})
+        with self.assertRaisesMessage(PaymentProcessingError, "Card declined"):
+            self.wrap(processor).initiate_payment(None, self.booking)
+        self.assertEqual(len(processor.keys), 1)
+
+    def test_deadline_ends_the_retries(self):
+        processor = ScriptedProcessor(provider_down(), {"session_id": "cs_1"})
+        # The first backoff delay already runs past the deadline
+        wrapped = self.wrap(processor, deadline=0.05, backoff_base=10, backoff_max=10)
+        with mock.patch("payments.resilience.random.uniform", return_value=1.0):
+            with self.assertRaises(PaymentProcessingError):
+                wrapped.initiate_payment(None, self.booking)
+        self.assertEqual(len(processor.keys), 1)
+
+    def test_async_call_is_cancelled_at_the_deadline(self):
+        processor = ScriptedProcessor({"session_id": "cs_1"}, delay=1)
+        wrapped = self.wrap(processor, deadline=0.05)
+        with self.assertRaisesMessage(PaymentProcessingError, "did not respond in time"):
+            asyncio.run(wrapped.ainitiate_payment(None, self.booking))
+        self.assertEqual(wrapped.metrics()["timeouts"], 1)
+
+    def test_open_breaker_fails_fast(self):
+        breaker = CircuitBreaker(failure_rate=0.5, minimum_calls=1, window_seconds=30, open_seconds=15)
+        breaker.record(failed=True)
+        processor = ScriptedProcessor({"session_id": "cs_1"})
+        wrapped = self.wrap(processor, breaker=breaker)
+        with self.assertRaisesMessage(PaymentProcessingError, "currently unavailable"):
+            wrapped.initiate_payment(None, self.booking)
+        self.assertEqual(processor.keys, []) # The provider was never called
+        self.assertEqual(wrapped.metrics()["rejected"], 1)
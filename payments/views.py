@@ -1,30 +1,50 @@
 # payments/views.py
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse # For webhook response
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse # For webhook response
 from django.views.decorators.csrf import csrf_exempt # For webhook
 from django.utils import timezone
 
 from bookings.models import Booking
+from monitoring.decorators import query_budget
+from users.decorators import async_login_required
 # Import the processor factory and custom exception
 from .processors import get_payment_processor, PaymentProcessingError
 
-@login_required
-def initiate_payment(request, booking_pk):
+@query_budget(4) # Session, user, booking with event and the checkout UPDATE
+@async_login_required
+async def initiate_payment(request, booking_pk):
     """ Initiates the payment process using the configured payment processor.
         - Fetches the pending booking.
         - Gets the payment processor instance.
         - Calls the processor's initiate_payment method.
         - Renders the template with context returned by the processor.
+        Async view: the booking is loaded with the async ORM and the provider is called
+        through the processor's ainitiate_payment, so under ASGI a slow provider round
+        trip does not tie up a worker thread.
     """
-    booking = get_object_or_404(Booking, pk=booking_pk, user=request.user, status=Booking.Status.PENDING)
+    try:
+        booking = await Booking.objects.select_related("event").aget(
+            pk=booking_pk, user=request.user, status=Booking.Status.PENDING
+        )
+    except Booking.DoesNotExist:
+        raise Http404("No pending booking matches the given query.")
 
     # Prevent payment initiation if the event has already passed
     if booking.event.date < timezone.now():
         messages.error(request, "This event has already passed. Cannot initiate payment.")
         booking.status = Booking.Status.CANCELLED
-        booking.save()
+        await booking.asave()
+        return redirect("event_detail", pk=booking.event.pk)
+
+    # Refuse to start a checkout for a hold that has already expired; the sweeper
+    # (manage.py expire_holds) will cancel it and release the tickets.
+    if booking.expires_at and booking.expires_at <= timezone.now():
+        messages.error(request, "Your ticket hold has expired. Please book again.")
         return redirect("event_detail", pk=booking.event.pk)
 
     try:
@@ -34,7 +54,16 @@ def initiate_payment(request, booking_pk):
         # Call the processor's method to initiate payment (Bridge Pattern)
         # The processor handles the specific logic (e.g., creating Stripe session)
         # and returns the necessary context for the template.
-        payment_context = payment_processor.initiate_payment(request, booking)
+        # A reload of this page reuses the booking's still-open checkout session:
+        # no provider call and no write.
+        payment_context = payment_processor.get_open_checkout(booking)
+        if payment_context is None:
+            if isinstance(request, ASGIRequest):
+                payment_context = await payment_processor.ainitiate_payment(request, booking)
+            else:
+                # Under WSGI each async view runs in its own short-lived event loop, where a
+                # pooled async HTTP client cannot be reused; keep to the blocking client there.
+                payment_context = await sync_to_async(payment_processor.initiate_payment)(request, booking)
 
         # Add the booking to the context for the template
         context = {
@@ -52,12 +81,16 @@ def initiate_payment(request, booking_pk):
         messages.error(request, f"An unexpected error occurred: {e}")
         return redirect("event_detail", pk=booking.event.pk)
 
-@login_required
-def payment_success(request, booking_pk):
+@query_budget(3)
+@async_login_required
+async def payment_success(request, booking_pk):
     """ Displays a success page after the user is redirected back from the payment provider.
         Relies on the webhook for actual confirmation.
     """
-    booking = get_object_or_404(Booking, pk=booking_pk, user=request.user)
+    try:
+        booking = await Booking.objects.select_related("event").aget(pk=booking_pk, user=request.user)
+    except Booking.DoesNotExist:
+        raise Http404("No booking matches the given query.")
     
     if booking.status == Booking.Status.CONFIRMED:
         messages.success(request, "Payment successful! Your booking is confirmed.")
@@ -69,21 +102,26 @@ def payment_success(request, booking_pk):
     context = {"booking": booking}
     return render(request, "payments/payment_success.html", context)
 
+@query_budget(2)
 @login_required
 def payment_cancelled(request):
     """ Displays a cancellation page if the user cancels the payment process. """
     messages.warning(request, "Payment was cancelled. Your booking remains pending. You can try paying again later.")
     return render(request, "payments/payment_cancelled.html")
 
+@query_budget(2) # The inbox INSERT (in a transaction)
 @csrf_exempt # Required for webhooks
-def payment_webhook(request):
+def payment_webhook(request, provider=None):
     """ Handles incoming webhook events by delegating to the configured payment processor.
         This view acts as the entry point and uses the Bridge pattern to call the
-        appropriate processor's webhook handler.
+        appropriate processor's webhook handler. `provider` selects a processor from
+        PAYMENT_PROCESSORS other than the default one.
     """
+    if provider is not None and provider not in settings.PAYMENT_PROCESSORS:
+        raise Http404("Unknown payment provider.")
     try:
         # Get the configured payment processor instance (Bridge Pattern)
-        payment_processor = get_payment_processor()
+        payment_processor = get_payment_processor(provider)
         
         # Delegate webhook handling to the processor (Bridge Pattern)
         # The processor handles signature verification and event processing.
@@ -53,10 +53,14 @@ INSTALLED_APPS = [
     "events.apps.EventsConfig",
     "bookings.apps.BookingsConfig",
     "payments.apps.PaymentsConfig",
+    "monitoring.apps.MonitoringConfig",
+    "benchmarks.apps.BenchmarksConfig",
     # Third-party apps (add any others here, e.g., crispy_forms)
 ]
 
 MIDDLEWARE = [
+    # First, so it also counts the queries of the session and authentication middleware
+    "monitoring.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -70,7 +74,8 @@ ROOT_URLCONF = "ticket_system.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates that also times rendering for the request metrics (monitoring/backends.py)
+        "BACKEND": "monitoring.backends.InstrumentedDjangoTemplates",
         # Directory for project-level templates (like base.html, home.html)
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True, # Allow Django to look for templates within each app's 'templates' directory
@@ -99,6 +104,18 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Process-local memory cache by default; point it at a shared cache (e.g. Redis or
+# Memcached) in production so invalidations reach every worker process.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("DJANGO_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", ""),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -159,9 +176,134 @@ EMAIL_USE_TLS = os.getenv("DJANGO_EMAIL_USE_TLS", "True") == "True"
 EMAIL_HOST_USER = os.getenv("DJANGO_EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.getenv("DJANGO_EMAIL_HOST_PASSWORD", "")
 DEFAULT_FROM_EMAIL = os.getenv("DJANGO_DEFAULT_FROM_EMAIL", "webmaster@localhost")
+# Ticket emails sent per mail connection session by bookings.mailer.send_ticket_emails
+TICKET_EMAIL_BATCH_SIZE = int(os.getenv("TICKET_EMAIL_BATCH_SIZE", "50"))
 
 # Stripe Settings (Fetched from environment variables)
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY", "pk_test_replace_me")
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", "sk_test_replace_me")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "whsec_replace_me")
 
+# Payment Processor Settings (see payments/processors.py)
+# Name of the processor in PAYMENT_PROCESSORS used for checkouts and the webhook endpoint
+PAYMENT_PROCESSOR = os.getenv("PAYMENT_PROCESSOR", "stripe")
+# Processors are built once per process from CLASS and OPTIONS. Webhook events are
+# processed by the processor registered under the provider name they were recorded with.
+PAYMENT_PROCESSORS = {
+    "stripe": {
+        "CLASS": "payments.processors.StripePaymentProcessor",
+        "OPTIONS": {
+            "secret_key": STRIPE_SECRET_KEY,
+            "publishable_key": STRIPE_PUBLISHABLE_KEY,
+            "webhook_secret": STRIPE_WEBHOOK_SECRET,
+            "api_base": os.getenv("STRIPE_API_BASE", ""), # Empty means the Stripe API
+            "pool_size": int(os.getenv("STRIPE_HTTP_POOL_SIZE", "10")), # Keep-alive connections kept open
+            "timeout": float(os.getenv("STRIPE_TIMEOUT_SECONDS", "5")), # Per API request
+        },
+    },
+}
+# Local processor without network calls, for development and load tests. It accepts
+# webhooks carrying FAKE_PAYMENT_WEBHOOK_SECRET, i.e. it can confirm bookings without any
+# payment, so it is only registered when explicitly enabled (and never in production).
+# loadtest_checkout and loadtest_funnel register their own instance while they run.
+FAKE_PAYMENT_ENABLED = os.getenv("FAKE_PAYMENT_ENABLED", "False") == "True"
+if FAKE_PAYMENT_ENABLED:
+    PAYMENT_PROCESSORS["fake"] = {
+        "CLASS": "payments.processors.FakePaymentProcessor",
+        "OPTIONS": {
+            "latency": float(os.getenv("FAKE_PAYMENT_LATENCY", "0")), # Simulated provider response time (seconds)
+            # No default: without a secret every fake webhook is rejected
+            "webhook_secret": os.getenv("FAKE_PAYMENT_WEBHOOK_SECRET", ""),
+            "failure_rate": float(os.getenv("FAKE_PAYMENT_FAILURE_RATE", "0")), # Share of calls that fail (retryable)
+        },
+    }
+# An open checkout session is reused when the payment page is reloaded while it has
+# at least this many seconds left; otherwise a new session is created
+CHECKOUT_SESSION_MIN_REMAINING_SECONDS = int(os.getenv("CHECKOUT_SESSION_MIN_REMAINING_SECONDS", "300"))
+# Checkout initiation resilience (see payments/resilience.py)
+# Overall time budget of one checkout initiation, retries included
+PAYMENT_DEADLINE_SECONDS = float(os.getenv("PAYMENT_DEADLINE_SECONDS", "8"))
+# Provider attempts per checkout; retries use full-jitter exponential backoff
+PAYMENT_MAX_ATTEMPTS = int(os.getenv("PAYMENT_MAX_ATTEMPTS", "3"))
+PAYMENT_RETRY_BASE_SECONDS = float(os.getenv("PAYMENT_RETRY_BASE_SECONDS", "0.2"))
+PAYMENT_RETRY_MAX_SECONDS = float(os.getenv("PAYMENT_RETRY_MAX_SECONDS", "2"))
+# The breaker opens when this share of the provider calls in the window failed...
+PAYMENT_BREAKER_FAILURE_RATE = float(os.getenv("PAYMENT_BREAKER_FAILURE_RATE", "0.5"))
+PAYMENT_BREAKER_MINIMUM_CALLS = int(os.getenv("PAYMENT_BREAKER_MINIMUM_CALLS", "20"))
+PAYMENT_BREAKER_WINDOW_SECONDS = float(os.getenv("PAYMENT_BREAKER_WINDOW_SECONDS", "30"))
+# ...and fails checkouts fast for this long before letting a trial call through
+PAYMENT_BREAKER_OPEN_SECONDS = float(os.getenv("PAYMENT_BREAKER_OPEN_SECONDS", "15"))
+
+
+# Event Listing Settings
+EVENTS_PER_PAGE = int(os.getenv("EVENTS_PER_PAGE", "12"))
+# Dotted path of the event search backend (see events/search.py).
+# Empty means SQLite FTS5 on SQLite and icontains scans on other databases.
+EVENT_SEARCH_BACKEND = os.getenv("EVENT_SEARCH_BACKEND", "")
+# Upper bound (seconds) on how long the cached category facet may be reused (see events/facets.py)
+EVENT_FACET_CACHE_TIMEOUT = int(os.getenv("EVENT_FACET_CACHE_TIMEOUT", "60"))
+# Lifetime (seconds) of cached event card / detail fragments; edits invalidate them immediately (see events/fragments.py)
+EVENT_FRAGMENT_CACHE_TIMEOUT = int(os.getenv("EVENT_FRAGMENT_CACHE_TIMEOUT", "3600"))
+# How long (seconds) the detail page may show a cached ticket availability
+EVENT_AVAILABILITY_CACHE_TIMEOUT = int(os.getenv("EVENT_AVAILABILITY_CACHE_TIMEOUT", "2"))
+# Live availability stream (Server-Sent Events, needs an ASGI server; see events/availability.py)
+# Only turn this on when the site is served by an ASGI server: under WSGI a stream would tie up
+# a worker for EVENT_STREAM_MAX_SECONDS and send nothing until it ends
+EVENT_STREAM_ENABLED = os.getenv("EVENT_STREAM_ENABLED", "False") == "True"
+EVENT_STREAM_POLL_SECONDS = float(os.getenv("EVENT_STREAM_POLL_SECONDS", "2")) # Fallback re-read for changes made by other processes
+EVENT_STREAM_HEARTBEAT_SECONDS = float(os.getenv("EVENT_STREAM_HEARTBEAT_SECONDS", "15"))
+EVENT_STREAM_MAX_SECONDS = int(os.getenv("EVENT_STREAM_MAX_SECONDS", "300")) # Clients reconnect after this
+
+# Request Metrics Settings (see monitoring/)
+# Client addresses allowed to read /metrics/ (staff users always can)
+METRICS_ALLOWED_IPS = os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+# Adds a Server-Timing header (queries, DB and template time) to every response
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", str(DEBUG)) == "True"
+# Fail requests whose view exceeds its @query_budget instead of only logging them
+# (turned on by monitoring.testing.QueryBudgetTestMixin in tests)
+QUERY_BUDGET_ENFORCE = os.getenv("QUERY_BUDGET_ENFORCE", "False") == "True"
+
+# Benchmark Settings (see benchmarks/)
+# Where loadtest_funnel stores its results (one JSON file per run) and seed_benchmark_data its manifest
+BENCHMARK_RESULTS_DIR = Path(os.getenv("BENCHMARK_RESULTS_DIR", BASE_DIR / "var" / "benchmarks"))
+
+# Inventory Settings
+# Default number of counter shards used by `manage.py shard_inventory` for hot on-sales
+INVENTORY_SHARD_COUNT = int(os.getenv("INVENTORY_SHARD_COUNT", "8"))
+
+# Booking Settings
+# Bookings per page of a user's booking history (see bookings/history.py)
+BOOKINGS_PER_PAGE = int(os.getenv("BOOKINGS_PER_PAGE", "20"))
+DASHBOARD_RECENT_BOOKINGS = int(os.getenv("DASHBOARD_RECENT_BOOKINGS", "5"))
+# Upper bound (seconds) on how long the cached dashboard summary may be reused
+BOOKING_SUMMARY_CACHE_TIMEOUT = int(os.getenv("BOOKING_SUMMARY_CACHE_TIMEOUT", "300"))
+# How long a pending booking holds its seats before `manage.py expire_holds` releases them.
+# Stripe Checkout sessions live at least 30 minutes, so shorter holds can expire mid-payment.
+BOOKING_HOLD_MINUTES = int(os.getenv("BOOKING_HOLD_MINUTES", "30"))
+# Rows fetched per database round trip by the streaming booking export (see bookings/export.py)
+BOOKING_EXPORT_CHUNK_SIZE = int(os.getenv("BOOKING_EXPORT_CHUNK_SIZE", "2000"))
+
+# Virtual waiting room for events with an admission_rate (see bookings/waiting_room.py)
+WAITING_ROOM_BACKEND = os.getenv("WAITING_ROOM_BACKEND", "bookings.waiting_room.SQLiteWaitingRoom")
+# A file shared by all local worker processes, so they admit from one queue at one rate.
+# ":memory:" keeps one queue per process: only for tests and single-process servers.
+WAITING_ROOM_LOCATION = os.getenv("WAITING_ROOM_LOCATION", str(BASE_DIR / "var" / "waiting_room.sqlite3"))
+# How long (seconds) an admission ticket stays valid, and how long a queue place is kept
+WAITING_ROOM_ADMISSION_SECONDS = int(os.getenv("WAITING_ROOM_ADMISSION_SECONDS", "600"))
+WAITING_ROOM_QUEUE_SECONDS = int(os.getenv("WAITING_ROOM_QUEUE_SECONDS", "7200"))
+
+# Ticket Delivery Settings (see bookings/delivery.py and `manage.py deliver_tickets`)
+TICKET_DELIVERY_MAX_ATTEMPTS = int(os.getenv("TICKET_DELIVERY_MAX_ATTEMPTS", "8"))
+TICKET_DELIVERY_RETRY_BASE_SECONDS = int(os.getenv("TICKET_DELIVERY_RETRY_BASE_SECONDS", "30"))
+TICKET_DELIVERY_RETRY_MAX_SECONDS = int(os.getenv("TICKET_DELIVERY_RETRY_MAX_SECONDS", "3600"))
+# How long a claimed delivery stays invisible to other workers before it is retried
+TICKET_DELIVERY_LEASE_SECONDS = int(os.getenv("TICKET_DELIVERY_LEASE_SECONDS", "300"))
+
+# Webhook Inbox Settings (see payments/inbox.py and `manage.py process_webhooks`)
+# Processing attempts before a received webhook event is marked failed
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+
+# Ticket PDF Cache Settings (see bookings/ticket_cache.py)
+# Set DJANGO_TICKET_CACHE_DIR to an empty value to disable the cache
+TICKET_CACHE_DIR = os.getenv("DJANGO_TICKET_CACHE_DIR", str(BASE_DIR / "var" / "ticket_cache"))
+TICKET_CACHE_MAX_BYTES = int(os.getenv("DJANGO_TICKET_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
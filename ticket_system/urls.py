@@ -17,6 +17,9 @@ urlpatterns = [
     path("bookings/", include("bookings.urls")), # Booking creation (and potentially list/detail later)
     path("payments/", include("payments.urls")), # Payment initiation, confirmation, webhook
 
+    # Per-view request metrics of this process (local/staff only, see monitoring/)
+    path("metrics/", include("monitoring.urls")),
+
     # Simple home page view using TemplateView
     path("", TemplateView.as_view(template_name="home.html"), name="home"), 
 ]
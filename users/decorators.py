@@ -0,0 +1,20 @@
+# users/decorators.py
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+
+
+def async_login_required(view_func):
+    """ Async counterpart of django.contrib.auth.decorators.login_required, which
+        only supports synchronous views in Django 4.2.
+        Resolving request.user reads the session and the user from the database, so
+        it runs in a worker thread; afterwards request.user is safe to use in the view.
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return wrapper
@@ -1,3 +1,44 @@
+# users/tests.py
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from bookings.models import Booking
+from events.models import Event
+from monitoring.testing import QueryBudgetTestMixin
+
+
+class DashboardQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """ The dashboard stays within its declared @query_budget, cold cache included. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("buyer", "buyer@example.com", "password")
+        for number in range(8):
+            event = Event.objects.create(
+                title=f"Concert {number}", category="Concert",
+                date=timezone.now() + timedelta(days=number + 1), location="Main Hall",
+                price=25, total_tickets=100, available_tickets=98,
+            )
+            Booking.objects.create(
+                user=cls.user, event=event, quantity=2, total_price=50,
+                status=Booking.Status.CONFIRMED if number % 2 else Booking.Status.PENDING,
+            )
+
+    def setUp(self):
+        cache.clear() # Measure the summary cache miss too
+        self.client.force_login(self.user)
+
+    def test_dashboard(self):
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
 
-# Create your tests here.
+    def test_dashboard_cached_summary(self):
+        self.client.get(reverse("dashboard"))
+        response = self.client.get(reverse("dashboard"))
+        self.assertWithinQueryBudget(response, 3) # Session, user and the recent bookings
@@ -6,6 +6,11 @@ from django.contrib.auth.mixins import LoginRequiredMixin # For class-based view
 from django.urls import reverse_lazy
 from django.views import generic
 from django.contrib import messages # To display feedback to the user
+from django.conf import settings
+from django.utils import timezone
+
+from bookings.history import get_booking_history, get_upcoming_summary
+from monitoring.decorators import query_budget
 
 from .forms import SignUpForm
 
@@ -42,18 +47,24 @@ class SignUpView(generic.CreateView):
         return super().form_invalid(form)
 
 # Protected dashboard view using a function-based view and decorator
+@query_budget(5) # Session, user, recent bookings and the summary on a cache miss (2)
 @login_required # Ensures only logged-in users can access this view
 def dashboard(request):
-    """ A simple dashboard view accessible only to logged-in users.
-        Displays a welcome message.
+    """ A dashboard view accessible only to logged-in users.
+        Displays a welcome message, the cached summary of the user's upcoming
+        tickets and their most recent bookings (the first page of the booking
+        history, see bookings/history.py) with a link to the full list.
     """
-    # Context can be expanded later to show user-specific information (e.g., recent bookings)
+    recent_bookings = get_booking_history(request.user, per_page=settings.DASHBOARD_RECENT_BOOKINGS)
     context = {
-        "user": request.user
+        "user": request.user,
+        "summary": get_upcoming_summary(request.user), # Cached per user
+        "bookings": recent_bookings,
+        "has_more_bookings": recent_bookings.has_next,
+        "now": timezone.now(),
     }
     return render(request, "users/dashboard.html", context)
 
 # Potential future views:
 # - User Profile View (display/edit profile information)
-# - User Bookings List View (display user's past and upcoming bookings)
 